@@ -0,0 +1,315 @@
+"""
+    Stage-level benchmark of the generator on a synthetic workbook.
+
+    A workbook of N sheets x M rows is generated with a realistic mix of UserTask, ServiceTask,
+    ExclusiveGateway (with conditional Next), CallActivity and BoundaryEvent rework loops, with YAML
+    Config/Meta cells. Each stage (parse_workflows_excel, sheet_rows, validate_rows, handle,
+    generate_diagram, to_pretty_xml) is then timed separately and its peak memory recorded. The startup
+    of the command line is measured too, in fresh interpreters under -X importtime, to catch a heavy
+    import creeping back in. The results are written as JSON so runs on different commits can be compared:
+
+        python bench.py --sheets 20 --rows 500 --output before.json
+        python bench.py --sheets 20 --rows 500 --output after.json --compare before.json
+
+    Everything runs offline, in this process.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+import workflows_gen as wg
+from sources import WORKBOOK_COLUMNS
+
+STAGES = ("parse", "rows", "validate", "handle", "generate_diagram", "to_pretty_xml")
+
+# Command lines whose startup is measured; {workbook} is the benchmarked workbook
+STARTUP_CASES = {
+    "import": ["-c", "import workflows_gen"],
+    "help": ["workflows_gen.py", "--help"],
+    "check_sheet": ["workflows_gen.py", "check", "--input", "{workbook}", "--sheet", "wf0000"],
+}
+# Imports whose cumulative time is reported for every case, None when the case does not load them
+STARTUP_MODULES = ("pandas", "numpy", "yaml", "openpyxl")
+
+# Relative weights of the building blocks of a synthetic process
+BLOCK_WEIGHTS = {"user_task": 4, "service_task": 3, "gateway": 2, "call_activity": 1}
+
+def synthetic_rows(name, rows, rng, callees=()):
+    """
+    Builds the rows of one valid sheet: an ERROR row, a StartEvent, blocks picked by BLOCK_WEIGHTS until
+    about `rows` rows, then an EndEvent. Gateways branch into two tasks that join again (one branch
+    sometimes ends in an error EndEvent); call activities call one of `callees` and carry a
+    BoundaryEvent that loops back to an earlier UserTask.
+    Returns:
+        list: One dict per row, with the workflows.xlsx columns.
+    """
+    sheet = [{"TopElm": "Error", "BPMNElm": "Error", "Role": "System", "Id": "RejectionError", "Name": "Rejection Error"}]
+    seq = 1
+    user_tasks = []
+
+    def add(seq, bpmn_elm, id, name, next=None, config=None, meta=None, role="System"):
+        sheet.append({"TopElm": "Process", "Seq": seq, "BPMNElm": bpmn_elm, "Role": role, "Id": id, "Name": name,
+                      "Desc": name, "Next": next, "Config": config, "Meta": meta})
+
+    def user_task(seq, next):
+        user_tasks.append(seq)
+        add(seq, "UserTask", f"Task{seq}", f"Human Task {seq}", next, f'"camunda:formKey": forms/{name}/task{seq}.html',
+            f"priority: {rng.choice(['low', 'normal', 'high'])}\nbuttons: {rng.randint(1, 3)}", role="CreditOfficer")
+
+    def service_task(seq, next):
+        add(seq, "ServiceTask", f"Service{seq}", f"Call API {seq}", next, None,
+            f"url: http://host.docker.internal:8081\nmethod: POST\npayload:\n  name: {name}\n  step: {seq}")
+
+    add(seq, "StartEvent", "StartEvent", "Start", seq + 1)
+    seq += 1
+    while seq < rows - 1:
+        block = rng.choices(list(BLOCK_WEIGHTS), weights=list(BLOCK_WEIGHTS.values()))[0]
+        if block == "gateway":
+            # gateway, two branches, both joining at the next block
+            add(seq, "ExclusiveGateway", f"Decision{seq}", f"Decision {seq}",
+                f"${{approved == true}}: {seq + 1}\n${{approved == false}}: {seq + 2}")
+            user_task(seq + 1, seq + 3)
+            if rng.random() < 0.2:
+                add(seq + 2, "EndEvent", f"EndRejected{seq + 2}", "End Rejected", meta="errorRef: RejectionError")
+            else:
+                service_task(seq + 2, seq + 3)
+            seq += 3
+        elif block == "call_activity" and callees and user_tasks:
+            # call activity with a boundary event looping back to an earlier user task
+            add(seq, "CallActivity", f"Call{seq}", f"Call Subprocess {seq}", seq + 2, f"calledElement: {rng.choice(callees)}",
+                "in.request: request\nout.approved: approved\nout.rejection_reason: rejection_reason")
+            add(seq + 1, "BoundaryEvent", f"Catch{seq + 1}", f"Catch Rejection {seq + 1}", rng.choice(user_tasks[-5:]),
+                f"attachedToRef: Call{seq}", "errorRef: RejectionError")
+            seq += 2
+        elif block == "service_task":
+            service_task(seq, seq + 1)
+            seq += 1
+        else:
+            user_task(seq, seq + 1)
+            seq += 1
+    add(seq, "EndEvent", "EndEvent", "End")
+    return sheet
+
+def synthetic_workbook(path, sheets=10, rows=100, seed=1):
+    """
+    Writes a workbook of `sheets` synthetic sheets of about `rows` rows each to `path`.
+    Later sheets call the processes of earlier ones, like main -> rsa -> approval.
+    """
+    rng = random.Random(seed)
+    names = [f"wf{index:04d}" for index in range(sheets)]
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        for index, name in enumerate(names):
+            callees = [f"{callee}_process" for callee in names[max(0, index - 3):index]]
+            df = pd.DataFrame(synthetic_rows(name, rows, rng, callees), columns=WORKBOOK_COLUMNS)
+            df.to_excel(writer, sheet_name=name, index=False)
+
+@contextlib.contextmanager
+def timed(results, stage):
+    # Records the stage's wall time in seconds
+    started = time.perf_counter()
+    yield
+    results[stage] = time.perf_counter() - started
+
+@contextlib.contextmanager
+def traced(results, stage):
+    # Records the stage's peak traced memory in MB, above what was allocated before it; needs tracemalloc running
+    start, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    yield
+    results[stage] = round((tracemalloc.get_traced_memory()[1] - start) / 1e6, 3)
+
+def run_stages(path, layout="layered", measure=timed):
+    """
+    Runs every stage over all sheets of the workbook, one stage at a time, each wrapped in `measure`.
+    Returns:
+        dict: Stage name to what `measure` recorded for it.
+    """
+    results = {}
+    with measure(results, "parse"):
+        parsed = wg.parse_workflows_excel(path)
+    with measure(results, "rows"):
+        rows = {name: wg.sheet_rows(df) for name, df in parsed.items()}
+    with measure(results, "validate"):
+        for name, sheet in rows.items():
+            wg.validate_rows(name, sheet)
+    with measure(results, "handle"):
+        workflows = []
+        for name, sheet in rows.items():
+            wf = wg.Workflow(id=f"{name}_definitions", name=name)
+            for top_elm, group in wg.group_by_top_elm(sheet).items():
+                wg.handle(wf, top_elm, group)
+            workflows.append(wf)
+    with measure(results, "generate_diagram"):
+        for wf in workflows:
+            wf.generate_diagram(layout=layout)
+    with measure(results, "to_pretty_xml"):
+        for wf in workflows:
+            wf.to_pretty_xml()
+    return results
+
+def stage_peaks(path, layout="layered"):
+    """
+    Runs the stages once more under tracemalloc, with a cold parse cache.
+    Returns:
+        dict: Stage name to its peak memory in MB.
+    """
+    wg.clear_parse_cache()
+    tracemalloc.start()
+    try:
+        return run_stages(path, layout, measure=traced)
+    finally:
+        tracemalloc.stop()
+
+def import_times(stderr):
+    # Cumulative seconds of the STARTUP_MODULES from the -X importtime lines "import time: self | cumulative | name"
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        name = fields[-1].strip()
+        if name in STARTUP_MODULES and name not in times:
+            times[name] = int(fields[1]) / 1e6
+    return {module: times.get(module) for module in STARTUP_MODULES}
+
+def startup(workbook, repeat=3):
+    """
+    Runs every STARTUP_CASES command line `repeat` times in a fresh interpreter under -X importtime.
+    Returns:
+        dict: Case name to its min and median wall time and the import time of each of STARTUP_MODULES
+              (from the median run).
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for case, args in STARTUP_CASES.items():
+        command = [sys.executable, "-X", "importtime"] + [arg.format(workbook=workbook) for arg in args]
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            done = subprocess.run(command, cwd=here, capture_output=True, text=True)
+            runs.append((time.perf_counter() - started, done.stderr))
+        runs.sort(key=lambda run: run[0])
+        samples = [seconds for seconds, _ in runs]
+        results[case] = {"min_s": round(samples[0], 6), "median_s": round(statistics.median(samples), 6),
+                         "imports_s": import_times(runs[len(runs) // 2][1])}
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark(sheets=10, rows=100, repeat=3, seed=1, layout="layered", workbook=None):
+    """
+    Generates the synthetic workbook (unless `workbook` names an existing one), times every stage
+    `repeat` times with a cold parse cache and measures its peak memory once, then the startup of the
+    command line on the same workbook.
+    Returns:
+        dict: The JSON-ready report.
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        path = workbook or os.path.join(folder, "synthetic.xlsx")
+        if not (workbook and os.path.exists(workbook)):
+            synthetic_workbook(path, sheets, rows, seed)
+
+        runs = []
+        for _ in range(repeat):
+            wg.clear_parse_cache()
+            runs.append(run_stages(path, layout))
+        peaks = stage_peaks(path, layout)
+        started = startup(path, repeat)
+
+    stages = {}
+    for stage in STAGES:
+        samples = [run[stage] for run in runs]
+        stages[stage] = {"min_s": round(min(samples), 6), "median_s": round(statistics.median(samples), 6), "peak_mb": peaks.get(stage)}
+    return {
+        "commit": git_commit(),
+        "generator_version": wg.GENERATOR_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {"sheets": sheets, "rows": rows, "repeat": repeat, "seed": seed, "layout": layout, "workbook": workbook},
+        "stages": stages,
+        "total_median_s": round(sum(stage["median_s"] for stage in stages.values()), 6),
+        "startup": started,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1), # KB on Linux
+    }
+
+def compare(report, baseline, threshold=0.10):
+    """
+    Prints the median time of every stage and startup case next to the baseline's.
+    Returns:
+        list: The stages more than `threshold` (a fraction) slower than in the baseline; startup
+              cases are named "startup:<case>".
+    """
+    regressions = []
+    results = dict(report["stages"])
+    results.update((f"startup:{case}", result) for case, result in report.get("startup", {}).items())
+    before_results = dict(baseline.get("stages", {}))
+    before_results.update((f"startup:{case}", result) for case, result in baseline.get("startup", {}).items())
+    print(f"{'stage':<22}{'baseline s':>12}{'current s':>12}{'change':>9}")
+    for stage, result in results.items():
+        before = before_results.get(stage, {}).get("median_s")
+        if not before:
+            print(f"{stage:<22}{'-':>12}{result['median_s']:>12.4f}")
+            continue
+        change = result["median_s"] / before - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(stage)
+            flag = "  REGRESSION"
+        print(f"{stage:<22}{before:>12.4f}{result['median_s']:>12.4f}{change:>+9.1%}{flag}")
+    return regressions
+
+def print_report(report):
+    params = report["params"]
+    print(f"{params['sheets']} sheets x {params['rows']} rows, {params['layout']} layout, median of {params['repeat']} run(s)")
+    print(f"{'stage':<18}{'median s':>10}{'min s':>10}{'peak MB':>10}")
+    for stage, result in report["stages"].items():
+        print(f"{stage:<18}{result['median_s']:>10.4f}{result['min_s']:>10.4f}{result['peak_mb']:>10.2f}")
+    print(f"{'total':<18}{report['total_median_s']:>10.4f}    max RSS {report['max_rss_mb']} MB")
+    print()
+    print(f"{'startup':<18}{'median s':>10}{'min s':>10}  imports")
+    for case, result in report["startup"].items():
+        imports = ", ".join(f"{module} {seconds:.3f}s" for module, seconds in result["imports_s"].items() if seconds is not None)
+        print(f"{case:<18}{result['median_s']:>10.4f}{result['min_s']:>10.4f}  {imports or 'none of ' + ', '.join(STARTUP_MODULES)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the generator stages on a synthetic workbook")
+    parser.add_argument("--sheets", type=int, default=10, help="number of sheets (default: 10)")
+    parser.add_argument("--rows", type=int, default=100, help="rows per sheet (default: 100)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage, the median is reported (default: 3)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed of the synthetic workbook (default: 1)")
+    parser.add_argument("--layout", choices=wg.LAYOUTS, default="layered", help="diagram layout (default: layered)")
+    parser.add_argument("--workbook", help="benchmark this workbook; it is generated there first if it does not exist")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare with an earlier JSON report")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown reported as a regression (default: 0.10)")
+    args = parser.parse_args()
+
+    report = benchmark(args.sheets, args.rows, args.repeat, args.seed, args.layout, args.workbook)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"Slower than {args.compare} by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            raise SystemExit(1)
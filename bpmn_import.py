@@ -0,0 +1,377 @@
+"""
+    Imports existing BPMN files back into workbook rows, the reverse of workflows_gen.py.
+
+    Files are read with iterparse: each process element is turned into a small record when its end
+    tag is read and the parsed subtree is dropped right away, and the diagram is skipped, so memory
+    depends on the number of flow nodes, not on the size of the file. Every process becomes one sheet
+    named after its id (without `_process`), with
+
+        Seq     the element's position in the file
+        Next    the target's Seq, or `${condition}: Seq` lines for conditional flows
+        Config  the element's attributes (camunda:formKey, calledElement, attachedToRef, ...)
+        Meta    camunda:meta entries, the http-connector's url/method/payload, camunda:in/out
+                mappings and errorRefs
+        Role    the lane of the element, Desc its documentation
+
+    and the file's errors as ERROR rows. What the generator cannot express (other element types,
+    listeners, default flows, ...) is left out with a warning. The rows are written as .xlsx, .csv or
+    .jsonl (see sources.py), and --verify reads them back, regenerates every sheet and compares it with
+    its file:
+
+        python bpmn_import.py legacy/ --output imported.xlsx --verify
+"""
+import argparse
+import glob
+import itertools
+import json
+import logging
+import os
+import xml.etree.ElementTree as ET
+import pandas as pd
+import yaml
+import workflows_gen as wg
+from instrumentation import configure_logging, stats
+from sources import SHEET_COLUMN, WORKBOOK_COLUMNS, read_sheets
+
+BPMN = f"{{{wg.BPMN_NS}}}"
+CAMUNDA = f"{{{wg.CAMUNDA_NS}}}"
+PLANE = f"{{{wg.BPMNDI_NS}}}BPMNPlane"
+
+# BPMN tag to the BPMNElm the generator knows it by
+ELEMENT_TYPES = {
+    "startEvent": "StartEvent",
+    "endEvent": "EndEvent",
+    "userTask": "UserTask",
+    "serviceTask": "ServiceTask",
+    "exclusiveGateway": "ExclusiveGateway",
+    "callActivity": "CallActivity",
+    "boundaryEvent": "BoundaryEvent",
+}
+# Elements whose attributes the generator writes from Config; the others only get id (and name)
+CONFIG_ELEMENTS = {"userTask", "callActivity", "boundaryEvent"}
+# Process children that carry nothing the generator needs (laneSet is read for the Role column)
+IGNORED = {"documentation", "extensionElements", "textAnnotation", "association", "dataObject",
+           "dataObjectReference", "dataStoreReference", "laneSet"}
+EXCEL_SHEET_NAME_LIMIT = 31
+YAML_WIDTH = 1 << 30 # never fold long Config/Meta values
+_YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper) # libyaml when available
+
+log = logging.getLogger("bpmn_import")
+
+def _warn(path, message):
+    log.warning(f"{path}: {message}")
+    stats.count("import_warnings")
+
+def _local(tag):
+    # Local name of a Clark-notation tag, e.g. {http://...MODEL}userTask -> userTask
+    return tag.rpartition("}")[2]
+
+def _attribute_name(name):
+    # Clark-notation attribute to the prefixed form used in Config, e.g. camunda:formKey
+    if name[:1] != "{":
+        return name
+    uri, _, local = name[1:].partition("}")
+    prefix = wg.NAMESPACE_PREFIXES.get(uri)
+    return f"{prefix}:{local}" if prefix else name
+
+def _yaml(value):
+    # A Config/Meta/Next cell in the block style of the workbook; None for nothing
+    if not value:
+        return None
+    return yaml.dump(value, Dumper=_YAML_DUMPER, default_flow_style=False, sort_keys=False, allow_unicode=True,
+                     width=YAML_WIDTH).rstrip("\n")
+
+def _process_name(process_id):
+    return process_id[:-len("_process")] if process_id.endswith("_process") else process_id
+
+class _Node:
+    __slots__ = ("tag", "id", "name", "config", "meta", "desc")
+
+    def __init__(self, tag, id, name, config, meta, desc):
+        self.tag = tag
+        self.id = id
+        self.name = name
+        self.config = config
+        self.meta = meta
+        self.desc = desc
+
+def _documentation(elem):
+    doc = elem.find(f"{BPMN}documentation")
+    return doc.text.strip() if doc is not None and doc.text and doc.text.strip() else None
+
+def _error_ref(elem):
+    definition = elem.find(f"{BPMN}errorEventDefinition")
+    return definition.get("errorRef") if definition is not None else None
+
+def _node(path, elem):
+    """
+    Turns a flow node into a _Node, warning about whatever the generator would not write back.
+    Returns:
+        _Node: The node, or None if its type is not supported.
+    """
+    tag = _local(elem.tag)
+    id = elem.get("id")
+    attributes = {_attribute_name(key): value for key, value in elem.attrib.items() if key not in ("id", "name")}
+    config = attributes if tag in CONFIG_ELEMENTS else {}
+    if attributes and not config:
+        _warn(path, f"{tag} '{id}': attributes {', '.join(attributes)} dropped")
+    meta = {}
+    extensions = elem.find(f"{BPMN}extensionElements")
+    extras = [_local(child.tag) for child in extensions] if extensions is not None else []
+
+    if tag in ("endEvent", "boundaryEvent"):
+        error_ref = _error_ref(elem)
+        if error_ref:
+            meta["errorRef"] = error_ref
+        definitions = [_local(child.tag) for child in elem if _local(child.tag).endswith("EventDefinition")]
+        if definitions and not error_ref:
+            _warn(path, f"{tag} '{id}': {', '.join(definitions)} dropped, only error events are supported")
+    elif tag == "startEvent":
+        definitions = [_local(child.tag) for child in elem if _local(child.tag).endswith("EventDefinition")]
+        if definitions:
+            _warn(path, f"startEvent '{id}': {', '.join(definitions)} dropped, it becomes a plain start event")
+    elif tag == "userTask":
+        for child in (extensions if extensions is not None else ()):
+            if child.tag == f"{CAMUNDA}meta":
+                meta[child.get("key")] = child.text or ""
+        extras = [extra for extra in extras if extra != "meta"]
+    elif tag == "serviceTask":
+        connector = extensions.find(f"{CAMUNDA}connector") if extensions is not None else None
+        if connector is None:
+            _warn(path, f"serviceTask '{id}' has no camunda:connector, it becomes an http-connector task without a url")
+        else:
+            for parameter in connector.iterfind(f"{CAMUNDA}inputOutput/{CAMUNDA}inputParameter"):
+                key, text = parameter.get("name"), parameter.text
+                if key == "payload" and text:
+                    try:
+                        meta[key] = json.loads(text)
+                    except ValueError:
+                        _warn(path, f"serviceTask '{id}': payload is not JSON, kept as a string")
+                        meta[key] = text
+                elif key in ("url", "method"):
+                    meta[key] = text
+                else:
+                    _warn(path, f"serviceTask '{id}': input parameter '{key}' dropped")
+        extras = [extra for extra in extras if extra != "connector"]
+    elif tag == "callActivity":
+        for child in (extensions if extensions is not None else ()):
+            direction = _local(child.tag)
+            if child.tag in (f"{CAMUNDA}in", f"{CAMUNDA}out") and child.get("source") and child.get("target"):
+                meta[f"{direction}.{child.get('source')}"] = child.get("target")
+            elif child.tag in (f"{CAMUNDA}in", f"{CAMUNDA}out"):
+                _warn(path, f"callActivity '{id}': camunda:{direction} without source and target dropped")
+        extras = [extra for extra in extras if extra not in ("in", "out")]
+
+    if extras:
+        _warn(path, f"{tag} '{id}': extension elements {', '.join(sorted(set(extras)))} dropped")
+    return _Node(tag, id, elem.get("name"), config, meta, _documentation(elem))
+
+def _process_rows(path, process_id, nodes, flows, roles, errors):
+    """
+    Numbers the nodes in file order and resolves every node's outgoing flows into its Next cell.
+    Returns:
+        list: One dict per row, with the WORKBOOK_COLUMNS.
+    """
+    seqs = {node.id: seq for seq, node in enumerate(nodes, start=1)}
+    outgoing = {}
+    for source, target, condition in flows:
+        if source not in seqs or target not in seqs:
+            _warn(path, f"{process_id}: flow {source} -> {target} dropped, it connects an unsupported element")
+            continue
+        outgoing.setdefault(source, []).append((target, condition))
+
+    rows = [{"TopElm": "Error", "BPMNElm": "Error", "Id": id, "Name": name, "Desc": name} for id, name in errors]
+    for node in nodes:
+        targets = outgoing.get(node.id, [])
+        conditional = [(target, condition) for target, condition in targets if condition]
+        if conditional:
+            dropped = len(targets) - len(conditional)
+            if dropped:
+                _warn(path, f"{process_id}: {dropped} unconditional flow(s) from '{node.id}' dropped next to conditional ones")
+            next = _yaml({condition: seqs[target] for target, condition in conditional})
+        elif targets:
+            if len(targets) > 1:
+                _warn(path, f"{process_id}: '{node.id}' has {len(targets)} unconditional flows, only the one to '{targets[0][0]}' is kept")
+            next = seqs[targets[0][0]]
+        else:
+            next = None
+        rows.append({"TopElm": "Process", "Seq": seqs[node.id], "BPMNElm": ELEMENT_TYPES[node.tag], "Role": roles.get(node.id),
+                     "Id": node.id, "Name": node.name, "Desc": node.desc or node.name, "Next": next,
+                     "Config": _yaml(node.config), "Meta": _yaml(node.meta)})
+    stats.count("processes_imported")
+    stats.count("elements_imported", len(nodes))
+    return rows
+
+def read_bpmn(path):
+    """
+    Streams a BPMN file and yields its processes as workbook sheets, one at a time.
+    Args:
+        path (str): The BPMN file (or a file object).
+    Yields:
+        tuple: (sheet name, rows), with rows as dicts with the WORKBOOK_COLUMNS.
+    """
+    stack = []
+    errors = []
+    processes = [] # (process id, nodes, flows, roles), finished once the errors are known at the end
+    process = None
+    with stats.timer("import"):
+        for event, elem in ET.iterparse(path, events=("start", "end")):
+            if event == "start":
+                stack.append(elem)
+                if len(stack) == 2 and elem.tag == f"{BPMN}process":
+                    process = (elem.get("id"), [], [], {})
+                continue
+
+            stack.pop()
+            parent = stack[-1] if stack else None
+            tag = _local(elem.tag)
+            if len(stack) == 1 and elem.tag == f"{BPMN}error":
+                if elem.get("errorCode") not in (None, elem.get("id")):
+                    _warn(path, f"error '{elem.get('id')}': errorCode '{elem.get('errorCode')}' becomes the id")
+                errors.append((elem.get("id"), elem.get("name")))
+            elif len(stack) == 1 and elem.tag == f"{BPMN}process":
+                processes.append(process)
+                process = None
+            elif len(stack) == 2 and process is not None:
+                process_id, nodes, flows, roles = process
+                if elem.tag == f"{BPMN}sequenceFlow":
+                    condition = elem.find(f"{BPMN}conditionExpression")
+                    text = condition.text.strip() if condition is not None and condition.text else None
+                    if condition is not None and condition.get("language"):
+                        _warn(path, f"{process_id}: script condition of flow '{elem.get('id')}' kept as an expression")
+                    flows.append((elem.get("sourceRef"), elem.get("targetRef"), text))
+                elif tag in ELEMENT_TYPES:
+                    nodes.append(_node(path, elem))
+                elif tag == "laneSet":
+                    for lane in elem.iter(f"{BPMN}lane"):
+                        for ref in lane.iterfind(f"{BPMN}flowNodeRef"):
+                            roles[(ref.text or "").strip()] = lane.get("name")
+                elif tag not in IGNORED:
+                    _warn(path, f"{process_id}: {tag} '{elem.get('id')}' is not supported, skipped")
+            # Top-level and process elements are in the records by now, and diagram shapes are not
+            # needed: drop them from their parent so the parsed tree never grows
+            if parent is not None and (len(stack) <= 2 or parent.tag == PLANE):
+                del parent[:]
+
+    for process_id, nodes, flows, roles in processes:
+        if not process_id.endswith("_process"):
+            _warn(path, f"process '{process_id}' will be generated as '{process_id}_process'")
+        yield _process_name(process_id), _process_rows(path, process_id, nodes, flows, roles, errors)
+
+def find_bpmn_files(paths):
+    """
+    Returns:
+        list: The BPMN files among `paths`, with folders expanded to their *.bpmn files, sorted.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.bpmn"))))
+        else:
+            files.append(path)
+    return files
+
+def import_sheets(paths):
+    """
+    Yields (sheet name, rows) for every process of every file, skipping process ids seen before.
+    """
+    names = set()
+    for path in find_bpmn_files(paths):
+        for name, rows in read_bpmn(path):
+            if name in names:
+                _warn(path, f"sheet '{name}' was already imported from another file, skipped")
+                continue
+            names.add(name)
+            yield name, rows
+
+def write_sheets(output, sheets):
+    """
+    Writes (sheet name, rows) pairs to `output` in the workbook's column layout: one sheet per process
+    for .xlsx, a leading Sheet column for .csv and .jsonl, which are written as the sheets come in.
+    Returns:
+        int: The number of sheets written.
+    """
+    extension = os.path.splitext(output)[1].lower()
+    count = 0
+    if extension == ".xlsx":
+        sheets = iter(sheets)
+        first = next(sheets, None)
+        if first is None: # openpyxl cannot save a workbook without sheets
+            raise ValueError(f"No processes to write to '{output}'")
+        sheets = itertools.chain([first], sheets)
+        with pd.ExcelWriter(output, engine="openpyxl") as writer:
+            for name, rows in sheets:
+                if len(name) > EXCEL_SHEET_NAME_LIMIT:
+                    _warn(output, f"sheet name '{name}' is longer than Excel allows, write .jsonl or .csv to keep the process id")
+                pd.DataFrame(rows, columns=WORKBOOK_COLUMNS, dtype=object).to_excel(writer, sheet_name=name[:EXCEL_SHEET_NAME_LIMIT], index=False)
+                count += 1
+    elif extension == ".jsonl":
+        with open(output, "w", encoding="utf-8") as f:
+            for name, rows in sheets:
+                for row in rows:
+                    record = {SHEET_COLUMN: name, **{column: row[column] for column in WORKBOOK_COLUMNS if row.get(column) is not None}}
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+    elif extension == ".csv":
+        with open(output, "w", encoding="utf-8", newline="") as f:
+            for name, rows in sheets:
+                df = pd.DataFrame(rows, columns=WORKBOOK_COLUMNS, dtype=object) # keeps Seq and Next ints next to empty cells
+                df.insert(0, SHEET_COLUMN, name)
+                df.to_csv(f, header=count == 0, index=False)
+                count += 1
+    else:
+        raise ValueError(f"Unsupported output '{output}', expected .xlsx, .csv or .jsonl")
+    return count
+
+def verify(path, written, layout="layered"):
+    """
+    Regenerates every process of a BPMN file from the rows read back from the written workbook and
+    compares the XML with the file, so what the writer loses shows up too.
+    Args:
+        written (dict): Sheet name to its rows as read from the output, see sources.read_sheets.
+    Returns:
+        list: (sheet name, identical) per process.
+    """
+    with open(path, encoding="utf-8") as f:
+        original = f.read()
+    results = []
+    for name, _ in read_bpmn(path):
+        if name not in written:
+            _warn(path, f"sheet '{name}' is not in the written workbook")
+            results.append((name, False))
+            continue
+        try:
+            xml = wg.generate_workflow(name, written[name], layout=layout).to_pretty_xml()
+        except ValueError as e:
+            _warn(path, f"sheet '{name}' does not generate: {e}")
+            results.append((name, False))
+            continue
+        results.append((name, xml == original))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import BPMN files into workbook rows, the reverse of workflows_gen.py")
+    parser.add_argument("paths", nargs="*", default=["generated"], help="BPMN files or folders of them (default: generated)")
+    parser.add_argument("--output", "-o", default="imported.xlsx", help="the workbook to write: .xlsx, .csv or .jsonl (default: imported.xlsx)")
+    parser.add_argument("--verify", action="store_true", help="regenerate every imported process and compare it with its file")
+    parser.add_argument("--layout", choices=wg.LAYOUTS, default="layered", help="diagram layout used by --verify (default: layered)")
+    parser.add_argument("--verbose", "-v", action="count", default=0, help="log progress (-v) or everything (-vv)")
+    args = parser.parse_args()
+
+    configure_logging(args.verbose)
+    files = find_bpmn_files(args.paths)
+    try:
+        count = write_sheets(args.output, import_sheets(files))
+    except (OSError, ValueError, ET.ParseError) as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+    warnings = stats.counters.get("import_warnings", 0)
+    print(f"Imported {count} processes ({stats.counters.get('elements_imported', 0)} elements) from {len(files)} files "
+          f"into {args.output}, {warnings} warning(s).")
+    if args.verify:
+        written = dict(read_sheets(args.output))
+        results = [result for path in files for result in verify(path, written, args.layout)]
+        different = [name for name, identical in results if not identical]
+        print(f"Verified {len(results)} processes: {len(results) - len(different)} regenerate byte-identical.")
+        for name in different:
+            print(f"Different: {name}")
@@ -0,0 +1,235 @@
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import xml.etree.ElementTree as ET
+import requests
+from requests.adapters import HTTPAdapter
+from instrumentation import configure_logging
+
+BPMN_NS = "http://www.omg.org/spec/BPMN/20100524/MODEL"
+
+ENGINE_URL = "http://localhost:8080/engine-rest"
+DEFAULT_AUTH = ("demo", "demo")
+DEPLOYMENT_NAME = "workflows-deployment"
+
+log = logging.getLogger("deploy")
+
+class BpmnFile:
+    """
+        A BPMN file to deploy, with the process keys it defines and the ones its callActivities call.
+    """
+    __slots__ = ("path", "name", "content", "digest", "process_ids", "called_elements")
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self.content = f.read()
+        self.digest = content_digest(self.content)
+
+        root = ET.fromstring(self.content)
+        self.process_ids = [process.get("id") for process in root.iter(f"{{{BPMN_NS}}}process")]
+        # Call activities into the file's own processes need no ordering
+        self.called_elements = {call.get("calledElement") for call in root.iter(f"{{{BPMN_NS}}}callActivity")
+                                if call.get("calledElement")} - set(self.process_ids)
+
+def content_digest(content):
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+def collect_files(paths):
+    """
+    Expands the given files and folders (all `*.bpmn` in a folder) into BpmnFiles, in name order.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.bpmn"))))
+        else:
+            files.append(path)
+    return [BpmnFile(path) for path in files]
+
+def make_session(auth=DEFAULT_AUTH, pool_size=10):
+    """
+    One keep-alive session for every request of a run, with room for `pool_size` concurrent connections.
+    """
+    session = requests.Session()
+    session.auth = auth
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def wait_until_ready(session, base_url=ENGINE_URL, timeout=120, interval=0.5):
+    """
+    Polls the engine until its REST API answers, instead of sleeping for a fixed time after it starts.
+    Returns:
+        float: Seconds it took for the engine to become ready.
+    Raises:
+        TimeoutError: If the engine did not answer within `timeout` seconds.
+    """
+    started = time.monotonic()
+    while True:
+        try:
+            if session.get(f"{base_url}/version", timeout=5).ok:
+                return time.monotonic() - started
+        except requests.RequestException:
+            pass
+        if time.monotonic() - started > timeout:
+            raise TimeoutError(f"Engine at {base_url} not ready after {timeout}s")
+        time.sleep(interval)
+
+def deployed_digest(session, base_url, key):
+    # sha256 of the XML the engine has for the latest version of `key`, None if there is none
+    response = session.get(f"{base_url}/process-definition/key/{key}/xml", timeout=30)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return content_digest(response.json().get("bpmn20Xml") or "")
+
+def is_unchanged(session, base_url, bpmn_file):
+    """
+    True if the engine already has exactly this file's content for every process it defines.
+    """
+    if not bpmn_file.process_ids:
+        return False
+    return all(deployed_digest(session, base_url, key) == bpmn_file.digest for key in bpmn_file.process_ids)
+
+def deployment_waves(files):
+    """
+    Orders files so that the processes named in calledElement are deployed before their callers.
+    Returns:
+        list: Waves (lists of BpmnFiles). Files in one wave do not call each other and can be deployed
+              together; every wave only calls processes from earlier waves or outside this run.
+              Files caught in a calling cycle go in a last wave together.
+    """
+    defined_in = {key: bpmn_file for bpmn_file in files for key in bpmn_file.process_ids}
+    depends_on = {bpmn_file.name: {defined_in[key].name for key in bpmn_file.called_elements if key in defined_in} - {bpmn_file.name}
+                  for bpmn_file in files}
+
+    waves = []
+    done = set()
+    remaining = list(files)
+    while remaining:
+        wave = [bpmn_file for bpmn_file in remaining if depends_on[bpmn_file.name] <= done]
+        if not wave:
+            names = ", ".join(bpmn_file.name for bpmn_file in remaining)
+            log.warning(f"calledElement cycle between {names}; deploying them together.")
+            wave = remaining
+        waves.append(wave)
+        done.update(bpmn_file.name for bpmn_file in wave)
+        remaining = [bpmn_file for bpmn_file in remaining if bpmn_file.name not in done]
+    return waves
+
+def create_deployment(session, base_url, name, files):
+    """
+    Deploys the files in a single multipart `deployment/create` request.
+    Returns:
+        dict: The engine's deployment response.
+    """
+    data = {
+        "deployment-name": name,
+        "deploy-changed-only": "true",
+        "deployment-source": "deploy.py",
+    }
+    multipart = [(bpmn_file.name, (bpmn_file.name, bpmn_file.content, "application/xml")) for bpmn_file in files]
+    response = session.post(f"{base_url}/deployment/create", data=data, files=multipart, timeout=120)
+    response.raise_for_status()
+    return response.json()
+
+def deploy(files, base_url=ENGINE_URL, session=None, name=DEPLOYMENT_NAME, batch_size=50, concurrency=4, force=False):
+    """
+    Deploys BPMN files to the engine, skipping the ones it already has.
+    Files are compared with the engine by content hash first (concurrently, over the pooled session;
+    a file that cannot be compared is deployed), then deployed wave by wave in calledElement order.
+    Each wave is split into multipart deployments of up to `batch_size` files, of which up to
+    `concurrency` are in flight at a time. Every deployment of a run has the same `name`: the engine's
+    deploy-changed-only compares a resource only with the latest one deployed under the same
+    deployment name, so the name must not depend on which files are being deployed.
+    Args:
+        files (list): BpmnFiles, see collect_files.
+        base_url (str): The engine-rest base URL.
+        session (requests.Session): Reused when given, see make_session.
+        name (str): Deployment name, the same for every run.
+        batch_size (int): Maximum files per deployment.
+        concurrency (int): Maximum concurrent requests.
+        force (bool): Upload every file, without comparing hashes first.
+    Returns:
+        tuple: (deployed, unchanged, failures) where deployed and unchanged list file names and failures
+               maps file name to the error message.
+    """
+    session = session or make_session(pool_size=concurrency)
+
+    def compare(bpmn_file):
+        # A file that cannot be compared is uploaded; deploy-changed-only still skips it if the engine
+        # got the same content under this deployment name before
+        try:
+            return is_unchanged(session, base_url, bpmn_file)
+        except requests.RequestException as e:
+            log.warning(f"Could not compare '{bpmn_file.name}' with the engine ({e}); deploying it.")
+            return False
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        if force:
+            same = [False] * len(files)
+        else:
+            same = list(pool.map(compare, files))
+        pending = [bpmn_file for bpmn_file, unchanged in zip(files, same) if not unchanged]
+        unchanged = [bpmn_file.name for bpmn_file, unchanged in zip(files, same) if unchanged]
+
+        deployed = []
+        failures = {}
+        waves = deployment_waves(pending)
+        for wave_number, wave in enumerate(waves, start=1):
+            batches = [wave[i:i + batch_size] for i in range(0, len(wave), batch_size)]
+            futures = [pool.submit(create_deployment, session, base_url, name, batch) for batch in batches]
+            for batch, future in zip(batches, futures):
+                try:
+                    future.result()
+                    deployed.extend(bpmn_file.name for bpmn_file in batch)
+                except requests.RequestException as e:
+                    for bpmn_file in batch:
+                        failures[bpmn_file.name] = str(e)
+            if failures: # later waves may call what just failed
+                for later in waves[wave_number:]:
+                    for bpmn_file in later:
+                        failures[bpmn_file.name] = "Skipped after an earlier wave failed"
+                break
+
+    return deployed, unchanged, failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deploy generated BPMN files to the Camunda engine")
+    parser.add_argument("paths", nargs="*", default=["generated"], help="BPMN files or folders of them (default: generated)")
+    parser.add_argument("--url", default=ENGINE_URL, help=f"engine-rest base URL (default: {ENGINE_URL})")
+    parser.add_argument("--user", default=DEFAULT_AUTH[0], help="user name (default: demo)")
+    parser.add_argument("--password", default=DEFAULT_AUTH[1], help="password (default: demo)")
+    parser.add_argument("--name", default=DEPLOYMENT_NAME, help=f"deployment name (default: {DEPLOYMENT_NAME})")
+    parser.add_argument("--batch-size", type=int, default=50, help="maximum files per deployment (default: 50)")
+    parser.add_argument("--concurrency", type=int, default=4, help="maximum concurrent requests (default: 4)")
+    parser.add_argument("--wait", type=float, default=0, metavar="SECONDS", help="wait up to SECONDS for the engine to come up first")
+    parser.add_argument("--force", action="store_true", help="upload every file, even if the engine already has it")
+    parser.add_argument("--verbose", "-v", action="count", default=0, help="log progress (-v) or everything (-vv)")
+    args = parser.parse_args()
+    configure_logging(args.verbose)
+
+    session = make_session(auth=(args.user, args.password), pool_size=args.concurrency)
+    if args.wait:
+        print(f"Engine ready after {wait_until_ready(session, args.url, timeout=args.wait):.1f}s")
+
+    started = time.perf_counter()
+    files = collect_files(args.paths)
+    deployed, unchanged, failures = deploy(files, args.url, session, name=args.name, batch_size=args.batch_size,
+                                           concurrency=args.concurrency, force=args.force)
+
+    print(f"Deployed {len(deployed)} of {len(files)} files, {len(unchanged)} unchanged, "
+          f"in {time.perf_counter() - started:.2f}s.")
+    for name, error in failures.items():
+        print(f"Error: '{name}' failed: {error}")
+    if failures:
+        raise SystemExit(1)
@@ -0,0 +1,274 @@
+"""
+    Load-test stand-in for echo_flask_api.py: echoes the JSON posted by ConnectorServiceTasks, like the
+    Flask app, but on an asyncio HTTP/1.1 server with keep-alive, spread over several worker processes
+    sharing the port (SO_REUSEPORT).
+
+    Each request can be given artificial latency, a share of errors and a padded response size, either
+    one by one or through a named --profile. Only a sample of the requests is logged. GET /metrics
+    returns request and error counts and p50/p95/p99 latency over all workers, from a histogram kept
+    in shared memory.
+
+        python echo_async_api.py --workers 4 --profile typical
+        curl http://localhost:8081/metrics
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import time
+from http import HTTPStatus
+
+# Named request profiles: latency (ms), uniform jitter (+/- ms), error rate (0-1) and response padding (bytes)
+PROFILES = {
+    "echo": {"latency": 0, "jitter": 0, "error_rate": 0.0, "payload_size": 0},
+    "fast": {"latency": 5, "jitter": 2, "error_rate": 0.0, "payload_size": 0},
+    "typical": {"latency": 50, "jitter": 25, "error_rate": 0.01, "payload_size": 1024},
+    "slow": {"latency": 500, "jitter": 250, "error_rate": 0.02, "payload_size": 16384},
+    "flaky": {"latency": 50, "jitter": 25, "error_rate": 0.2, "payload_size": 0},
+}
+
+# Latency histogram: bucket i counts requests that took up to HISTOGRAM_BASE_US * HISTOGRAM_GROWTH**i
+# microseconds, so percentiles are within 5% of the real value from 10us up to about an hour
+HISTOGRAM_BASE_US = 10
+HISTOGRAM_GROWTH = 1.05
+HISTOGRAM_BUCKETS = 400
+REQUESTS, ERRORS = 0, 1 # counter slots at the start of each worker's row in the shared array
+ROW_SIZE = 2 + HISTOGRAM_BUCKETS
+
+MAX_HEADER_SIZE = 65536
+MAX_BODY_SIZE = 1 << 20 # larger request bodies get a 413, the echoed calls are small JSON documents
+
+log = logging.getLogger("echo_async_api")
+
+def bucket_of(latency_us):
+    if latency_us <= HISTOGRAM_BASE_US:
+        return 0
+    return min(HISTOGRAM_BUCKETS - 1, math.ceil(math.log(latency_us / HISTOGRAM_BASE_US, HISTOGRAM_GROWTH)))
+
+def bucket_upper_ms(bucket):
+    return HISTOGRAM_BASE_US * HISTOGRAM_GROWTH ** bucket / 1000
+
+class Metrics:
+    """
+        Request counters and latency histogram of every worker, in one shared-memory array with a row
+        per worker. A worker only ever writes its own row, so no lock is needed; /metrics sums the rows.
+    """
+    def __init__(self, workers):
+        self.workers = workers
+        self.counts = multiprocessing.RawArray("Q", workers * ROW_SIZE)
+        self.row = 0
+
+    def record(self, latency_us, error):
+        offset = self.row * ROW_SIZE
+        self.counts[offset + REQUESTS] += 1
+        if error:
+            self.counts[offset + ERRORS] += 1
+        self.counts[offset + 2 + bucket_of(latency_us)] += 1
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Request and error counts and latency percentiles in milliseconds, over all workers.
+        """
+        totals = [0] * ROW_SIZE
+        for worker in range(self.workers):
+            row = self.counts[worker * ROW_SIZE:(worker + 1) * ROW_SIZE]
+            totals = [total + value for total, value in zip(totals, row)]
+        histogram = totals[2:]
+        requests = sum(histogram)
+        result = {"workers": self.workers, "requests": totals[REQUESTS], "errors": totals[ERRORS]}
+        for name, quantile in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            result[name] = None
+            if requests:
+                rank, seen = math.ceil(quantile * requests), 0
+                for bucket, count in enumerate(histogram):
+                    seen += count
+                    if seen >= rank:
+                        result[name] = round(bucket_upper_ms(bucket), 3)
+                        break
+        return result
+
+class EchoServer:
+    def __init__(self, metrics, latency=0, jitter=0, error_rate=0.0, payload_size=0, log_sample=0.001):
+        self.metrics = metrics
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.payload_size = payload_size
+        self.log_sample = log_sample
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True: # keep-alive: serve requests until the client closes or asks us to
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, {"error": "Headers too large"}, False)
+                    break
+
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, path, version = (request_line.split(" ", 2) + ["", ""])[:3]
+                headers = {}
+                for line in header_lines:
+                    if line:
+                        key, _, value = line.partition(":")
+                        headers[key.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+
+                error, body = await self.read_body(reader, headers)
+                if error is not None: # the rest of the body is not read, so the connection cannot be reused
+                    await self.respond(writer, error, {"error": error.phrase}, False)
+                    break
+
+                status, payload = await self.dispatch(method, path.split("?")[0], body)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def read_body(reader, headers):
+        """
+        Reads the request body, chunked or of Content-Length bytes, up to MAX_BODY_SIZE.
+        Returns:
+            tuple: (None, body), or (the error status, None) for a Content-Length or chunk size that is
+                   not a non-negative number (400) or a body over MAX_BODY_SIZE (413).
+        """
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks, total = [], 0
+            while True:
+                size = (await reader.readuntil(b"\r\n")).split(b";")[0].strip()
+                if not size or any(c not in b"0123456789abcdefABCDEF" for c in size):
+                    return HTTPStatus.BAD_REQUEST, None
+                size = int(size, 16)
+                if size == 0:
+                    await reader.readuntil(b"\r\n")
+                    return None, b"".join(chunks)
+                total += size
+                if total > MAX_BODY_SIZE:
+                    return HTTPStatus.REQUEST_ENTITY_TOO_LARGE, None
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+
+        length = headers.get("content-length") or "0"
+        if not length.isdigit():
+            return HTTPStatus.BAD_REQUEST, None
+        if int(length) > MAX_BODY_SIZE:
+            return HTTPStatus.REQUEST_ENTITY_TOO_LARGE, None
+        return None, await reader.readexactly(int(length))
+
+    async def dispatch(self, method, path, body):
+        if path == "/metrics" and method == "GET":
+            return HTTPStatus.OK, self.metrics.snapshot()
+        if path == "/health" and method == "GET":
+            return HTTPStatus.OK, {"status": "UP"}
+        if path != "/":
+            return HTTPStatus.NOT_FOUND, {"error": f"No route for {path}"}
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"Method {method} not allowed"}
+        return await self.echo(body)
+
+    async def echo(self, body):
+        started = time.perf_counter()
+        status = HTTPStatus.OK
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            status, payload = HTTPStatus.BAD_REQUEST, {"error": "Body is not valid JSON"}
+
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if status == HTTPStatus.OK and random.random() < self.error_rate:
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Injected failure"}
+        elif status == HTTPStatus.OK and self.payload_size:
+            payload = {"echo": payload, "padding": "x" * self.payload_size}
+
+        self.metrics.record((time.perf_counter() - started) * 1e6, status != HTTPStatus.OK)
+        if random.random() < self.log_sample: # sampled, a log line per request would be the bottleneck
+            log.info(f"Received payload: {body[:200]!r} -> {status.value}")
+        return status, payload
+
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode("utf-8")
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+def run_worker(row, metrics, host, port, options):
+    metrics.row = row
+    server = EchoServer(metrics, **options)
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # the parent stops the workers
+
+    async def serve():
+        listener = await asyncio.start_server(server.handle_connection, host, port, reuse_port=metrics.workers > 1,
+                                              limit=MAX_HEADER_SIZE, backlog=1024)
+        async with listener:
+            await listener.serve_forever()
+
+    asyncio.run(serve())
+
+def serve(host="0.0.0.0", port=8081, workers=1, **options):
+    """
+    Starts `workers` processes serving on the same port and waits for them until Ctrl+C.
+    Args:
+        options: latency, jitter, error_rate, payload_size and log_sample, see EchoServer.
+    """
+    if workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        print("Warning: SO_REUSEPORT is not available on this platform, running a single worker.")
+        workers = 1
+    metrics = Metrics(workers)
+    if workers == 1:
+        try:
+            run_worker(0, metrics, host, port, options)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=run_worker, args=(row, metrics, host, port, options), daemon=True)
+                 for row in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="High-throughput echo service for ConnectorServiceTask load tests")
+    parser.add_argument("--host", default="0.0.0.0", help="interface to listen on (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=8081, help="port to listen on (default: 8081)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: one per CPU)")
+    parser.add_argument("--profile", choices=PROFILES, default="echo", help="preset for the options below (default: echo)")
+    parser.add_argument("--latency", type=float, help="added latency per request in ms")
+    parser.add_argument("--jitter", type=float, help="uniform +/- jitter on the latency in ms")
+    parser.add_argument("--error-rate", type=float, help="share of requests answered with a 500, 0 to 1")
+    parser.add_argument("--payload-size", type=int, help="pad each response with this many bytes, 0 to echo as is")
+    parser.add_argument("--log-sample", type=float, default=0.001, help="share of requests that are logged (default: 0.001)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(message)s")
+    options = dict(PROFILES[args.profile])
+    for option in options:
+        if getattr(args, option) is not None:
+            options[option] = getattr(args, option)
+    print(f"Serving on {args.host}:{args.port} with {args.workers} worker(s), {options}")
+    serve(args.host, args.port, args.workers, log_sample=args.log_sample, **options)
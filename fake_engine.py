@@ -0,0 +1,454 @@
+"""
+    An in-memory stand-in for the parts of the Camunda engine-rest API that deploy.py and
+    load_driver.py use, to try deployments and load tests without Docker:
+
+        GET  /engine-rest/version
+        POST /engine-rest/deployment/create
+        GET  /engine-rest/deployment
+        GET  /engine-rest/process-definition
+        GET  /engine-rest/process-definition/key/{key}/xml
+        POST /engine-rest/process-definition/key/{key}/start
+        GET  /engine-rest/process-instance/{id}
+        GET  /engine-rest/task                  processDefinitionKey(In), processInstanceId, taskDefinitionKey,
+                                                firstResult, maxResults
+        GET  /engine-rest/task/count
+        GET  /engine-rest/task/{id}
+        POST /engine-rest/task/{id}/complete
+        POST /engine-rest/history/process-instance   processInstanceIds, processDefinitionKey, finished, unfinished
+
+    Started processes really run, one token per path, with what the generator emits: start and end
+    events, user tasks (wait for /complete), service tasks (done at once, the connector is not called),
+    exclusive gateways (JUEL conditions such as `${approved == true}`, with &&, ||, ! and comparisons),
+    call activities with camunda:in/out variables, and error end events caught by the error boundary
+    events of the calling activity. Unlike the engine, a command that fails (say, no gateway condition
+    is true) is not rolled back.
+"""
+from flask import Flask, request, jsonify
+import argparse
+import ast
+import logging
+import re
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from werkzeug.serving import make_server
+
+BPMN_NS = "http://www.omg.org/spec/BPMN/20100524/MODEL"
+CAMUNDA_NS = "http://camunda.org/schema/1.0/bpmn"
+MAX_STEPS = 200 # activities entered by one command without reaching a wait state, to stop endless loops
+
+app = Flask(__name__)
+logging.basicConfig(level=logging.INFO)
+
+lock = threading.Lock()
+deployments = [] # in creation order
+resources = {} # (deployment name, source, resource name) to the content of its latest deployment
+definitions = {} # process key to its versions, oldest first
+ready_at = 0.0 # engine answers 503 until then, see --startup-delay
+models = {} # process definition id to its ProcessModel, parsed on the first start
+instances = {} # running process instances by id
+tasks = {} # open user tasks by id, in creation order
+history = {} # finished process instances by id
+
+class EngineError(Exception):
+    """
+        A command the engine would refuse or fail on, answered with 500 like the engine does.
+    """
+
+class ProcessModel:
+    """
+        What the fake executes of a process definition: the kind of each flow node, the outgoing flows
+        with their conditions, the error boundary events of each activity, the error codes of the
+        error end events and the called element and variable mappings of call activities.
+    """
+    def __init__(self, content, key):
+        root = ET.fromstring(content)
+        process = next(process for process in root.iter(f"{{{BPMN_NS}}}process") if process.get("id") == key)
+        error_codes = {error.get("id"): error.get("errorCode") or error.get("id") for error in root.iter(f"{{{BPMN_NS}}}error")}
+        self.kinds = {} # node id to its tag, e.g. userTask
+        self.names = {}
+        self.form_keys = {}
+        self.outgoing = {} # node id to [(flow id, target id, condition or None)]
+        self.defaults = {} # gateway id to its default flow id
+        self.boundaries = {} # activity id to [(boundary event id, error code or None for any)]
+        self.errors = {} # error end event id to its error code
+        self.calls = {} # call activity id to (called element, in mappings, out mappings), "all" for variables="all"
+        self.start = None
+        for element in process:
+            kind = element.tag.rpartition("}")[2]
+            id = element.get("id")
+            if kind == "sequenceFlow":
+                condition = element.find(f"{{{BPMN_NS}}}conditionExpression")
+                condition = condition.text.strip() if condition is not None and condition.text else None
+                self.outgoing.setdefault(element.get("sourceRef"), []).append((id, element.get("targetRef"), condition))
+                continue
+            if id is None or kind in ("extensionElements", "documentation", "laneSet", "textAnnotation", "association"):
+                continue
+            self.kinds[id] = kind
+            self.names[id] = element.get("name")
+            self.form_keys[id] = element.get(f"{{{CAMUNDA_NS}}}formKey")
+            definition = element.find(f"{{{BPMN_NS}}}errorEventDefinition")
+            code = error_codes.get(definition.get("errorRef"), definition.get("errorRef")) if definition is not None else None
+            if kind == "startEvent" and self.start is None:
+                self.start = id
+            elif kind == "endEvent" and definition is not None:
+                self.errors[id] = code
+            elif kind == "boundaryEvent" and definition is not None:
+                self.boundaries.setdefault(element.get("attachedToRef"), []).append((id, code))
+            elif kind == "exclusiveGateway" and element.get("default"):
+                self.defaults[id] = element.get("default")
+            elif kind == "callActivity":
+                mappings = {"in": [], "out": []}
+                for direction in mappings:
+                    for mapping in element.iter(f"{{{CAMUNDA_NS}}}{direction}"):
+                        if mapping.get("variables") == "all":
+                            mappings[direction] = "all"
+                        elif mapping.get("source") and mapping.get("target") and mappings[direction] != "all":
+                            mappings[direction].append((mapping.get("source"), mapping.get("target")))
+                self.calls[id] = (element.get("calledElement"), mappings["in"], mappings["out"])
+        if self.start is None:
+            raise EngineError(f"Process '{key}' has no start event")
+
+# JUEL operators and literals as Python, for conditions such as ${approved == true && !(amount > 1000)}
+JUEL_TOKENS = re.compile(r"&&|\|\||!(?!=)|\b(?:eq|ne|lt|gt|le|ge|true|false|null)\b|'[^']*'|\"[^\"]*\"")
+JUEL_PYTHON = {"&&": " and ", "||": " or ", "!": " not ", "eq": "==", "ne": "!=", "lt": "<", "gt": ">", "le": "<=", "ge": ">=",
+               "true": "True", "false": "False", "null": "None"}
+COMPARISONS = {ast.Eq: lambda a, b: a == b, ast.NotEq: lambda a, b: a != b, ast.Lt: lambda a, b: a < b,
+               ast.LtE: lambda a, b: a <= b, ast.Gt: lambda a, b: a > b, ast.GtE: lambda a, b: a >= b}
+
+def evaluate(expression, variables):
+    """
+    Evaluates a `${...}` condition against the variables of an instance. Only variables, literals,
+    comparisons, &&, || and ! are supported; nothing is called, so deployed XML cannot run code here.
+    Raises:
+        EngineError: If the expression uses an unknown variable or anything else.
+    """
+    text = expression.strip()
+    if text[:2] in ("${", "#{") and text.endswith("}"):
+        text = text[2:-1]
+    python = JUEL_TOKENS.sub(lambda match: JUEL_PYTHON.get(match.group(0), match.group(0)), text)
+
+    def value(node):
+        if isinstance(node, ast.Expression):
+            return value(node.body)
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id not in variables:
+                raise EngineError(f"Unknown property used in expression: {expression}. Cannot resolve identifier '{node.id}'")
+            return variables[node.id]
+        if isinstance(node, ast.BoolOp):
+            values = (value(operand) for operand in node.values)
+            return all(values) if isinstance(node.op, ast.And) else any(values)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+            return not value(node.operand) if isinstance(node.op, ast.Not) else -value(node.operand)
+        if isinstance(node, ast.Compare) and all(type(op) in COMPARISONS for op in node.ops):
+            left = value(node.left)
+            for op, comparator in zip(node.ops, node.comparators):
+                right = value(comparator)
+                if not COMPARISONS[type(op)](left, right):
+                    return False
+                left = right
+            return True
+        raise EngineError(f"Unsupported expression: {expression}")
+
+    try:
+        return bool(value(ast.parse(python, mode="eval")))
+    except (SyntaxError, TypeError) as e:
+        raise EngineError(f"Cannot evaluate expression {expression}: {e}") from None
+
+def timestamp(seconds):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + f".{int(seconds * 1000) % 1000:03d}+0000"
+
+def variable_values(variables):
+    # {"approved": {"value": true, "type": "Boolean"}} to {"approved": True}
+    return {name: (variable or {}).get("value") for name, variable in (variables or {}).items()}
+
+def latest_definition(key):
+    versions = definitions.get(key)
+    if not versions:
+        raise EngineError(f"No process definition with key '{key}' is deployed")
+    definition = versions[-1]
+    if definition["id"] not in models:
+        models[definition["id"]] = ProcessModel(definition["bpmn20Xml"], key)
+    return definition
+
+def start_instance(definition, variables, business_key=None, parent=None, steps=0):
+    # Every function below runs under `lock` and returns once each token waits or has ended
+    instance = {"id": str(uuid.uuid4()), "definitionId": definition["id"], "key": definition["key"], "businessKey": business_key,
+                "model": models[definition["id"]], "variables": dict(variables), "tokens": 1, "tasks": set(), "children": set(),
+                "parent": parent, "started": time.time()}
+    instances[instance["id"]] = instance
+    enter(instance, instance["model"].start, steps)
+    return instance
+
+def enter(instance, node, steps):
+    if steps > MAX_STEPS:
+        raise EngineError(f"Process '{instance['key']}' ran {MAX_STEPS} steps without reaching a wait state, at '{node}'")
+    model = instance["model"]
+    kind = model.kinds.get(node)
+    if kind is None:
+        raise EngineError(f"Process '{instance['key']}' has no activity '{node}'")
+    if kind == "userTask":
+        task = {"id": str(uuid.uuid4()), "name": model.names[node], "taskDefinitionKey": node, "formKey": model.form_keys[node],
+                "processInstanceId": instance["id"], "processDefinitionId": instance["definitionId"],
+                "assignee": None, "created": timestamp(time.time()), "suspended": False}
+        tasks[task["id"]] = task
+        instance["tasks"].add(task["id"])
+    elif kind == "callActivity":
+        called, mappings, _ = model.calls[node]
+        variables = instance["variables"] if mappings == "all" else {target: instance["variables"].get(source) for source, target in mappings}
+        child = start_instance(latest_definition(called), variables, parent=(instance["id"], node), steps=steps + 1)
+        if child["id"] in instances: # it may have ended right away, see end_token
+            instance["children"].add(child["id"])
+    elif kind == "endEvent":
+        end_token(instance, model.errors.get(node), steps)
+    else: # start events, service tasks, gateways and anything else pass straight through
+        leave(instance, node, steps)
+
+def leave(instance, node, steps):
+    model = instance["model"]
+    flows = model.outgoing.get(node, [])
+    if model.kinds[node] == "exclusiveGateway": # the first flow that is true, else the default one
+        default = model.defaults.get(node)
+        taken = [target for flow, target, condition in flows
+                 if flow != default and (condition is None or evaluate(condition, instance["variables"]))][:1]
+        taken = taken or [target for flow, target, _ in flows if flow == default]
+        if not taken:
+            raise EngineError(f"ENGINE-02004 No outgoing sequence flow for the element with id '{node}' could be selected for continuing the process.")
+    else: # unconditional flows and the conditional ones that are true are all taken, in parallel
+        taken = [target for _, target, condition in flows if condition is None or evaluate(condition, instance["variables"])]
+    if not taken:
+        end_token(instance, None, steps)
+        return
+    instance["tokens"] += len(taken) - 1
+    for target in taken:
+        if instance["id"] in instances: # an error end event on an earlier path may have ended the instance
+            enter(instance, target, steps + 1)
+
+def end_token(instance, error_code, steps):
+    if error_code is not None and instance["parent"]:
+        parent = instances[instance["parent"][0]]
+        activity = instance["parent"][1]
+        for boundary, code in parent["model"].boundaries.get(activity, []):
+            if code is None or code == error_code:
+                cancel(instance, "INTERNALLY_TERMINATED")
+                parent["children"].discard(instance["id"])
+                leave(parent, boundary, steps + 1)
+                return
+    # an error nobody catches ends its path like a none end event, as in the engine
+    instance["tokens"] -= 1
+    if instance["tokens"] > 0:
+        return
+    finish(instance, "COMPLETED")
+    if instance["parent"]:
+        parent = instances[instance["parent"][0]]
+        activity = instance["parent"][1]
+        parent["children"].discard(instance["id"])
+        mappings = parent["model"].calls[activity][2]
+        if mappings == "all":
+            parent["variables"].update(instance["variables"])
+        else:
+            parent["variables"].update({target: instance["variables"].get(source) for source, target in mappings})
+        leave(parent, activity, steps + 1)
+
+def cancel(instance, state):
+    for task_id in instance["tasks"]:
+        tasks.pop(task_id, None)
+    for child_id in list(instance["children"]):
+        if child_id in instances:
+            cancel(instances[child_id], state)
+    finish(instance, state)
+
+def history_record(instance):
+    return {"id": instance["id"], "processDefinitionId": instance["definitionId"], "processDefinitionKey": instance["key"],
+            "businessKey": instance["businessKey"], "superProcessInstanceId": instance["parent"][0] if instance["parent"] else None,
+            "startTime": timestamp(instance["started"]), "endTime": None, "durationInMillis": None, "state": "ACTIVE"}
+
+def finish(instance, state):
+    ended = time.time()
+    del instances[instance["id"]]
+    record = history_record(instance)
+    record.update({"endTime": timestamp(ended), "durationInMillis": round((ended - instance["started"]) * 1000), "state": state})
+    history[instance["id"]] = record
+
+def not_found(message):
+    return jsonify({"type": "RestException", "message": message}), 404
+
+@app.before_request
+def starting_up():
+    if time.monotonic() < ready_at:
+        return jsonify({"type": "RestException", "message": "Engine is starting"}), 503
+
+@app.route('/engine-rest/version', methods=['GET'])
+def version():
+    return jsonify({"version": "7.20.0"})
+
+@app.route('/engine-rest/deployment/create', methods=['POST'])
+def create_deployment():
+    name = request.form.get("deployment-name")
+    source = request.form.get("deployment-source")
+    changed_only = request.form.get("deploy-changed-only") == "true"
+    deployment = {"id": str(uuid.uuid4()), "name": name, "source": source,
+                  "deploymentTime": time.strftime("%Y-%m-%dT%H:%M:%S.000+0000", time.gmtime())}
+
+    with lock:
+        deployed = {}
+        for upload in request.files.values():
+            content = upload.read().decode("utf-8")
+            # Like the engine, only deployments with the same name and source count as "already deployed"
+            if changed_only and resources.get((name, source, upload.filename)) == content:
+                continue
+            resources[(name, source, upload.filename)] = content
+            for process in ET.fromstring(content).iter(f"{{{BPMN_NS}}}process"):
+                key = process.get("id")
+                versions = definitions.setdefault(key, [])
+                definition = {"id": f"{key}:{len(versions) + 1}:{deployment['id']}", "key": key, "version": len(versions) + 1,
+                              "deploymentId": deployment["id"], "resource": upload.filename, "bpmn20Xml": content}
+                versions.append(definition)
+                deployed[definition["id"]] = {k: v for k, v in definition.items() if k != "bpmn20Xml"}
+        deployment["deployedProcessDefinitions"] = deployed or None
+        deployments.append(deployment)
+
+    app.logger.info(f"Deployment '{name}': {len(deployed)} process definition(s)")
+    return jsonify(deployment)
+
+@app.route('/engine-rest/deployment', methods=['GET'])
+def list_deployments():
+    with lock:
+        return jsonify([{k: v for k, v in deployment.items() if k != "deployedProcessDefinitions"} for deployment in deployments])
+
+@app.route('/engine-rest/process-definition', methods=['GET'])
+def list_process_definitions():
+    with lock:
+        return jsonify([{k: v for k, v in versions[-1].items() if k != "bpmn20Xml"} for versions in definitions.values()])
+
+@app.route('/engine-rest/process-definition/key/<key>/xml', methods=['GET'])
+def process_definition_xml(key):
+    with lock:
+        versions = definitions.get(key)
+        if not versions:
+            return not_found(f"No matching process definition with key: {key} and no tenant-id")
+        return jsonify({"id": versions[-1]["id"], "bpmn20Xml": versions[-1]["bpmn20Xml"]})
+
+@app.errorhandler(EngineError)
+def engine_error(error):
+    return jsonify({"type": "ProcessEngineException", "message": str(error)}), 500
+
+def instance_json(id):
+    # A started instance may have ended right away, then it is only in the history
+    record = history_record(instances[id]) if id in instances else history[id]
+    return {"id": id, "definitionId": record["processDefinitionId"], "businessKey": record["businessKey"],
+            "ended": id not in instances, "suspended": False}
+
+@app.route('/engine-rest/process-definition/key/<key>/start', methods=['POST'])
+def start_process_instance(key):
+    body = request.get_json(silent=True) or {}
+    with lock:
+        if not definitions.get(key):
+            return not_found(f"No matching process definition with key: {key} and no tenant-id")
+        instance = start_instance(latest_definition(key), variable_values(body.get("variables")), body.get("businessKey"))
+        return jsonify(instance_json(instance["id"]))
+
+@app.route('/engine-rest/process-instance/<id>', methods=['GET'])
+def get_process_instance(id):
+    with lock:
+        if id not in instances: # like the engine: finished instances are only in the history
+            return not_found(f"Process instance with id {id} does not exist")
+        return jsonify(instance_json(id))
+
+def task_query():
+    # The open tasks matching the query parameters, in creation order
+    keys = set(filter(None, request.args.get("processDefinitionKeyIn", "").split(",")))
+    if request.args.get("processDefinitionKey"):
+        keys.add(request.args["processDefinitionKey"])
+    instance_id = request.args.get("processInstanceId")
+    definition_key = request.args.get("taskDefinitionKey")
+    for task in tasks.values():
+        if keys and task["processDefinitionId"].split(":", 1)[0] not in keys:
+            continue
+        if instance_id and task["processInstanceId"] != instance_id:
+            continue
+        if definition_key and task["taskDefinitionKey"] != definition_key:
+            continue
+        yield task
+
+@app.route('/engine-rest/task', methods=['GET'])
+def list_tasks():
+    first = request.args.get("firstResult", 0, type=int)
+    limit = request.args.get("maxResults", type=int)
+    with lock:
+        found = []
+        for number, task in enumerate(task_query()):
+            if limit is not None and len(found) >= limit:
+                break
+            if number >= first:
+                found.append(task)
+        return jsonify(found)
+
+@app.route('/engine-rest/task/count', methods=['GET'])
+def count_tasks():
+    with lock:
+        return jsonify({"count": sum(1 for _ in task_query())})
+
+@app.route('/engine-rest/task/<id>', methods=['GET'])
+def get_task(id):
+    with lock:
+        if id not in tasks:
+            return not_found(f"No matching task with id {id}")
+        return jsonify(tasks[id])
+
+@app.route('/engine-rest/task/<id>/complete', methods=['POST'])
+def complete_task(id):
+    body = request.get_json(silent=True) or {}
+    with lock:
+        task = tasks.pop(id, None)
+        if task is None:
+            return not_found(f"Cannot find task with id {id}")
+        instance = instances[task["processInstanceId"]]
+        instance["tasks"].discard(id)
+        instance["variables"].update(variable_values(body.get("variables")))
+        leave(instance, task["taskDefinitionKey"], 0)
+    return "", 204
+
+@app.route('/engine-rest/history/process-instance', methods=['POST'])
+def query_history():
+    body = request.get_json(silent=True) or {}
+    first = request.args.get("firstResult", 0, type=int)
+    limit = request.args.get("maxResults", type=int)
+    with lock:
+        ids = body.get("processInstanceIds") or list(history) + list(instances)
+        found = []
+        for id in ids:
+            if id in history and not body.get("unfinished"):
+                record = history[id]
+            elif id in instances and not body.get("finished"):
+                record = history_record(instances[id])
+            else:
+                continue
+            if body.get("processDefinitionKey") in (None, record["processDefinitionKey"]):
+                found.append(record)
+        return jsonify(found[first:None if limit is None else first + limit])
+
+def serve_in_background(host="127.0.0.1", port=0):
+    """
+    Serves the fake engine from a daemon thread of the calling process, e.g. for load_driver.py --fake.
+    Args:
+        port (int): 0 picks a free one.
+    Returns:
+        tuple: (server, engine-rest base URL); server.shutdown() stops it.
+    """
+    logging.getLogger("werkzeug").setLevel(logging.WARNING) # no log line per request
+    server = make_server(host, port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.port}/engine-rest"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake Camunda engine-rest API for local testing")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on (default: 8080)")
+    parser.add_argument("--startup-delay", type=float, default=0, help="answer 503 for this many seconds, like a booting engine")
+    args = parser.parse_args()
+
+    ready_at = time.monotonic() + args.startup_delay
+    app.run(host='0.0.0.0', port=args.port, threaded=True)
@@ -0,0 +1,304 @@
+"""
+    Generation as a service: upload a workbook, get its BPMN back.
+
+        POST /generate          every sheet: {"digest", "cached", "sheets": {name: {"file", "bpmn", "tasks"}},
+                                "errors": {name: {"message", "issues"}}}; 422 if a sheet failed
+        POST /generate/<sheet>  one sheet, as BPMN XML; 422 with its validation issues, 404 if not found
+        GET  /health
+        GET  /stats             cache and pool counters
+
+    The workbook is the `workbook` file of a multipart form (its extension picks the source, see
+    sources.py) or the raw request body with `?format=xlsx|csv|jsonl|parquet` (default xlsx).
+    A CSV, JSON Lines or Parquet upload without a Sheet column is one sheet named after the uploaded
+    file, as on the command line, or after `?name=` for a raw body (default "upload").
+    `?layout=linear` picks the diagram layout.
+
+    Generation runs in a bounded pool of worker processes, so a large upload never blocks the
+    requests behind it. The pool is started by the first upload (so the app also runs under a WSGI
+    server) and replaced if a worker dies. At most --max-pending generations are queued or running; further uploads
+    get 503 with a Retry-After header. Results are cached by a hash of the upload (plus sheet, layout
+    and generator version) in an LRU bounded by --cache-mb. Identical uploads that arrive while one
+    is still being generated wait for that one instead of generating again.
+
+        python gen_service.py --port 8082 --workers 4
+        curl -F workbook=@workflows.xlsx http://localhost:8082/generate
+        curl --data-binary @workflows.xlsx http://localhost:8082/generate/approval > approval.bpmn
+"""
+from flask import Flask, Response, request, jsonify
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import quote
+import workflows_gen as wg
+from sources import SOURCES, ExcelSource, open_source
+
+app = Flask(__name__)
+logging.basicConfig(level=logging.INFO)
+
+class ResultCache:
+    """
+        LRU cache of generation results, bounded by their total size in bytes rather than by count,
+        since one workbook may be a thousand times bigger than another.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict() # key to (result, size)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, result, size):
+        with self._lock:
+            if size > self.max_bytes or key in self._entries:
+                return
+            self._entries[key] = (result, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+# Set up in __main__, see the command line options
+workers = os.cpu_count() or 1
+cache = ResultCache(64 * 1024 * 1024)
+slots = threading.BoundedSemaphore(16) # generations queued or running
+timeout = 60.0
+lock = threading.Lock()
+inflight = {} # cache key to the Future of the generation in progress
+pool = None # see worker_pool
+pool_lock = threading.Lock()
+
+def worker_pool():
+    # The generator processes, started on first use rather than at import
+    global pool
+    with pool_lock:
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers)
+        return pool
+
+def discard_pool(broken):
+    # A worker died (e.g. killed for memory) and the pool refuses new jobs: the next upload starts a new one
+    global pool
+    with pool_lock:
+        if pool is broken:
+            pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def read_upload(source):
+    # Yields the sheets of the upload; a file that is not a workbook at all is an input error, like any other
+    try:
+        yield from source
+    except (zipfile.BadZipFile, KeyError) as e: # what openpyxl raises for a non-.xlsx or a zip without a workbook
+        raise ValueError(f"Not an .xlsx workbook: {e}") from e
+
+def generate_upload(content, extension, sheet=None, layout="layered", name="upload"):
+    """
+    Runs in a worker process: generates the sheets of an uploaded workbook. The result is encoded to
+    JSON here too, so the service only passes the text along and a cached response costs no encoding.
+    Args:
+        content (bytes): The uploaded file.
+        extension (str): Its extension, one of sources.SOURCES.
+        sheet (str): Only this sheet; None for all.
+        name (str): The uploaded file's name without extension; names the sheet of a CSV, JSON Lines or
+                    Parquet upload without a Sheet column.
+    Returns:
+        tuple: (JSON of {"sheets": {name: {"file", "bpmn", "tasks"}}, "errors": {name: {"message", "issues"}}},
+        names of the sheets that failed)
+    Raises:
+        ValueError: If the upload cannot be read as a workbook.
+    """
+    sheets, errors = {}, {}
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, f"{name}{extension}")
+        with open(path, "wb") as f:
+            f.write(content)
+        source = open_source(path)
+        if sheet is not None and isinstance(source, ExcelSource):
+            source.sheets = {sheet} # the other sheets are never read
+        for sheet_name, df in read_upload(source):
+            if sheet is not None and sheet_name != sheet:
+                continue
+            try:
+                wf = wg.generate_workflow(sheet_name, df, layout=layout)
+            except ValueError as e:
+                issues = [issue._asdict() for issue in wg.validate_sheet(sheet_name, df) if issue.severity == "error"]
+                errors[sheet_name] = {"message": str(e), "issues": issues}
+                continue
+            sheets[sheet_name] = {"file": f"{sheet_name}_generated.bpmn", "bpmn": wf.to_pretty_xml(), "tasks": wf.task_index()}
+    return json.dumps({"sheets": sheets, "errors": errors}), sorted(errors)
+
+def attachment(filename):
+    # Content-Disposition for any sheet name: a plain ASCII fallback plus the exact name, RFC 5987 encoded
+    fallback = re.sub(r"[^A-Za-z0-9._-]", "_", filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+def bad_request(message, status=400):
+    return jsonify({"error": message}), status
+
+def upload_name(filename):
+    # The file name without folders (either separator) and extension, safe to create in the temp folder
+    name = os.path.splitext(os.path.basename(filename.replace("\\", "/")))[0].strip()[:200]
+    return name if name.strip(".") else "upload"
+
+def upload():
+    # (content, extension, name) of the request's workbook, or a Flask error response
+    if request.mimetype == "multipart/form-data":
+        file = request.files.get("workbook")
+        if file is None:
+            return None, bad_request("No 'workbook' file in the form")
+        extension = os.path.splitext(file.filename or "")[1].lower() or ".xlsx"
+        name = upload_name(file.filename or "")
+        content = file.read()
+    else:
+        extension = "." + request.args.get("format", "xlsx").lower().lstrip(".")
+        name = upload_name(request.args.get("name", ""))
+        content = request.get_data(parse_form_data=False) # whatever the Content-Type says
+    if not content:
+        return None, bad_request("No workbook: send it as the 'workbook' file of a form or as the request body")
+    if extension not in SOURCES:
+        return None, bad_request(f"Unsupported format '{extension}', expected one of {', '.join(SOURCES)}")
+    return (content, extension, name), None
+
+def generate(sheet=None):
+    """
+    Returns the result for the uploaded workbook: from the cache, from an identical upload being
+    generated right now, or from a new job in the pool.
+    Returns:
+        tuple: ((JSON, failed sheets), cached, digest), or (None, error response, None).
+    """
+    received, error = upload()
+    if error:
+        return None, error, None
+    content, extension, name = received
+    layout = request.args.get("layout", "layered")
+    if layout not in wg.LAYOUTS:
+        return None, bad_request(f"Unknown layout '{layout}', expected one of {', '.join(wg.LAYOUTS)}"), None
+    digest = hashlib.sha256(content).hexdigest()
+    # Excel sheets are named inside the workbook; other formats may take their sheet name from the file's
+    label = "" if extension == ".xlsx" else name
+    key = f"{digest}:{extension}:{label}:{sheet or ''}:{layout}:{wg.GENERATOR_VERSION}"
+
+    result = cache.get(key)
+    if result is not None:
+        return result, True, digest
+
+    submitted = False
+    with lock:
+        future = inflight.get(key)
+        if future is None:
+            if not slots.acquire(blocking=False):
+                response = bad_request("Too many generations in progress, retry later", 503)
+                response[0].headers["Retry-After"] = "5"
+                return None, response, None
+            executor = worker_pool()
+            try:
+                try:
+                    future = executor.submit(generate_upload, content, extension, sheet, layout, name)
+                except RuntimeError: # BrokenProcessPool, or shut down meanwhile by discard_pool in another thread
+                    discard_pool(executor)
+                    executor = worker_pool()
+                    future = executor.submit(generate_upload, content, extension, sheet, layout, name)
+            except Exception as e: # no job, so no finished() to give the slot back
+                slots.release()
+                app.logger.exception(f"Could not submit upload {digest[:12]}")
+                return None, bad_request(f"Generation failed: {type(e).__name__}: {e}", 500), None
+            inflight[key] = future
+            submitted = True
+    if submitted: # outside the lock: the callback runs right here if the job is already done
+        future.add_done_callback(lambda done: finished(key, done, executor))
+    try:
+        return future.result(timeout=timeout), False, digest
+    except TimeoutError: # the job keeps running and still fills the cache
+        return None, bad_request(f"Generation takes longer than {timeout}s, retry later to get the cached result", 504), None
+    except ValueError as e:
+        app.logger.warning(f"Upload {digest[:12]} failed: {e}")
+        return None, bad_request(f"Could not read the workbook: {e}"), None
+    except Exception as e: # not the upload's fault: a worker died or the generator has a bug
+        app.logger.exception(f"Generation of upload {digest[:12]} failed")
+        return None, bad_request(f"Generation failed: {type(e).__name__}: {e}", 500), None
+
+def finished(key, future, executor):
+    slots.release()
+    with lock:
+        inflight.pop(key, None)
+    if isinstance(future.exception(), BrokenProcessPool):
+        discard_pool(executor)
+    elif future.exception() is None:
+        result = future.result()
+        cache.put(key, result, len(result[0]))
+
+@app.route('/generate', methods=['POST'])
+def generate_workbook():
+    result, cached, digest = generate()
+    if result is None:
+        return cached
+    encoded, failed = result
+    # Spliced rather than decoded and encoded again: a catalog's result can be tens of megabytes
+    body = f'{{"digest": "{digest}", "cached": {json.dumps(cached)}, {encoded[1:]}'
+    return Response(body, status=422 if failed else 200, mimetype="application/json")
+
+@app.route('/generate/<sheet>', methods=['POST'])
+def generate_single_sheet(sheet):
+    result, cached, digest = generate(sheet)
+    if result is None:
+        return cached
+    result = json.loads(result[0]) # one sheet only, small
+    if sheet in result["errors"]:
+        return jsonify({"digest": digest, "cached": cached, "sheet": sheet, **result["errors"][sheet]}), 422
+    if sheet not in result["sheets"]:
+        return bad_request(f"No sheet '{sheet}' in the workbook", 404)
+    generated = result["sheets"][sheet]
+    return Response(generated["bpmn"], mimetype="application/xml",
+                    headers={"Content-Disposition": attachment(generated["file"]), "X-Cache": "HIT" if cached else "MISS"})
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({"status": "ok"})
+
+@app.route('/stats', methods=['GET'])
+def service_stats():
+    with lock:
+        running = len(inflight)
+    return jsonify({"cache": cache.stats(), "inflight": running, "workers": workers, "generator_version": wg.GENERATOR_VERSION})
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="HTTP service that turns uploaded workbooks into BPMN")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=8082, help="port to listen on (default: 8082)")
+    parser.add_argument("--workers", type=int, default=0, help="generator worker processes, 0 for one per CPU (default: 0)")
+    parser.add_argument("--max-pending", type=int, default=16, help="generations queued or running before uploads get 503 (default: 16)")
+    parser.add_argument("--cache-mb", type=float, default=64, help="size of the result cache (default: 64)")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds a request waits for its generation before 504 (default: 60)")
+    parser.add_argument("--max-upload-mb", type=float, default=32, help="largest accepted upload (default: 32)")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    cache = ResultCache(int(args.cache_mb * 1024 * 1024))
+    slots = threading.BoundedSemaphore(args.max_pending)
+    timeout = args.timeout
+    app.config["MAX_CONTENT_LENGTH"] = int(args.max_upload_mb * 1024 * 1024)
+    app.run(host=args.host, port=args.port, threaded=True)
@@ -0,0 +1,130 @@
+"""
+    Logging setup, counters and stage timers for the generator, plus optional cProfile and tracemalloc
+    hooks whose results end up in a machine-readable JSON report.
+
+        from instrumentation import stats
+        with stats.timer("layout"):
+            ...
+        stats.count("elements")
+"""
+import contextlib
+import json
+import logging
+import time
+
+LOG_FORMAT = "%(levelname)s: %(message)s"
+PROFILE_TOP = 30 # functions listed in the report, by cumulative time
+MEMORY_TOP = 20 # allocation sites listed in the report, by size
+
+def configure_logging(verbosity=0):
+    """
+    Quiet by default: only warnings and errors. verbosity 1 adds progress (INFO), 2 everything (DEBUG).
+    """
+    level = {0: logging.WARNING, 1: logging.INFO}.get(verbosity, logging.DEBUG)
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+class Stats:
+    """
+        Named counters and accumulating timers. Cheap enough for hot paths: a dict update per call.
+        Worker processes send their snapshot back, which the parent merges.
+    """
+    def __init__(self):
+        self.counters = {}
+        self.timers = {} # name to [seconds, calls]
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name, seconds):
+        timer = self.timers.setdefault(name, [0.0, 0])
+        timer[0] += seconds
+        timer[1] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def reset(self):
+        self.counters.clear()
+        self.timers.clear()
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: {"counters": {name: n}, "timers": {name: {"seconds": s, "calls": n}}}, JSON-ready.
+        """
+        return {
+            "counters": dict(sorted(self.counters.items())),
+            "timers": {name: {"seconds": round(seconds, 6), "calls": calls} for name, (seconds, calls) in sorted(self.timers.items())},
+        }
+
+    def merge(self, snapshot):
+        for name, n in snapshot["counters"].items():
+            self.count(name, n)
+        for name, timer in snapshot["timers"].items():
+            current = self.timers.setdefault(name, [0.0, 0])
+            current[0] += timer["seconds"]
+            current[1] += timer["calls"]
+
+    def summary(self):
+        """
+        Returns:
+            str: The counters and timers, one per line, for the console.
+        """
+        lines = [f"{name:<24}{n:>12}" for name, n in sorted(self.counters.items())]
+        lines += [f"{name:<24}{seconds:>11.3f}s  ({calls} calls)" for name, (seconds, calls) in sorted(self.timers.items())]
+        return "\n".join(lines)
+
+stats = Stats()
+
+@contextlib.contextmanager
+def profiled(report, profile=False, trace_memory=False):
+    """
+    Runs the block under cProfile and/or tracemalloc and adds what they found to `report` (a dict):
+    "profile" lists the PROFILE_TOP functions by cumulative time, "memory" the peak traced memory and
+    the MEMORY_TOP allocation sites still alive at the end.
+    """
+    # Imported here: most runs are neither profiled nor traced
+    if profile:
+        import cProfile
+    if trace_memory:
+        import tracemalloc
+    profiler = cProfile.Profile() if profile else None
+    if trace_memory:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield report
+    finally:
+        if profiler:
+            profiler.disable()
+            report["profile"] = profile_rows(profiler)
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report["memory"] = {
+                "current_mb": round(current / 1e6, 3),
+                "peak_mb": round(peak / 1e6, 3),
+                "top": [{"site": str(stat.traceback[0]), "mb": round(stat.size / 1e6, 3), "blocks": stat.count}
+                        for stat in snapshot.statistics("lineno")[:MEMORY_TOP]],
+            }
+
+def profile_rows(profiler):
+    import pstats
+    profile_stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in profile_stats.stats.items():
+        rows.append({"function": f"{filename}:{line}({function})", "calls": calls,
+                     "own_s": round(own, 6), "cumulative_s": round(cumulative, 6)})
+    rows.sort(key=lambda row: row["cumulative_s"], reverse=True)
+    return rows[:PROFILE_TOP]
+
+def write_report(path, report):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
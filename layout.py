@@ -0,0 +1,397 @@
+"""
+Layered (Sugiyama-style) auto-layout for the diagrams written by workflows_gen.py.
+
+The layout works on plain ids: nodes are the element ids in Seq order, edges are
+(source, target) pairs and sizes maps each node to its (width, height). It knows
+nothing about BPMN or ElementTree, so it is cheap to run on large processes.
+
+    1. Cycle breaking: a depth-first search in Seq order marks the edges that close a
+       loop (e.g. rework edges) so they are ignored for layering.
+    2. Layering: every node goes into the layer after its longest incoming path.
+    3. Ordering: a few barycentric sweeps reorder each layer to reduce edge crossings.
+    4. Positioning: layers become columns, the order within a layer becomes rows.
+
+Once shapes are placed, route_edges draws every flow with horizontal and vertical
+segments only, using a uniform grid over the shape bounds so a route only looks at the
+obstacles near it.
+"""
+import bisect
+import heapq
+
+def break_cycles(nodes, edges):
+    """
+    Finds the edges that close a cycle with an iterative depth-first search in node order.
+    Args:
+        nodes (list): Node ids, in the order the search visits them.
+        edges (list): (source, target) pairs.
+    Returns:
+        set: The indexes (into edges) of the back edges, self loops included.
+    """
+    successors = {node: [] for node in nodes}
+    for i, (source, target) in enumerate(edges):
+        if source in successors and target in successors:
+            successors[source].append((target, i))
+
+    NEW, ACTIVE, DONE = 0, 1, 2
+    state = dict.fromkeys(nodes, NEW)
+    back_edges = set()
+    for root in nodes:
+        if state[root] != NEW:
+            continue
+        state[root] = ACTIVE
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, pending = stack[-1]
+            for target, i in pending:
+                if state[target] == ACTIVE:
+                    back_edges.add(i)
+                elif state[target] == NEW:
+                    state[target] = ACTIVE
+                    stack.append((target, iter(successors[target])))
+                    break
+            else:
+                state[node] = DONE
+                stack.pop()
+    return back_edges
+
+def assign_layers(nodes, edges):
+    """
+    Assigns each node the length of the longest path reaching it (longest-path layering).
+    Args:
+        nodes (list): Node ids.
+        edges (list): (source, target) pairs that form a DAG over nodes.
+    Returns:
+        dict: Node id to layer number, starting at 0.
+    """
+    successors = {node: [] for node in nodes}
+    indegree = dict.fromkeys(nodes, 0)
+    for source, target in edges:
+        successors[source].append(target)
+        indegree[target] += 1
+
+    layer = dict.fromkeys(nodes, 0)
+    ready = [node for node in nodes if indegree[node] == 0]
+    while ready: # Kahn's algorithm, layers relaxed in topological order
+        node = ready.pop()
+        for target in successors[node]:
+            if layer[node] + 1 > layer[target]:
+                layer[target] = layer[node] + 1
+            indegree[target] -= 1
+            if indegree[target] == 0:
+                ready.append(target)
+    return layer
+
+def order_layers(layers, edges, sweeps=4):
+    """
+    Reduces crossings by moving each node to the barycenter of its neighbours in the previous
+    layers, sweeping down then up. Nodes without neighbours on the swept side keep their place.
+    Args:
+        layers (list): One list of node ids per layer, in their initial order.
+        edges (list): (source, target) pairs going from a lower to a higher layer.
+        sweeps (int): Number of down/up sweeps.
+    Returns:
+        list: The reordered layers.
+    """
+    predecessors = {}
+    successors = {}
+    for source, target in edges:
+        predecessors.setdefault(target, []).append(source)
+        successors.setdefault(source, []).append(target)
+
+    position = {}
+    for nodes in layers:
+        for i, node in enumerate(nodes):
+            position[node] = i
+
+    def reorder(nodes, neighbours):
+        keys = {}
+        for node in nodes:
+            adjacent = neighbours.get(node)
+            if adjacent:
+                keys[node] = sum(position[n] for n in adjacent) / len(adjacent)
+            else:
+                keys[node] = position[node]
+        nodes.sort(key=lambda node: (keys[node], position[node]))
+        for i, node in enumerate(nodes):
+            position[node] = i
+
+    layers = [list(nodes) for nodes in layers]
+    for sweep in range(sweeps):
+        if sweep % 2 == 0:
+            for nodes in layers[1:]:
+                reorder(nodes, predecessors)
+        else:
+            for nodes in reversed(layers[:-1]):
+                reorder(nodes, successors)
+    return layers
+
+def layered_layout(nodes, edges, sizes, origin=(150, 80), column_pitch=150, row_pitch=100, band_height=80):
+    """
+    Lays out a directed graph left to right in layers.
+    Args:
+        nodes (list): Node ids in Seq order.
+        edges (list): (source, target) pairs; edges to unknown nodes are ignored.
+        sizes (dict): Node id to (width, height).
+        origin (tuple): Top-left corner of the first row of the first column.
+        column_pitch (int): Horizontal distance between layers.
+        row_pitch (int): Vertical distance between rows.
+        band_height (int): Height of a row; shapes lower than this are centered in it.
+    Returns:
+        dict: Node id to the (x, y) of the top-left corner of its shape.
+    """
+    known = set(nodes)
+    edges = [(source, target) for source, target in edges if source in known and target in known]
+    back_edges = break_cycles(nodes, edges)
+    forward = [edge for i, edge in enumerate(edges) if i not in back_edges]
+
+    layer = assign_layers(nodes, forward)
+    layers = [[] for _ in range(max(layer.values(), default=-1) + 1)]
+    for node in nodes:
+        layers[layer[node]].append(node)
+    layers = order_layers(layers, forward)
+
+    x0, y0 = origin
+    positions = {}
+    for column, members in enumerate(layers):
+        x = x0 + column * column_pitch
+        for row, node in enumerate(members):
+            height = sizes[node][1]
+            positions[node] = (x, y0 + row * row_pitch + max(band_height - height, 0) // 2)
+    return positions
+
+class GridIndex:
+    """
+        Uniform grid over axis-aligned rectangles. Each rectangle is registered in every cell
+        it overlaps, so a query only looks at the rectangles in the cells it touches.
+    """
+    def __init__(self, cell_size=200):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.rects = {}
+        self.max_y = 0
+
+    def _cells(self, x1, y1, x2, y2):
+        size = self.cell_size
+        for cx in range(int(x1) // size, int(x2) // size + 1):
+            for cy in range(int(y1) // size, int(y2) // size + 1):
+                yield cx, cy
+
+    def insert(self, key, x, y, width, height):
+        self.rects[key] = (x, y, x + width, y + height)
+        self.max_y = max(self.max_y, y + height)
+        for cell in self._cells(x, y, x + width, y + height):
+            self.cells.setdefault(cell, []).append(key)
+
+    def query(self, x1, y1, x2, y2):
+        """
+        Returns:
+            set: The keys of the rectangles intersecting the box (x1, y1)-(x2, y2), edges included.
+        """
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        found = set()
+        for cell in self._cells(x1, y1, x2, y2):
+            for key in self.cells.get(cell, ()):
+                if key not in found:
+                    rx1, ry1, rx2, ry2 = self.rects[key]
+                    if rx1 <= x2 and x1 <= rx2 and ry1 <= y2 and y1 <= ry2:
+                        found.add(key)
+        return found
+
+def _blocked(index, x1, y1, x2, y2, ignore):
+    # A horizontal or vertical segment is blocked if it runs through the inside of a shape; borders are fine
+    for key in index.query(x1, y1, x2, y2):
+        if key in ignore:
+            continue
+        rx1, ry1, rx2, ry2 = index.rects[key]
+        if y1 == y2:
+            if ry1 < y1 < ry2 and max(rx1, min(x1, x2)) < min(rx2, max(x1, x2)):
+                return True
+        elif rx1 < x1 < rx2 and max(ry1, min(y1, y2)) < min(ry2, max(y1, y2)):
+            return True
+    return False
+
+def _path_blocked(index, waypoints, ignore):
+    return any(_blocked(index, x1, y1, x2, y2, ignore) for (x1, y1), (x2, y2) in zip(waypoints, waypoints[1:]))
+
+def _free_row(index, x1, x2, y, below, clearance, ignore):
+    # The nearest y from y (downwards if below, else upwards) where a horizontal segment from x1 to x2 is clear
+    for _ in range(len(index.rects) + 1):
+        if not _blocked(index, x1, y, x2, y, ignore):
+            return y
+        hits = [index.rects[key] for key in index.query(x1, y, x2, y) if key not in ignore]
+        y = max(r[3] for r in hits) + clearance if below else min(r[1] for r in hits) - clearance
+    return y
+
+def _free_column(index, x, y1, y2, right, clearance, ignore):
+    # The nearest x from x (rightwards if right, else leftwards) where a vertical segment from y1 to y2 is clear
+    for _ in range(len(index.rects) + 1):
+        if not _blocked(index, x, y1, x, y2, ignore):
+            return x
+        hits = [index.rects[key] for key in index.query(x, y1, x, y2) if key not in ignore]
+        x = max(r[2] for r in hits) + clearance // 2 if right else min(r[0] for r in hits) - clearance // 2
+    return x
+
+class _Bottoms:
+    """
+        The lowest shape bottom over any x range, i.e. the largest y2 of the rectangles whose x range
+        intersects it, in O(log n) per query: a sparse table over the rectangles sorted by x1 covers
+        the ones starting inside the range, and a sweep of the x axis covers the ones already open at
+        its left end. Built once per route_edges, so a feedback edge costs the same whatever it spans.
+    """
+    def __init__(self, rects):
+        rects = sorted(rects)
+        self.starts = [rect[0] for rect in rects]
+        level = [rect[3] for rect in rects]
+        self.table = [level] # table[k][i] is the lowest bottom of rects[i:i + 2**k]
+        while 2 ** len(self.table) <= len(level):
+            half = 2 ** (len(self.table) - 1)
+            previous = self.table[-1]
+            self.table.append([max(previous[i], previous[i + half]) for i in range(len(previous) - half)])
+
+        # Lowest bottom of the rectangles covering each coordinate, and each gap right after it
+        self.coords = sorted({x for rect in rects for x in (rect[0], rect[2])})
+        self.at, self.after = [], []
+        open_rects = [] # heap of (-bottom, x2)
+        next_rect = 0
+        for x in self.coords:
+            while next_rect < len(rects) and rects[next_rect][0] == x:
+                heapq.heappush(open_rects, (-rects[next_rect][3], rects[next_rect][2]))
+                next_rect += 1
+            while open_rects and open_rects[0][1] < x:
+                heapq.heappop(open_rects)
+            self.at.append(-open_rects[0][0] if open_rects else None)
+            while open_rects and open_rects[0][1] <= x:
+                heapq.heappop(open_rects)
+            self.after.append(-open_rects[0][0] if open_rects else None)
+
+    def lowest(self, x1, x2):
+        """
+        Returns:
+            The largest y2 of the rectangles intersecting x1..x2 (edges included), None if there are none.
+        """
+        x1, x2 = min(x1, x2), max(x1, x2)
+        found = []
+        i, j = bisect.bisect_left(self.starts, x1), bisect.bisect_right(self.starts, x2)
+        if i < j:
+            k = (j - i).bit_length() - 1
+            found.append(max(self.table[k][i], self.table[k][j - 2 ** k]))
+        c = bisect.bisect_right(self.coords, x1) - 1
+        if c >= 0:
+            covering = self.at[c] if self.coords[c] == x1 else self.after[c]
+            if covering is not None:
+                found.append(covering)
+        return max(found, default=None)
+
+class _Lanes:
+    # Horizontal lanes below the shapes; edges whose x ranges overlap are kept at least `gap` apart
+    def __init__(self, gap):
+        self.gap = gap
+        self.lanes = {} # lane y to the (starts, ends) of its claimed x ranges, sorted and disjoint
+        self.buckets = {} # y // gap to the lane ys in it
+
+    def _taken(self, lane_y, x1, x2):
+        # Whether x1..x2 comes within `gap` of a range of the lane: one bisect, as its ranges are disjoint
+        starts, ends = self.lanes[lane_y]
+        i = bisect.bisect_left(ends, x1 - self.gap)
+        return i < len(starts) and starts[i] <= x2 + self.gap
+
+    def _conflict(self, y, x1, x2):
+        bucket = y // self.gap
+        for b in (bucket - 1, bucket, bucket + 1):
+            for lane_y in self.buckets.get(b, ()):
+                if abs(lane_y - y) < self.gap and self._taken(lane_y, x1, x2):
+                    return True
+        return False
+
+    def claim(self, base, x1, x2):
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y = base
+        while self._conflict(y, x1, x2):
+            y += self.gap
+        if y not in self.lanes:
+            self.lanes[y] = ([], [])
+            self.buckets.setdefault(y // self.gap, []).append(y)
+        starts, ends = self.lanes[y]
+        i = bisect.bisect_left(starts, x1)
+        starts.insert(i, x1)
+        ends.insert(i, x2)
+        return y
+
+def route_edges(shapes, edges, attached=None, clearance=20, feedback_offset=50, lane_gap=15, cell_size=200):
+    """
+    Routes sequence flows orthogonally around the placed shapes.
+
+    Forward edges leave the right side of their source and enter the left side of their target,
+    as a straight line when the two are aligned and the way is clear, otherwise with two bends
+    through a free vertical channel (four when no channel is free). Feedback edges, i.e. edges
+    leaving a boundary event or going back to the left, run from the bottom of the source down to
+    a lane below the shapes they pass and back up into the bottom of the target (or through the
+    channel beside a shape when another shape sits below it); overlapping feedback edges get
+    separate lanes.
+    Args:
+        shapes (dict): Element id to the (x, y, width, height) of its shape.
+        edges (list): (edge id, source id, target id) triples.
+        attached (dict): Boundary event id to the id of the shape it is attached to.
+        clearance (int): Distance kept between a detour and the shapes it avoids.
+        feedback_offset (int): Distance between the lowest shape passed and the first feedback lane.
+        lane_gap (int): Distance between two feedback lanes.
+        cell_size (int): Cell size of the spatial grid.
+    Returns:
+        dict: Edge id to its list of (x, y) waypoints. Edges with a missing shape are left out.
+    """
+    attached = attached or {}
+    index = GridIndex(cell_size)
+    for key, (x, y, width, height) in shapes.items():
+        index.insert(key, x, y, width, height)
+    bottoms = _Bottoms(index.rects.values())
+    lanes = _Lanes(lane_gap)
+
+    routes = {}
+    for edge_id, source, target in edges:
+        if source not in shapes or target not in shapes:
+            continue
+        sx, sy, sw, sh = shapes[source]
+        tx, ty, tw, th = shapes[target]
+        ignore = {source, target, attached.get(source)}
+
+        if source in attached or tx + tw // 2 <= sx + sw // 2:
+            # Feedback loop: down from the bottom of the source, along a lane below everything in between
+            # and up into the bottom of the target. Where a shape sits right below source or target, the
+            # edge leaves from the right side (enters from the left side) through the channel next to it.
+            start_x, start_y = sx + sw // 2, sy + sh
+            head = [(start_x, start_y)]
+            if _blocked(index, start_x, start_y, start_x, index.max_y, ignore):
+                start_y = sy + sh // 2
+                start_x = _free_column(index, sx + sw + clearance // 2, start_y, index.max_y, True, clearance, ignore)
+                head = [(sx + sw, start_y), (start_x, start_y)]
+            end_x, end_y = tx + tw // 2, ty + th
+            tail = [(end_x, end_y)]
+            if _blocked(index, end_x, end_y, end_x, index.max_y, ignore):
+                end_y = ty + th // 2
+                end_x = _free_column(index, tx - clearance // 2, end_y, index.max_y, False, clearance, ignore)
+                tail = [(end_x, end_y), (tx, end_y)]
+            lowest = max(value for value in (bottoms.lowest(start_x, end_x), start_y, end_y) if value is not None)
+            lane_y = lanes.claim(lowest + feedback_offset, start_x, end_x)
+            routes[edge_id] = head + [(start_x, lane_y), (end_x, lane_y)] + tail
+            continue
+
+        start_x, start_y = sx + sw, sy + sh // 2
+        end_x, end_y = tx, ty + th // 2
+        if start_y == end_y and not _blocked(index, start_x, start_y, end_x, end_y, ignore):
+            routes[edge_id] = [(start_x, start_y), (end_x, end_y)]
+            continue
+
+        route = None
+        for channel_x in ((start_x + end_x) // 2, start_x + clearance, end_x - clearance):
+            candidate = [(start_x, start_y), (channel_x, start_y), (channel_x, end_y), (end_x, end_y)]
+            if start_x <= channel_x <= end_x and not _path_blocked(index, candidate, ignore):
+                route = candidate
+                break
+        if route is None:
+            # Leave and enter through short stubs and cross over on the nearest free row
+            out_x, in_x = start_x + clearance // 2, end_x - clearance // 2
+            row_y = _free_row(index, out_x, in_x, start_y, end_y >= start_y, clearance, ignore)
+            route = [(start_x, start_y), (out_x, start_y), (out_x, row_y), (in_x, row_y), (in_x, end_y), (end_x, end_y)]
+        routes[edge_id] = [point for i, point in enumerate(route) if i == 0 or point != route[i - 1]]
+    return routes
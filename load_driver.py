@@ -0,0 +1,637 @@
+"""
+    Load driver for the engine REST API: starts many instances of a process and completes every user
+    task that they, and the processes they call, create, the way people working the task list would.
+    It measures the end-to-end latency of the instances and the task completion throughput.
+
+    Open tasks of the started process and of every process it calls (found through the calledElement
+    of the deployed XML) are fetched in batches with GET /task. They are completed concurrently over a
+    pool of keep-alive connections (asyncio, standard library only). The variables each task is
+    completed with come from a DecisionPolicy built from the generated task sidecars (*_tasks.json, see
+    task_index.py) and the side file of simulate.py:
+
+        - a task followed by a gateway gets variables that make one branch's condition true, the branch
+          picked by the gateway's `branches` odds (e.g. 75% approved); equal odds otherwise
+        - a task with camunda:meta and no gateway gets one of its meta keys, the buttons of the README's
+          UI example, in `user_decision`, picked by the task's `choices` odds
+        - the task's `variables` are always added
+
+        processes:
+          approval:
+            Decision1: {branches: {EndApproved: 0.75, EndRejected: 0.25}}
+          main:
+            Task2: {choices: {x: 0.5, y: 0.3, z: 0.2}, variables: {channel: load-test}}
+
+    Instance latency is the engine's own durationInMillis, read from the history once an instance has
+    ended. It runs against a real engine, or against fake_engine.py served from this process (--fake):
+
+        python load_driver.py main_process --instances 1000 --concurrency 32 --config simulation.yaml
+        python load_driver.py main_process --fake --instances 1000 --config simulation.yaml
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import math
+import random
+import re
+import ssl
+import time
+import urllib.parse
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+import yaml
+from instrumentation import configure_logging
+from task_index import TaskIndex, process_key
+
+BPMN_NS = "http://www.omg.org/spec/BPMN/20100524/MODEL"
+ENGINE_URL = "http://localhost:8080/engine-rest"
+DEFAULT_AUTH = ("demo", "demo")
+DECISION_VARIABLE = "user_decision" # set to the chosen camunda:meta key, see the README
+PROCESS_SUFFIX = "_process" # process keys are the sheet name plus this, see workflows_gen.handle
+PERCENTILES = (50, 90, 95, 99)
+HISTORY_BATCH = 500 # instance ids per history query
+RECENT_TASKS = 10000 # completed task ids remembered, so a poll answered before their completion does not complete them again
+MAX_HEADER_SIZE = 65536
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+log = logging.getLogger("load_driver")
+
+class HttpPool:
+    """
+        Minimal HTTP/1.1 client on asyncio streams for JSON APIs. Up to `size` keep-alive connections
+        to one host are shared by every coroutine: a request waits for a free connection rather than
+        opening a new one. A connection the server closed while idle is replaced before anything is sent
+        on it; a request that was already sent is only sent again if it is idempotent.
+    """
+    def __init__(self, base_url, size=16, auth=None, timeout=30.0):
+        url = urllib.parse.urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if url.scheme == "https" else None
+        self.prefix = url.path.rstrip("/")
+        self.timeout = timeout
+        self.headers = f"Host: {url.netloc}\r\nAccept: application/json\r\n"
+        if auth:
+            self.headers += f"Authorization: Basic {base64.b64encode(':'.join(auth).encode('utf-8')).decode('ascii')}\r\n"
+        self.requests = self.connections = 0
+        self._idle = [] # (reader, writer) of open connections not in use
+        self._slots = asyncio.Semaphore(size)
+
+    async def request(self, method, path, payload=None, params=None, idempotent=None):
+        """
+        Args:
+            path (str): Below the base URL, e.g. /task.
+            payload: Sent as a JSON body when not None.
+            params (dict): Query parameters.
+            idempotent (bool): Whether it is safe to send again if the connection drops before the
+                               answer, by default for the methods in IDEMPOTENT_METHODS. A query sent
+                               with POST can pass True.
+        Returns:
+            tuple: (status, the decoded JSON body, or its text if it is not JSON, None if empty)
+        Raises:
+            OSError, asyncio.TimeoutError: If the server cannot be reached or does not answer in time, or
+                                       the connection dropped after a request that is not idempotent.
+        """
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        target = self.prefix + path + ("?" + urllib.parse.urlencode(params) if params else "")
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        head = f"{method} {target} HTTP/1.1\r\n{self.headers}Content-Length: {len(body)}\r\n"
+        if payload is not None:
+            head += "Content-Type: application/json\r\n"
+        message = (head + "\r\n").encode("latin-1") + body
+
+        async with self._slots:
+            while True:
+                reused = bool(self._idle)
+                reader, writer = self._idle.pop() if reused else await self._connect()
+                if reused and (reader.at_eof() or writer.is_closing()): # closed by the server while idle
+                    writer.close()
+                    continue
+                try:
+                    writer.write(message)
+                    status, headers, data = await asyncio.wait_for(self._response(reader, writer), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    # Dropped after the request went out: it may have been processed, so only an
+                    # idempotent one is sent again, on a fresh connection
+                    if reused and idempotent:
+                        continue
+                    raise ConnectionError(f"{method} {target}: connection closed") from None
+                except BaseException:
+                    writer.close()
+                    raise
+                break
+
+        if headers.get("connection", "").lower() != "close":
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        self.requests += 1
+        if not data:
+            return status, None
+        if "json" in headers.get("content-type", ""):
+            return status, json.loads(data)
+        return status, data.decode("utf-8", "replace")
+
+    async def _connect(self):
+        self.connections += 1
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl, limit=MAX_HEADER_SIZE)
+
+    @staticmethod
+    async def _response(reader, writer):
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        version, status = status_line.split(" ", 2)[:2]
+        headers = {}
+        for line in header_lines:
+            if line:
+                key, _, value = line.partition(":")
+                headers[key.strip().lower()] = value.strip()
+        if version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive":
+            headers["connection"] = "close"
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readuntil(b"\r\n")
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            data = b"".join(chunks)
+        elif "content-length" in headers:
+            data = await reader.readexactly(int(headers["content-length"]))
+        elif int(status) in (204, 304):
+            data = b""
+        else: # delimited by the end of the connection
+            headers["connection"] = "close"
+            data = await reader.read()
+        return int(status), headers, data
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+# Gateway conditions the policy can solve: conjunctions of `name`, `!name` and `name ==/!= literal`
+CONDITION = re.compile(r"^\s*[$#]\{\s*(.*?)\s*\}\s*$")
+TERM = re.compile(r"^(!|not\s+)?\s*([A-Za-z_]\w*)\s*(?:(==|eq|!=|ne)\s*(.+?))?$")
+LITERALS = {"true": True, "false": False, "null": None}
+
+def literal(text):
+    """
+    Returns:
+        The value of a JUEL literal: true, false, null, a number or a quoted string.
+    Raises:
+        ValueError: If `text` is none of these, e.g. another variable.
+    """
+    if text in LITERALS:
+        return LITERALS[text]
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "'\"":
+        return text[1:-1]
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+def satisfying(condition):
+    """
+    Returns:
+        dict: Variables that make a condition like `${approved == true}` or `${!late && kind == 'A'}`
+              true, or None if the condition is not a conjunction of such terms.
+    """
+    match = CONDITION.match(condition or "")
+    if not match:
+        return None
+    variables = {}
+    for term in re.split(r"\s*(?:&&|\band\b)\s*", match.group(1)):
+        term = TERM.match(term)
+        if not term:
+            return None
+        negated, name, operator, text = term.groups()
+        if operator is None: # ${flag} or ${!flag}
+            variables[name] = not negated
+            continue
+        if negated:
+            return None
+        try:
+            value = literal(text)
+        except ValueError:
+            return None
+        if operator in ("!=", "ne"):
+            if not isinstance(value, bool): # any other value would do, but which one is up to the process
+                return None
+            value = not value
+        variables[name] = value
+    return variables
+
+def typed(value):
+    # A variable as engine-rest expects it, e.g. {"value": true, "type": "Boolean"}
+    if value is None:
+        return {"value": None, "type": "Null"}
+    if isinstance(value, bool):
+        return {"value": value, "type": "Boolean"}
+    if isinstance(value, int):
+        return {"value": value, "type": "Long"}
+    if isinstance(value, float):
+        return {"value": value, "type": "Double"}
+    if isinstance(value, str):
+        return {"value": value, "type": "String"}
+    return {"value": json.dumps(value), "type": "Json"}
+
+def odds(names, given, where):
+    """
+    Returns:
+        list: Cumulative probabilities for `names`; those missing from `given` share what is left equally.
+    Raises:
+        ValueError: If the given probabilities add up to more than 1, or all are given and not to 1.
+    """
+    total = sum(float(given[name]) for name in names if name in given)
+    missing = [name for name in names if name not in given]
+    if total > 1 + 1e-9 or (not missing and abs(total - 1) > 1e-9):
+        log.warning(f"{where}: probabilities add up to {total}")
+        raise ValueError(f"{where}: probabilities add up to {total}, not 1")
+    probabilities = [float(given[name]) if name in given else (1 - total) / len(missing) for name in names]
+    return [sum(probabilities[:i + 1]) for i in range(len(probabilities))]
+
+class DecisionPolicy:
+    """
+        Picks the variables each user task is completed with, see the module docstring. The choices
+        of a task are worked out on its first completion and reused.
+        Args:
+            index (TaskIndex): The generated sidecars.
+            config (dict): The simulate.py side file; its `processes` are keyed by sheet or process key.
+            seed (int): For reproducible choices.
+    """
+    def __init__(self, index, config=None, seed=None, decision_variable=DECISION_VARIABLE):
+        self.index = index
+        self.processes = (config or {}).get("processes") or {}
+        self.rng = random.Random(seed)
+        self.decision_variable = decision_variable
+        self._choices = {} # (process key, task id) to (fixed variables, [(options, cumulative odds)])
+
+    def settings(self, key):
+        sheet = key[:-len(PROCESS_SUFFIX)] if key.endswith(PROCESS_SUFFIX) else key
+        return self.processes.get(key) or self.processes.get(sheet) or {}
+
+    def _build(self, key, task_id):
+        task = self.index.task(key, task_id)
+        settings = self.settings(key)
+        task_settings = settings.get(task_id) or {}
+        fixed = dict(task_settings.get("variables") or {})
+        if task is None:
+            log.warning(f"{key}.{task_id}: not in the task sidecars, completed with its side file variables only")
+            return fixed, []
+
+        pickers = []
+        gateways = {}
+        for decision in task["decisions"]:
+            gateways.setdefault(decision["gateway"], []).append(decision)
+        for gateway, decisions in gateways.items():
+            branches = (settings.get(gateway) or {}).get("branches") or {}
+            given = {}
+            for i, decision in enumerate(decisions): # by target id or condition, as in simulate.py
+                probability = branches.get(decision["target"], branches.get(decision["condition"]))
+                if probability is not None:
+                    given[i] = probability
+            cumulative = odds(range(len(decisions)), given, f"{key}.{gateway}")
+            options = []
+            for decision in decisions:
+                variables = satisfying(decision["condition"])
+                if variables is None:
+                    log.warning(f"{key}.{gateway}: cannot pick variables for condition {decision['condition']}; "
+                                f"set them as `variables` of {task_id} in the side file")
+                options.append(variables or {})
+            pickers.append((options, cumulative))
+        if not gateways and task["meta"]:
+            buttons = list(task["meta"])
+            cumulative = odds(buttons, task_settings.get("choices") or {}, f"{key}.{task_id}")
+            pickers.append(([{self.decision_variable: button} for button in buttons], cumulative))
+        return fixed, pickers
+
+    def variables(self, process_definition, task_id):
+        """
+        Returns:
+            dict: The engine-rest variables to complete the task with.
+        """
+        key = process_key(process_definition)
+        choices = self._choices.get((key, task_id))
+        if choices is None:
+            choices = self._choices[(key, task_id)] = self._build(key, task_id)
+        fixed, pickers = choices
+        variables = {}
+        for options, cumulative in pickers:
+            variables.update(self.rng.choices(options, cum_weights=cumulative)[0])
+        variables.update(fixed)
+        return {name: typed(value) for name, value in variables.items()}
+
+def percentiles(values):
+    # Nearest rank, with the mean and max
+    if not values:
+        return {"mean": None, **{f"p{p}": None for p in PERCENTILES}, "max": None}
+    ordered = sorted(values)
+    result = {"mean": round(sum(ordered) / len(ordered), 3)}
+    for p in PERCENTILES:
+        result[f"p{p}"] = round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)], 3)
+    result["max"] = round(ordered[-1], 3)
+    return result
+
+async def called_processes(pool, key):
+    """
+    Returns:
+        list: `key` and the keys of every process it calls, directly or not, from the deployed XML.
+    Raises:
+        ValueError: If `key` is not deployed.
+    """
+    keys, pending = [], [key]
+    while pending:
+        current = pending.pop()
+        if current in keys:
+            continue
+        status, definition = await pool.request("GET", f"/process-definition/key/{current}/xml")
+        if status == 404:
+            if current == key:
+                raise ValueError(f"No process definition with key '{key}' is deployed")
+            log.warning(f"Called process '{current}' is not deployed, its instances will fail")
+            continue
+        if status != 200:
+            raise ValueError(f"Fetching the XML of '{current}' failed with {status}: {definition}")
+        keys.append(current)
+        root = ET.fromstring(definition["bpmn20Xml"])
+        pending.extend(call.get("calledElement") for call in root.iter(f"{{{BPMN_NS}}}callActivity") if call.get("calledElement"))
+    return keys
+
+class LoadDriver:
+    """
+        One load run: starts the instances, completes their tasks as they appear and watches the
+        history for the instances that ended. Starts and completions share `concurrency` slots, so no
+        more than that many are in flight.
+    """
+    def __init__(self, pool, policy, concurrency=16, batch_size=100, poll_interval=0.05):
+        self.pool = pool
+        self.policy = policy
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.counts = {"started": 0, "start_errors": 0, "completed": 0, "completed_tasks": 0, "conflicts": 0, "task_errors": 0}
+        self.running = {} # started instance id to the perf_counter of its start
+        self.latencies = [] # ms, by the engine, of the instances that ended
+        self.observed = [] # s, from sending the start to seeing the end in the history
+        self.complete_times = [] # ms per complete request
+        self.errors = {} # error message to how often it happened
+        self._completing = set() # task ids being completed
+        self._recent = OrderedDict() # task ids completed lately, oldest first
+        self._all_started = False
+
+    def error(self, message):
+        if message not in self.errors:
+            log.warning(message)
+        self.errors[message] = self.errors.get(message, 0) + 1
+
+    async def run(self, key, instances, rate=0.0, timeout=600.0):
+        """
+        Args:
+            key (str): The process definition key to start.
+            instances (int): How many to start.
+            rate (float): Starts per second, 0 to start as fast as the slots allow.
+            timeout (float): Seconds after which the run stops with the instances still running.
+        Returns:
+            dict: The report, see print_report.
+        """
+        keys = await called_processes(self.pool, key)
+        log.info(f"Driving tasks of {', '.join(keys)}")
+        slots = asyncio.Semaphore(self.concurrency)
+        started = time.perf_counter()
+        workers = [asyncio.create_task(self.start_all(key, instances, rate, slots)),
+                   asyncio.create_task(self.complete_all(keys, slots))]
+        try:
+            await asyncio.wait_for(self.watch(), timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"Stopped after {timeout}s with {len(self.running)} instance(s) still running")
+        elapsed = time.perf_counter() - started
+        for worker in workers:
+            worker.cancel()
+        for result in await asyncio.gather(*workers, return_exceptions=True):
+            if isinstance(result, Exception):
+                self.error(f"Load run stopped early: {result!r}")
+
+        return {
+            "process": key,
+            "processes": keys,
+            "elapsed_s": round(elapsed, 3),
+            "instances": {"requested": instances, "started": self.counts["started"], "completed": self.counts["completed"],
+                          "running": len(self.running), "start_errors": self.counts["start_errors"]},
+            "latency_ms": percentiles(self.latencies),
+            "observed_latency_ms": percentiles([seconds * 1000 for seconds in self.observed]),
+            "tasks": {"completed": self.counts["completed_tasks"], "per_second": round(self.counts["completed_tasks"] / elapsed, 1),
+                      "conflicts": self.counts["conflicts"], "errors": self.counts["task_errors"]},
+            "complete_ms": percentiles(self.complete_times),
+            "requests": self.pool.requests,
+            "connections": self.pool.connections,
+            "errors": self.errors,
+        }
+
+    async def start_all(self, key, instances, rate, slots):
+        first = time.perf_counter()
+        pending = set()
+
+        def finished(start):
+            # a start that raised is dropped from pending before anyone awaits it, so report it here
+            pending.discard(start)
+            if not start.cancelled() and start.exception() is not None:
+                self.counts["start_errors"] += 1
+                self.error(f"Start failed: {start.exception()!r}")
+
+        for number in range(instances):
+            if rate:
+                await asyncio.sleep(max(0.0, first + number / rate - time.perf_counter()))
+            await slots.acquire()
+            start = asyncio.create_task(self.start(key, number, slots))
+            pending.add(start)
+            start.add_done_callback(finished)
+        try:
+            await asyncio.gather(*pending)
+        finally: # also when starting failed, so watch ends with the instances that did start
+            self._all_started = True
+
+    async def start(self, key, number, slots):
+        try:
+            sent = time.perf_counter()
+            status, instance = await self.pool.request("POST", f"/process-definition/key/{key}/start",
+                                                       {"businessKey": f"load-{number}", "variables": {}})
+            if status == 200:
+                self.running[instance["id"]] = sent
+                self.counts["started"] += 1
+            else:
+                self.counts["start_errors"] += 1
+                self.error(f"Start failed with {status}: {instance}")
+        except (OSError, asyncio.TimeoutError) as e:
+            self.counts["start_errors"] += 1
+            self.error(f"Start failed: {e!r}")
+        finally:
+            slots.release()
+
+    async def complete_all(self, keys, slots):
+        keys = ",".join(keys)
+        pending = set()
+        while True:
+            fresh = await self.open_tasks(keys)
+            for task in fresh:
+                await slots.acquire()
+                self._completing.add(task["id"])
+                complete = asyncio.create_task(self.complete(task, slots))
+                pending.add(complete)
+                complete.add_done_callback(pending.discard)
+            if not fresh:
+                await asyncio.sleep(self.poll_interval)
+
+    async def open_tasks(self, keys):
+        """
+        Returns:
+            list: Up to about batch_size open tasks, oldest first, that are neither being completed nor
+                  completed lately. Tasks whose completion failed stay open at the head of the list, so
+                  the list is paged past them (firstResult) instead of waiting behind them.
+        """
+        fresh, first = [], 0
+        while len(fresh) < self.batch_size:
+            params = {"processDefinitionKeyIn": keys, "sortBy": "created", "sortOrder": "asc",
+                      "firstResult": first, "maxResults": self.batch_size}
+            try:
+                status, found = await self.pool.request("GET", "/task", params=params)
+            except (OSError, asyncio.TimeoutError) as e:
+                self.error(f"Fetching tasks failed: {e!r}")
+                break
+            if status != 200 or not isinstance(found, list):
+                self.error(f"Fetching tasks failed with {status}: {found}")
+                break
+            fresh.extend(task for task in found if task["id"] not in self._completing and task["id"] not in self._recent)
+            if len(found) < self.batch_size:
+                break
+            first += len(found)
+        return fresh
+
+    async def complete(self, task, slots):
+        try:
+            variables = self.policy.variables(task["processDefinitionId"], task["taskDefinitionKey"])
+            sent = time.perf_counter()
+            status, body = await self.pool.request("POST", f"/task/{task['id']}/complete", {"variables": variables})
+            if status in (200, 204):
+                self.complete_times.append((time.perf_counter() - sent) * 1000)
+                self.counts["completed_tasks"] += 1
+            elif status == 404: # completed by someone else, or its instance was cancelled meanwhile
+                self.counts["conflicts"] += 1
+            else:
+                self.counts["task_errors"] += 1
+                message = body.get("message") if isinstance(body, dict) else body
+                self.error(f"Completing {task['processDefinitionId'].split(':', 1)[0]}.{task['taskDefinitionKey']} failed with {status}: {message}")
+        except (OSError, asyncio.TimeoutError) as e:
+            self.counts["task_errors"] += 1
+            self.error(f"Completing a task failed: {e!r}")
+        except ValueError as e: # the side file does not fit the process
+            self.counts["task_errors"] += 1
+            self.error(str(e))
+        finally:
+            self._completing.discard(task["id"])
+            self._recent[task["id"]] = None
+            if len(self._recent) > RECENT_TASKS:
+                self._recent.popitem(last=False)
+            slots.release()
+
+    async def watch(self):
+        # Until every started instance has ended: move the ones the history shows as finished
+        while not (self._all_started and not self.running):
+            await asyncio.sleep(self.poll_interval)
+            ids = list(self.running)
+            for i in range(0, len(ids), HISTORY_BATCH):
+                try:
+                    status, finished = await self.pool.request("POST", "/history/process-instance",
+                                                               {"processInstanceIds": ids[i:i + HISTORY_BATCH], "finished": True},
+                                                               idempotent=True)
+                except (OSError, asyncio.TimeoutError) as e:
+                    self.error(f"Querying the history failed: {e!r}")
+                    continue
+                if status != 200:
+                    self.error(f"Querying the history failed with {status}: {finished}")
+                    continue
+                seen = time.perf_counter()
+                for record in finished:
+                    sent = self.running.pop(record["id"], None)
+                    if sent is not None:
+                        self.latencies.append(record["durationInMillis"])
+                        self.observed.append(seen - sent)
+                        self.counts["completed"] += 1
+
+def _ms(value):
+    if value is None:
+        return "-"
+    return f"{value / 1000:.2f}s" if value >= 1000 else f"{value:.1f}ms"
+
+def print_report(report):
+    instances, tasks = report["instances"], report["tasks"]
+    print(f"{report['process']} ({', '.join(report['processes'])}): {instances['started']} of {instances['requested']} instances started, "
+          f"{instances['completed']} completed in {report['elapsed_s']}s, {instances['running']} still running, {instances['start_errors']} failed to start")
+    for title, name in (("instance latency", "latency_ms"), ("  as observed", "observed_latency_ms"), ("complete request", "complete_ms")):
+        values = report[name]
+        print(f"  {title:<18}mean {_ms(values['mean'])}" + "".join(f"  p{p} {_ms(values[f'p{p}'])}" for p in PERCENTILES) + f"  max {_ms(values['max'])}")
+    print(f"  tasks             {tasks['completed']} completed, {tasks['per_second']}/s, {tasks['conflicts']} conflicts, {tasks['errors']} errors")
+    print(f"  requests          {report['requests']} over {report['connections']} connection(s)")
+    for message, count in report["errors"].items():
+        print(f"  Error ({count}x): {message}")
+
+async def main(args, base_url, auth):
+    config = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+    policy = DecisionPolicy(TaskIndex(args.folder), config, args.seed)
+    pool = HttpPool(base_url, size=args.concurrency + 2, auth=auth) # + the task and history queries
+    try:
+        driver = LoadDriver(pool, policy, args.concurrency, args.batch_size, args.poll_interval)
+        return await driver.run(args.process, args.instances, args.rate, args.timeout)
+    finally:
+        pool.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start process instances and complete their user tasks through engine-rest, to measure throughput")
+    parser.add_argument("process", nargs="?", default="main_process", help="process definition key to start (default: main_process)")
+    parser.add_argument("--instances", "-n", type=int, default=100, help="instances to start (default: 100)")
+    parser.add_argument("--rate", type=float, default=0, help="instances started per second, 0 for as fast as possible (default: 0)")
+    parser.add_argument("--concurrency", type=int, default=16, help="starts and completions in flight (default: 16)")
+    parser.add_argument("--batch-size", type=int, default=100, help="tasks fetched per poll (default: 100)")
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="seconds between polls when nothing is new (default: 0.05)")
+    parser.add_argument("--timeout", type=float, default=600, help="stop after this many seconds (default: 600)")
+    parser.add_argument("--config", "-c", help="simulate.py side file with the branch odds, choices and variables of the tasks")
+    parser.add_argument("--folder", default="generated", help="folder with the *_tasks.json sidecars, and the BPMN for --fake (default: generated)")
+    parser.add_argument("--seed", type=int, help="random seed for the decisions")
+    parser.add_argument("--url", default=ENGINE_URL, help=f"engine-rest base URL (default: {ENGINE_URL})")
+    parser.add_argument("--user", default=DEFAULT_AUTH[0], help="user name (default: demo)")
+    parser.add_argument("--password", default=DEFAULT_AUTH[1], help="password (default: demo)")
+    parser.add_argument("--fake", action="store_true", help="run against fake_engine.py in this process, with the BPMN of --folder deployed")
+    parser.add_argument("--output", "-o", help="write the JSON report to this file")
+    parser.add_argument("--verbose", "-v", action="count", default=0, help="log progress (-v) or everything (-vv)")
+    args = parser.parse_args()
+
+    configure_logging(args.verbose)
+    base_url = args.url
+    if args.fake:
+        import fake_engine
+        from deploy import collect_files, deploy
+        server, base_url = fake_engine.serve_in_background()
+        deployed, _, failures = deploy(collect_files([args.folder]), base_url)
+        if failures:
+            print(f"Error: Deploying to the fake engine failed: {failures}")
+            raise SystemExit(1)
+        print(f"Fake engine at {base_url} with {len(deployed)} file(s) deployed")
+    try:
+        report = asyncio.run(main(args, base_url, (args.user, args.password)))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
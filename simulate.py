@@ -0,0 +1,476 @@
+"""
+    Monte-Carlo throughput simulation of the generated processes, before they are deployed.
+
+    Each sheet's Process is built by handle() exactly as for generation. Many thousands of instances
+    then walk its graph at once with NumPy. Every step moves all running instances one node ahead,
+    sampling durations and gateway branches in batches. A call activity replays a finished instance of
+    the process it calls, with its cycle time and how it ended. An error end event in the callee, such
+    as the rejection in `approval`, therefore sends the caller through its boundary event into the
+    rework loop. When an arrival rate is given, each node with `servers` is an M/G/c queue at the load
+    that the simulated visits put on it.
+
+    Durations, servers, branch and boundary event probabilities go in a YAML side file, per sheet and
+    node id. Anything missing uses DEFAULT_DURATIONS and equal branch probabilities. Durations are
+    given by their mean and coefficient of variation (cv), in seconds:
+
+        rate: 20                      # instances of the simulated process started per hour
+        processes:
+          approval:
+            Task2: {dist: exponential, mean: 1800, servers: 4}
+            Decision1: {branches: {EndApproved: 0.7, EndRejected: 0.3}}   # by target id or condition
+          rsa:
+            Task2: {dist: lognormal, mean: 3600, cv: 0.5, servers: 8}
+
+        python simulate.py main --config simulation.yaml --instances 20000
+
+    The report gives, per process, the cycle-time percentiles and how the instances ended. Per node it
+    gives the visits per instance (loops), the utilization and the tasks waiting and open at that load.
+"""
+import argparse
+import json
+import logging
+import math
+import time
+import numpy as np
+import yaml
+import workflows_gen as wg
+from instrumentation import configure_logging, stats
+from sources import read_sheets
+
+# Duration families, all parametrized by mean and coefficient of variation
+DISTRIBUTIONS = ("fixed", "exponential", "lognormal", "gamma", "uniform")
+DEFAULT_DURATIONS = {
+    "UserTask": {"dist": "exponential", "mean": 3600.0},
+    "ServiceTask": {"dist": "lognormal", "mean": 0.5, "cv": 1.0},
+    "CallActivity": {"dist": "exponential", "mean": 3600.0}, # only used when the called process is not in the workbook
+}
+MAX_STEPS = 1000 # instances still running after this many steps are reported as truncated
+PERCENTILES = (50, 90, 95, 99)
+COMPLETED, TRUNCATED, NOT_AN_END = 0, -1, -2 # outcomes; error end events get 1 + the index of their errorRef
+
+log = logging.getLogger("simulate")
+
+def load_config(path):
+    """
+    Returns:
+        dict: The side file, {} if path is None.
+    """
+    if path is None:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+def sample_durations(rng, families, means, cvs):
+    """
+    Draws one duration per visit, vectorized per distribution family.
+    Args:
+        families (np.ndarray): Index into DISTRIBUTIONS per visit.
+        means, cvs (np.ndarray): Mean and coefficient of variation per visit.
+    """
+    durations = means.copy() # fixed
+    for family in np.unique(families):
+        name = DISTRIBUTIONS[family]
+        mask = families == family
+        mean, cv = means[mask], cvs[mask]
+        if name == "exponential":
+            durations[mask] = rng.exponential(mean)
+        elif name == "lognormal":
+            sigma2 = np.log1p(cv * cv)
+            durations[mask] = rng.lognormal(np.log(np.maximum(mean, 1e-12)) - sigma2 / 2, np.sqrt(sigma2))
+        elif name == "gamma":
+            shape = 1.0 / np.maximum(cv * cv, 1e-12)
+            durations[mask] = rng.gamma(shape, mean / shape)
+        elif name == "uniform":
+            half = np.minimum(mean * cv * math.sqrt(3), mean)
+            durations[mask] = rng.uniform(mean - half, mean + half)
+    return durations
+
+def erlang_c(servers, load):
+    """
+    Returns:
+        float: The probability that an arrival waits in an M/M/c queue with offered load λ·s < servers.
+    """
+    blocking = 1.0 # Erlang B, built up one server at a time so large c stays stable
+    for k in range(1, servers + 1):
+        blocking = load * blocking / (k + load * blocking)
+    return blocking / (1 - load / servers * (1 - blocking))
+
+def queue_wait(rate, mean, cv, servers):
+    """
+    Waiting time in front of a node, as an M/G/c queue (Allen-Cunneen scaling of the M/M/c wait).
+    Args:
+        rate (float): Arrivals per second.
+        mean (float): Mean service time in seconds, with coefficient of variation `cv`.
+        servers (int): Parallel servers, e.g. the people working the task; None for unlimited.
+    Returns:
+        tuple: (probability of waiting, mean wait of those who wait); (0, 0) without a queue and
+               (1, inf) when the queue keeps growing.
+    """
+    if not servers or rate <= 0 or mean <= 0:
+        return 0.0, 0.0
+    load = rate * mean
+    if load >= servers:
+        return 1.0, math.inf
+    return erlang_c(servers, load), mean / (servers - load) * (1 + cv * cv) / 2
+
+def _called_process(called_element):
+    return called_element[:-len("_process")] if called_element.endswith("_process") else called_element
+
+class ProcessModel:
+    """
+        One sheet's process compiled into arrays for the batched walk. Node i has up to K successors
+        in `successors[i]` with cumulative probabilities in `cumulative[i]`, a duration family with
+        its mean and cv, and `end_codes[i]`, the outcome of reaching it (NOT_AN_END for other nodes).
+        Call activities of processes in `known` are replayed from the callee instead (see walk).
+        Args:
+            name (str): The sheet name.
+            process (Process): The process built by handle().
+            settings (dict): The side file entries of this sheet, by node id.
+            known (set): The processes that are simulated too, by sheet name.
+    """
+    def __init__(self, name, process, settings, known=()):
+        self.name = name
+        nodes = process.ordered_elements()
+        self.ids = [node.id for node in nodes]
+        self.kinds = [type(node).__name__ for node in nodes]
+        index = {id: i for i, id in enumerate(self.ids)}
+        self.start = next((i for i, node in enumerate(nodes) if isinstance(node, wg.StartEvent)), 0)
+
+        outgoing = {id: [] for id in self.ids}
+        for flow in process.flows:
+            outgoing[flow.source_ref].append(flow)
+        boundaries = {}
+        for node in nodes:
+            if isinstance(node, wg.BoundaryEvent) and node.attached_to_ref in index:
+                boundaries.setdefault(node.attached_to_ref, []).append(node)
+
+        self.errors = [] # errorRefs, outcome 1 + i
+        self.end_codes = np.full(len(nodes), NOT_AN_END, dtype=np.int32)
+        self.calls = {} # node index to the called sheet
+        self.catches = {} # call node index to [(errorRef or None for any, boundary index)]
+        transitions = []
+        for i, node in enumerate(nodes):
+            if isinstance(node, wg.EndEvent):
+                self.end_codes[i] = self.error_code(node.error_ref) if node.error_ref else COMPLETED
+            elif not outgoing[node.id] and node.id not in boundaries:
+                self.end_codes[i] = COMPLETED # a dead end, which validation warns about
+            hosted = boundaries.get(node.id, [])
+            if isinstance(node, wg.CallActivity) and node.called_element and _called_process(node.called_element) in known:
+                self.calls[i] = _called_process(node.called_element)
+                self.catches[i] = [(boundary.error_ref, index[boundary.id]) for boundary in hosted]
+                hosted = [] # taken when the replayed callee instance ended with their error
+            transitions.append(self._transitions(node, settings, outgoing[node.id], hosted, index))
+
+        width = max(1, max(len(targets) for targets in transitions))
+        self.successors = np.tile(np.arange(len(nodes), dtype=np.int32)[:, None], (1, width))
+        self.cumulative = np.ones((len(nodes), width))
+        for i, targets in enumerate(transitions):
+            if targets:
+                successors, probabilities = zip(*targets)
+                self.successors[i] = successors[-1]
+                self.successors[i, :len(successors)] = successors
+                self.cumulative[i, :len(successors) - 1] = np.cumsum(probabilities)[:-1] # the last one takes the rest
+
+        self.families = np.zeros(len(nodes), dtype=np.int8)
+        self.means = np.zeros(len(nodes))
+        self.cvs = np.zeros(len(nodes))
+        self.servers = [None] * len(nodes)
+        for i, (id, kind) in enumerate(zip(self.ids, self.kinds)):
+            spec = {"dist": "fixed", "mean": 0.0}
+            if i not in self.calls: # a replayed call takes as long as its callee
+                spec.update(DEFAULT_DURATIONS.get(kind, {}))
+            spec.update(settings.get(id) or {})
+            if spec["dist"] not in DISTRIBUTIONS:
+                log.warning(f"{name}.{id}: unknown dist '{spec['dist']}'")
+                raise ValueError(f"{name}.{id}: unknown dist '{spec['dist']}', expected one of {', '.join(DISTRIBUTIONS)}")
+            self.families[i] = DISTRIBUTIONS.index(spec["dist"])
+            self.means[i] = float(spec.get("mean", 0.0))
+            self.cvs[i] = {"fixed": 0.0, "exponential": 1.0}.get(spec["dist"], float(spec.get("cv", 1.0)))
+            self.servers[i] = int(spec["servers"]) if spec.get("servers") else None
+
+    def error_code(self, error):
+        if error not in self.errors:
+            self.errors.append(error)
+        return 1 + self.errors.index(error)
+
+    def _transitions(self, node, settings, flows, boundaries, index):
+        # [(successor index, probability)]: boundary events first, then the flows share the rest
+        spec = settings.get(node.id) or {}
+        branches = spec.get("branches") or {}
+        targets = [[index[flow.target_ref], branches.get(flow.target_ref, branches.get(flow.condition_expression))] for flow in flows]
+        given = sum(probability for _, probability in targets if probability is not None)
+        unset = [target for target in targets if target[1] is None]
+        if given > 1 + 1e-9 or (targets and not unset and abs(given - 1) > 1e-9):
+            log.warning(f"{self.name}.{node.id}: branch probabilities add up to {given}")
+            raise ValueError(f"{self.name}.{node.id}: branch probabilities add up to {given}, not 1")
+        for target in unset:
+            target[1] = (1 - given) / len(unset)
+
+        thrown = [(index[boundary.id], float((settings.get(boundary.id) or {}).get("probability", 0.0))) for boundary in boundaries]
+        rest = 1 - sum(probability for _, probability in thrown)
+        if rest < -1e-9:
+            log.warning(f"{self.name}.{node.id}: boundary event probabilities add up to more than 1")
+            raise ValueError(f"{self.name}.{node.id}: boundary event probabilities add up to more than 1")
+        return thrown + [(target, probability * rest) for target, probability in targets]
+
+    def walk(self, instances, rng, callees, waits=None, timed=True):
+        """
+        Runs `instances` instances through the process together, one step at a time.
+        Args:
+            rng (np.random.Generator): The random stream.
+            callees (dict): Called sheet name to its finished Run, for every process in `known`.
+            waits (dict): Node index to (probability of waiting, mean wait), see queue_wait.
+            timed (bool): Sample durations and waits; off for a routing-only pass.
+        Returns:
+            Run: The cycle time, outcome and visits per node of every instance.
+        """
+        positions = np.full(instances, self.start, dtype=np.int32)
+        cycle = np.zeros(instances)
+        outcomes = np.full(instances, TRUNCATED, dtype=np.int32)
+        visits = np.zeros((instances, len(self.ids)), dtype=np.int32)
+        wait_probability = np.zeros(len(self.ids))
+        wait_mean = np.zeros(len(self.ids))
+        for i, (probability, mean) in (waits or {}).items():
+            wait_probability[i], wait_mean[i] = probability, mean
+        call_nodes = np.array(sorted(self.calls), dtype=np.int32)
+
+        running = np.arange(instances)
+        for _ in range(MAX_STEPS):
+            nodes = positions[running]
+            visits[running, nodes] += 1
+            if timed:
+                cycle[running] += sample_durations(rng, self.families[nodes], self.means[nodes], self.cvs[nodes])
+                queued = rng.random(len(nodes)) < wait_probability[nodes]
+                if queued.any():
+                    cycle[running[queued]] += rng.exponential(wait_mean[nodes[queued]])
+
+            ends = self.end_codes[nodes]
+            ending = ends != NOT_AN_END
+            outcomes[running[ending]] = ends[ending]
+            running, nodes = running[~ending], nodes[~ending]
+            if not len(running):
+                break
+
+            # pick each instance's next node by its cumulative branch probabilities
+            draws = rng.random(len(running))
+            choice = np.minimum((draws[:, None] >= self.cumulative[nodes]).sum(axis=1), self.successors.shape[1] - 1)
+            following = self.successors[nodes, choice]
+
+            # call activities replay a finished instance of the callee, whose outcome decides the way out
+            failed = np.zeros(len(running), dtype=bool)
+            for call in np.unique(nodes[np.isin(nodes, call_nodes)]):
+                at_call = np.flatnonzero(nodes == call)
+                callee = callees[self.calls[call]]
+                picked = rng.integers(callee.instances, size=len(at_call))
+                if timed:
+                    cycle[running[at_call]] += callee.cycle[picked]
+                callee_outcomes = callee.outcomes[picked]
+                for code in np.unique(callee_outcomes[callee_outcomes != COMPLETED]):
+                    hit = at_call[callee_outcomes == code]
+                    error = callee.errors[code - 1] if code > 0 else None
+                    boundary = next((boundary for ref, boundary in self.catches[call] if code > 0 and ref in (None, error)), None)
+                    if boundary is not None:
+                        following[hit] = boundary
+                    else: # uncaught, the instance ends the same way as the callee
+                        failed[hit] = True
+                        outcomes[running[hit]] = self.error_code(error) if code > 0 else TRUNCATED
+            positions[running] = following
+            running = running[~failed]
+            if not len(running):
+                break
+
+        stats.count("instances_simulated", instances)
+        return Run(self, cycle, outcomes, visits)
+
+class Run:
+    """
+        The result of ProcessModel.walk: per instance the cycle time in seconds, the outcome
+        (COMPLETED, TRUNCATED or 1 + the index of its errorRef in `errors`) and the visits per node.
+    """
+    __slots__ = ("model", "cycle", "outcomes", "visits", "errors")
+
+    def __init__(self, model, cycle, outcomes, visits):
+        self.model = model
+        self.cycle = cycle
+        self.outcomes = outcomes
+        self.visits = visits
+        self.errors = list(model.errors)
+
+    @property
+    def instances(self):
+        return len(self.cycle)
+
+def build_models(sheets, name, config):
+    """
+    Builds the ProcessModel of sheet `name` and of every sheet it calls, directly or not.
+    Returns:
+        dict: Sheet name to ProcessModel, callees before their callers.
+    Raises:
+        ValueError: If a sheet is missing, does not generate, or the calls are recursive.
+    """
+    settings = config.get("processes") or {}
+    models = {}
+
+    def build(sheet, callers):
+        if sheet in models:
+            return
+        if sheet in callers:
+            log.warning(f"Recursive call activities: {' -> '.join(callers + [sheet])}")
+            raise ValueError(f"Recursive call activities: {' -> '.join(callers + [sheet])}")
+        if sheet not in sheets:
+            log.warning(f"Sheet '{sheet}' not found")
+            raise ValueError(f"Sheet '{sheet}' not found")
+        process = wg.generate_workflow(sheet, sheets[sheet]).processes[0]
+        for node in process.elements.values():
+            if isinstance(node, wg.CallActivity) and node.called_element and _called_process(node.called_element) in sheets:
+                build(_called_process(node.called_element), callers + [sheet])
+        models[sheet] = ProcessModel(sheet, process, settings.get(sheet) or {}, known=set(models))
+
+    build(name, [])
+    return models
+
+def simulate(sheets, name, instances=10000, rate=None, config=None, seed=1):
+    """
+    Simulates sheet `name` and the processes it calls.
+    1. Routing only, callees first: how often each node is visited per instance.
+    2. Arrival rates, callers first: `rate` per hour for `name`, then each callee at the rate of the
+       call activities that call it. Each node's rate gives its queue (queue_wait).
+    3. The timed walk, callees first, with those waits.
+    Args:
+        sheets (dict): Sheet name to DataFrame.
+        instances (int): Instances simulated per process.
+        rate (float): Instances of `name` started per hour; None for no queueing.
+        config (dict): The side file, see load_config.
+        seed (int): The random seed; the same seed gives the same report.
+    Returns:
+        dict: The JSON-ready report.
+    """
+    config = config or {}
+    rate = rate if rate is not None else config.get("rate")
+    models = build_models(sheets, name, config)
+    routing_rng, timing_rng = (np.random.default_rng(stream) for stream in np.random.SeedSequence(seed).spawn(2))
+    started = time.perf_counter()
+
+    with stats.timer("simulate"):
+        routes = {}
+        for sheet, model in models.items():
+            routes[sheet] = model.walk(instances, routing_rng, routes, timed=False)
+
+        rates = {sheet: 0.0 for sheet in models} # instances per second
+        rates[name] = (rate or 0.0) / 3600
+        for sheet in reversed(list(models)):
+            model = models[sheet]
+            for call, callee in model.calls.items():
+                rates[callee] += rates[sheet] * routes[sheet].visits[:, call].mean()
+
+        runs = {}
+        queues = {}
+        for sheet, model in models.items():
+            visits = routes[sheet].visits.mean(axis=0)
+            queues[sheet] = {i: queue_wait(rates[sheet] * visits[i], model.means[i], model.cvs[i], model.servers[i])
+                             for i in range(len(model.ids))}
+            runs[sheet] = model.walk(instances, timing_rng, runs, waits=queues[sheet])
+
+    return {
+        "process": name,
+        "instances": instances,
+        "rate_per_hour": rate,
+        "seed": seed,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "processes": {sheet: process_report(runs[sheet], rates[sheet], queues[sheet]) for sheet in reversed(list(models))},
+    }
+
+def _number(value, digits=3):
+    # JSON has no infinity: an overloaded queue is reported as None
+    return round(float(value), digits) if math.isfinite(value) else None
+
+def process_report(run, rate, queues):
+    """
+    Returns:
+        dict: The cycle-time percentiles, outcomes and per node statistics of one Run.
+    """
+    model = run.model
+    outcomes = {"completed": int((run.outcomes == COMPLETED).sum()), "truncated": int((run.outcomes == TRUNCATED).sum())}
+    for code, error in enumerate(run.errors, start=1):
+        outcomes[error] = int((run.outcomes == code).sum())
+    nodes = []
+    for i, (id, kind) in enumerate(zip(model.ids, model.kinds)):
+        visits = run.visits[:, i]
+        node_rate = rate * visits.mean() # arrivals per second
+        wait_probability, wait = queues[i]
+        mean_wait = wait_probability * wait if wait_probability else 0.0
+        servers = model.servers[i]
+        nodes.append({
+            "id": id,
+            "kind": kind,
+            "visits": _number(visits.mean()),
+            "repeated": _number((visits > 1).mean()), # share of instances that came back at least once
+            "max_visits": int(visits.max()),
+            "mean_s": _number(model.means[i]) if i not in model.calls else None,
+            "arrivals_per_hour": _number(node_rate * 3600),
+            "servers": servers,
+            "utilization": _number(node_rate * model.means[i] / servers) if servers else None,
+            "wait_s": _number(mean_wait),
+            "waiting": _number(node_rate * mean_wait), # tasks queued in front of the node, on average
+            "open": _number(node_rate * (mean_wait + model.means[i])) if i not in model.calls else None,
+            "overloaded": not math.isfinite(wait),
+        })
+    finished = run.cycle[run.outcomes != TRUNCATED]
+    # nearest rank, so instances behind an overloaded queue (infinite cycle time) need no interpolation
+    percentiles = np.percentile(finished, PERCENTILES, method="inverted_cdf") if len(finished) else [math.nan] * len(PERCENTILES)
+    return {
+        "outcomes": outcomes,
+        "cycle_s": {"mean": _number(finished.mean()) if len(finished) else None,
+                    **{f"p{p}": _number(value) for p, value in zip(PERCENTILES, percentiles)}},
+        "nodes": nodes,
+    }
+
+def _duration(seconds):
+    if seconds is None:
+        return "inf"
+    for unit, size in (("d", 86400), ("h", 3600), ("min", 60)):
+        if seconds >= size:
+            return f"{seconds / size:.1f}{unit}"
+    return f"{seconds:.2f}s"
+
+def print_report(report):
+    rate = f"{report['rate_per_hour']}/h" if report["rate_per_hour"] else "no arrival rate, so no queueing"
+    print(f"{report['instances']} instances per process of {report['process']}, {rate}, in {report['elapsed_s']}s")
+    for sheet, result in report["processes"].items():
+        cycle = result["cycle_s"]
+        print()
+        print(f"{sheet}: " + ", ".join(f"{outcome} {count}" for outcome, count in result["outcomes"].items() if count or outcome == "completed"))
+        print("  cycle time  mean " + _duration(cycle["mean"]) + "".join(f"  p{p} {_duration(cycle[f'p{p}'])}" for p in PERCENTILES))
+        print(f"  {'node':<28}{'visits':>8}{'repeat':>8}{'max':>5}{'util':>7}{'wait':>9}{'waiting':>9}{'open':>8}")
+        for node in result["nodes"]:
+            if node["kind"] in ("StartEvent", "EndEvent", "ExclusiveGateway", "BoundaryEvent"):
+                continue
+            utilization = "over" if node["overloaded"] else (f"{node['utilization']:.0%}" if node["utilization"] is not None else "-")
+            waiting = "inf" if node["overloaded"] else f"{node['waiting']:.1f}"
+            opened = "inf" if node["overloaded"] else ("-" if node["open"] is None else f"{node['open']:.1f}")
+            print(f"  {node['id']:<28}{node['visits']:>8.2f}{node['repeated']:>8.1%}{node['max_visits']:>5}{utilization:>7}"
+                  f"{_duration(node['wait_s']) if not node['overloaded'] else 'inf':>9}{waiting:>9}{opened:>8}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate instances of a generated process to see where it queues up")
+    parser.add_argument("process", help="sheet name of the process, e.g. main")
+    parser.add_argument("--input", "-i", default="workflows.xlsx", help="workbook to read, see workflows_gen.py --input (default: workflows.xlsx)")
+    parser.add_argument("--config", "-c", help="YAML side file with durations, servers and probabilities")
+    parser.add_argument("--instances", "-n", type=int, default=10000, help="instances simulated per process (default: 10000)")
+    parser.add_argument("--rate", type=float, help="instances started per hour, overrides the side file; without one nothing queues")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    parser.add_argument("--output", "-o", help="write the JSON report to this file")
+    parser.add_argument("--verbose", "-v", action="count", default=0, help="log progress (-v) or everything (-vv)")
+    args = parser.parse_args()
+
+    configure_logging(args.verbose)
+    try:
+        report = simulate(dict(read_sheets(args.input)), args.process, args.instances, args.rate, load_config(args.config), args.seed)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
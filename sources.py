@@ -0,0 +1,220 @@
+"""
+    Input sources for the generator. Every source yields (sheet name, DataFrame) pairs one sheet at a
+    time, with the same column contract as workflows.xlsx: the SHEET_COLUMNS (TopElm, Seq, BPMNElm, Id,
+    Name, Next, Config, Meta); other columns are dropped and missing ones read as empty.
+
+        ExcelSource     .xlsx, streamed with openpyxl in read-only mode, one sheet at a time
+        CsvSource       .csv, one file per sheet
+        JsonLinesSource .jsonl, one JSON object per row
+        ParquetSource   .parquet, needs pyarrow
+
+    CSV, JSON Lines and Parquet files can hold many sheets in an optional `Sheet` column, with each
+    sheet's rows kept together; without it the file is one sheet named after the file. A directory is
+    read as one workbook of all the supported files in it, in name order.
+
+        for name, df in read_sheets("catalog.jsonl"):
+            ...
+
+    With frames=False, the Excel, JSON Lines and Parquet sources yield SheetRecords instead of
+    DataFrames and pandas is never imported, which is most of the command line's startup time.
+    workflows_gen takes either. CSV is always read with pandas.
+"""
+import glob
+import json
+import os
+from collections import namedtuple
+from instrumentation import stats
+
+SHEET_COLUMNS = ["TopElm", "Seq", "BPMNElm", "Id", "Name", "Next", "Config", "Meta"]
+SHEET_COLUMN = "Sheet"
+# The full column layout of workflows.xlsx; Role and Desc are documentation only
+WORKBOOK_COLUMNS = ["TopElm", "Seq", "BPMNElm", "Role", "Id", "Name", "Desc", "Next", "Config", "Meta"]
+# Cells read as empty, the same as pandas.read_excel does by default (so "N/A" in Next or Config is empty)
+NA_VALUES = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+             "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+
+# A sheet's rows without a DataFrame: lists in SHEET_COLUMNS order, and the index as for sheet_frame
+SheetRecords = namedtuple("SheetRecords", ["records", "index"])
+
+def sheet_frame(records, index=None):
+    """
+    Builds a sheet's DataFrame from row dicts (or sequences in SHEET_COLUMNS order), SHEET_COLUMNS only.
+    NA_VALUES strings become empty cells. `index` gives the spreadsheet row - 2 of each record, so
+    validation reports the right rows.
+    """
+    import pandas as pd
+    if not records:
+        stats.count("sheets_read")
+        return pd.DataFrame(columns=SHEET_COLUMNS)
+    df = pd.DataFrame.from_records(records, columns=SHEET_COLUMNS, index=index)
+    df = df.where(~df.isin(NA_VALUES), None)
+    stats.count("sheets_read")
+    return df
+
+def sheet_records(records, index=None):
+    """
+    The same as sheet_frame, as SheetRecords: NA_VALUES strings and NaN become None.
+    """
+    rows = []
+    for record in records:
+        values = [record.get(column) for column in SHEET_COLUMNS] if isinstance(record, dict) else list(record)
+        rows.append([None if value != value or (isinstance(value, str) and value in NA_VALUES) else value for value in values])
+    stats.count("sheets_read")
+    return SheetRecords(rows, index)
+
+def _group_sheets(records, default_name):
+    # (name, rows) per run of rows with the same Sheet value; sheets may not be split over several runs
+    seen = set()
+    name, rows = None, []
+    for record in records:
+        record_name = record.get(SHEET_COLUMN) or default_name
+        if record_name != name:
+            if rows:
+                yield name, rows
+            if record_name in seen:
+                raise ValueError(f"Rows of sheet '{record_name}' are not contiguous")
+            seen.add(record_name)
+            name, rows = record_name, []
+        rows.append(record)
+    if rows:
+        yield name, rows
+
+def _stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+class ExcelSource:
+    """
+        Streams an .xlsx workbook with openpyxl in read-only mode: cells are read row by row from the
+        file as each sheet is reached, and only the SHEET_COLUMNS are kept. Fully empty rows are skipped.
+    """
+    def __init__(self, path, sheets=None, frames=True):
+        self.path = path
+        self.sheets = sheets # only these sheet names, None for all
+        self.frames = frames
+
+    def __iter__(self):
+        import openpyxl # only Excel sources need it
+        workbook = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            for worksheet in workbook.worksheets:
+                if self.sheets is not None and worksheet.title not in self.sheets:
+                    continue
+                with stats.timer("read"):
+                    df = self.read_sheet(worksheet, self.frames)
+                yield worksheet.title, df
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def read_sheet(worksheet, frames=True):
+        build = sheet_frame if frames else sheet_records
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return build([])
+        positions = [header.index(column) if column in header else None for column in SHEET_COLUMNS]
+        records, index = [], []
+        for number, row in enumerate(rows):
+            if all(value is None for value in row):
+                continue
+            records.append([row[position] if position is not None and position < len(row) else None for position in positions])
+            index.append(number) # header is row 1, so this is the spreadsheet row - 2
+        return build(records, index)
+
+class CsvSource:
+    def __init__(self, path, frames=True): # always yields DataFrames, as pandas does the reading anyway
+        self.path = path
+
+    def __iter__(self):
+        import pandas as pd
+        with stats.timer("read"):
+            df = pd.read_csv(self.path, usecols=lambda column: column in SHEET_COLUMNS or column == SHEET_COLUMN)
+        if SHEET_COLUMN not in df.columns:
+            yield _stem(self.path), sheet_frame(df.to_dict("records"))
+            return
+        for name, rows in _group_sheets(df.to_dict("records"), _stem(self.path)):
+            yield name, sheet_frame(rows)
+
+class JsonLinesSource:
+    """
+        One JSON object per line, e.g. {"Sheet": "approval", "TopElm": "Process", "Seq": 1, ...}. The file
+        is read line by line and each sheet is yielded as soon as its last row is read.
+    """
+    def __init__(self, path, frames=True):
+        self.path = path
+        self.frames = frames
+
+    def __iter__(self):
+        build = sheet_frame if self.frames else sheet_records
+        with open(self.path, encoding="utf-8") as f:
+            records = (json.loads(line) for line in f if line.strip())
+            for name, rows in _group_sheets(records, _stem(self.path)):
+                yield name, build(rows)
+
+class ParquetSource:
+    """
+        Reads only the SHEET_COLUMNS (and Sheet) column chunks, one row group at a time.
+    """
+    def __init__(self, path, frames=True):
+        self.path = path
+        self.frames = frames
+
+    def __iter__(self):
+        build = sheet_frame if self.frames else sheet_records
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet needs pyarrow: pip install pyarrow") from None
+        parquet = pq.ParquetFile(self.path)
+        columns = [column for column in parquet.schema_arrow.names if column in SHEET_COLUMNS or column == SHEET_COLUMN]
+
+        def records():
+            for batch in parquet.iter_batches(columns=columns):
+                yield from batch.to_pylist()
+        for name, rows in _group_sheets(records(), _stem(self.path)):
+            yield name, build(rows)
+
+SOURCES = {
+    ".xlsx": ExcelSource,
+    ".csv": CsvSource,
+    ".jsonl": JsonLinesSource,
+    ".parquet": ParquetSource,
+}
+
+def open_source(path, frames=True):
+    """
+    Returns:
+        The source for `path`, picked by its extension, see SOURCES.
+    Raises:
+        ValueError: If the extension is not supported.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SOURCES:
+        raise ValueError(f"Unsupported input '{path}', expected one of {', '.join(SOURCES)} or a directory")
+    return SOURCES[extension](path, frames=frames)
+
+def source_files(path):
+    """
+    Returns:
+        list: `path` itself, or for a directory every supported file in it (Excel lock files excluded), sorted.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(file for file in glob.glob(os.path.join(path, "*"))
+                  if os.path.splitext(file)[1].lower() in SOURCES and not os.path.basename(file).startswith("~$"))
+
+def read_sheets(path, sheets=None, frames=True):
+    """
+    Yields (sheet name, DataFrame) for every sheet of a file or, for a directory, of every supported
+    file in it (Excel lock files excluded), one sheet at a time.
+    Args:
+        sheets (set): Only these sheet names, None for all. Other Excel sheets are not even read.
+        frames (bool): False for SheetRecords instead of DataFrames, see the module docstring.
+    """
+    for file in source_files(path):
+        source = open_source(file, frames=frames)
+        if sheets is not None and isinstance(source, ExcelSource):
+            source.sheets = sheets
+        for name, df in source:
+            if sheets is None or name in sheets:
+                yield name, df
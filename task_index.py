@@ -0,0 +1,124 @@
+"""
+    Lookup of user task metadata from the `*_tasks.json` sidecars that workflows_gen.py writes next to
+    each BPMN file, so a UI can render a task's buttons without fetching and parsing the process XML.
+
+        index = TaskIndex("generated")
+        index.meta("approval_process:3:8f1c...", "Task2")   # {'RSA': '1', 'ACK': '2'}
+        index.decisions("approval_process", "Task2")        # gateway branches after the task
+
+    Process definition ids (`key:version:id`) and plain keys are both accepted. Parsed sidecars are
+    kept in an LRU cache and reloaded when their file changes.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from collections import OrderedDict
+
+TASK_INDEX_SUFFIX = "_tasks.json" # keep in sync with workflows_gen.TASK_INDEX_SUFFIX
+RESCAN_INTERVAL = 1.0 # seconds; unknown processes rescan the folder at most this often
+
+def process_key(process_definition):
+    # Camunda process definition ids are `key:version:uuid`; a plain key is returned as is
+    return process_definition.split(":", 1)[0]
+
+class TaskIndex:
+    """
+        Resolves (process, task) to the task's entry of its sidecar, see Workflow.task_index.
+        Args:
+            folder (str): Where the sidecars are, normally the generator's output folder.
+            cache_size (int): Sidecars kept parsed in memory, least recently used ones are dropped first.
+            check_mtime (bool): Stat the sidecar on every lookup and reload it when it changed. Turn off
+                                when the files never change while the process runs, to save the stat.
+    """
+    def __init__(self, folder="generated", cache_size=128, check_mtime=True):
+        self.folder = folder
+        self.cache_size = cache_size
+        self.check_mtime = check_mtime
+        self._files = {} # process key to sidecar path
+        self._cache = OrderedDict() # sidecar path to (mtime_ns, processes)
+        self._scanned_at = None
+
+    def _scan(self):
+        # Map every process key to its sidecar; sidecars are small, so reading them once is cheap
+        now = time.monotonic()
+        if self._scanned_at is not None and now - self._scanned_at < RESCAN_INTERVAL:
+            return
+        self._scanned_at = now
+        self._files = {}
+        for path in glob.glob(os.path.join(self.folder, f"*{TASK_INDEX_SUFFIX}")):
+            for key in self._load(path):
+                self._files[key] = path
+
+    def _load(self, path):
+        mtime = os.stat(path).st_mtime_ns if self.check_mtime or path not in self._cache else None
+        cached = self._cache.get(path)
+        if cached is not None and (mtime is None or cached[0] == mtime):
+            self._cache.move_to_end(path)
+            return cached[1]
+        with open(path, encoding="utf-8") as f:
+            processes = json.load(f).get("processes", {})
+        self._cache[path] = (mtime, processes)
+        self._cache.move_to_end(path)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return processes
+
+    def task(self, process_definition, task_id):
+        """
+        Returns:
+            dict: The task's name, formKey, config, meta, outgoing flows and gateway decisions,
+                  or None if the process or task is unknown.
+        """
+        key = process_key(process_definition)
+        path = self._files.get(key)
+        if path is None: # new or renamed sheet since the last scan
+            self._scan()
+            path = self._files.get(key)
+            if path is None:
+                return None
+        try:
+            processes = self._load(path)
+        except FileNotFoundError:
+            self._files.pop(key, None)
+            return None
+        process = processes.get(key)
+        if process is None: # the process moved to another sheet
+            self._files.pop(key, None)
+            return None
+        return process["tasks"].get(task_id)
+
+    def meta(self, process_definition, task_id):
+        """
+        Returns:
+            dict: The task's camunda:meta entries, e.g. the buttons to render; empty if unknown.
+        """
+        task = self.task(process_definition, task_id)
+        return task["meta"] if task else {}
+
+    def decisions(self, process_definition, task_id):
+        """
+        Returns:
+            list: {"gateway", "condition", "target"} for each branch of the gateways right after the task.
+        """
+        task = self.task(process_definition, task_id)
+        return task["decisions"] if task else []
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up the metadata of a user task from the generated sidecars")
+    parser.add_argument("process", help="process definition id or key, e.g. approval_process")
+    parser.add_argument("task", help="user task id, e.g. Task2")
+    parser.add_argument("--folder", default="generated", help="folder with the *_tasks.json sidecars (default: generated)")
+    args = parser.parse_args()
+
+    index = TaskIndex(args.folder)
+    task = index.task(args.process, args.task)
+    if task is None:
+        print(f"Error: No user task '{args.task}' in process '{args.process}'.")
+        raise SystemExit(1)
+    started = time.perf_counter()
+    for _ in range(10000):
+        index.task(args.process, args.task)
+    print(json.dumps(task, indent=2))
+    print(f"Warm lookup: {(time.perf_counter() - started) / 10000 * 1e6:.1f}us")
@@ -1,8 +1,20 @@
+import argparse
+import copy
+import functools
+import hashlib
+import io
 import json
-import yaml
-from xml.dom import minidom
+import logging
+import math
+import os
+import re
+import sys
+import time
+from collections import deque, namedtuple
 import xml.etree.ElementTree as ET
-import pandas as pd
+from instrumentation import configure_logging, profiled, stats, write_report
+from layout import layered_layout, route_edges
+from sources import SHEET_COLUMNS, SheetRecords, read_sheets, source_files
 
 BPMN_NS = "http://www.omg.org/spec/BPMN/20100524/MODEL"
 CAMUNDA_NS = "http://camunda.org/schema/1.0/bpmn"
@@ -11,12 +23,29 @@ OMGDC_NS = "http://www.omg.org/spec/DD/20100524/DC"
 OMGDI_NS = "http://www.omg.org/spec/DD/20100524/DI"
 XSI_NS = "http://www.w3.org/2001/XMLSchema-instance"
 
-ET.register_namespace('', BPMN_NS)
-ET.register_namespace('camunda', CAMUNDA_NS)
-ET.register_namespace('bpmndi', BPMNDI_NS)
-ET.register_namespace('omgdc', OMGDC_NS)
-ET.register_namespace('omgdi', OMGDI_NS)     
-ET.register_namespace('xsi', XSI_NS) 
+# Bump whenever a change to the generator alters the BPMN it writes, so incremental builds redo every sheet
+GENERATOR_VERSION = "4"
+MANIFEST_FILE = ".manifest.json"
+TASK_INDEX_SUFFIX = "_tasks.json" # user task metadata sidecar written next to each BPMN file, see task_index.py
+TASK_INDEX_VERSION = 1
+LAYOUTS = ("layered", "linear")
+
+# Workbooks repeat the same Config/Meta/Next snippets over and over, so parsed cells are memoized
+PARSE_CACHE_SIZE = 4096
+
+NAMESPACE_PREFIXES = {
+    BPMN_NS: '',
+    CAMUNDA_NS: 'camunda',
+    BPMNDI_NS: 'bpmndi',
+    OMGDC_NS: 'omgdc',
+    OMGDI_NS: 'omgdi',
+    XSI_NS: 'xsi',
+}
+
+log = logging.getLogger("workflows_gen")
+
+for _uri, _prefix in NAMESPACE_PREFIXES.items():
+    ET.register_namespace(_prefix, _uri)
 
 class Workflow:
     """
@@ -29,134 +58,288 @@ class Workflow:
                      targetNamespace="http://bpmn.io/schema/bpmn"
                      id="Definitions_1">
             ...
+
+        The workflow and everything in it is kept in a compact intermediate form (slotted objects
+        holding ids, attributes and positions); ElementTree nodes are only built while serializing,
+        one top-level element at a time.
     """
     def __init__(self, id="Definitions_1", name=None, target_namespace="http://bpmn.io/schema/bpmn"):
+        self.id = id
         self.name = name
-        self.root = ET.Element(f"{{{BPMN_NS}}}definitions", {
-            "targetNamespace": target_namespace,
-            "id": id
-        })
+        self.target_namespace = target_namespace
         self.errors = []
         self.processes = []
+        self.diagram = None
+        self._definitions = [] # errors and processes, in the order they were added
 
     def add_error(self, error):
-        self.root.append(error.element)
+        self._definitions.append(error)
         self.errors.append(error)
 
     def add_process(self, process):
-        self.root.append(process.element)
+        self._definitions.append(process)
         self.processes.append(process)
 
-    def generate_diagram(self):
+    def generate_diagram(self, layout="layered"):
+        """
+        Adds the BPMNDiagram with a shape for every element and an edge for every sequence flow.
+        Args:
+            layout (str): `layered` (default) places elements in columns by longest path, orders
+                          each column to reduce crossings and routes flows orthogonally around the
+                          shapes; `linear` walks the elements in Seq order on a single line.
+        """
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout '{layout}'. Expected one of {', '.join(LAYOUTS)}.")
         if not self.processes:
             return
 
         diagram = BPMNDiagram(id=f"BPMNDiagram_{self.name}")
-        self.root.append(diagram.element)
+        self.diagram = diagram
 
         for process in self.processes:
             plane = BPMNPlane(id=f"BPMNPlane_{process.id}", process_element=process.id)
             diagram.add_plane(plane)
 
-            # Auto-position elements
-            x, y = 150, 80
-            max_y = y
-            task_height = 80
-            for seq, element_id in sorted(process.element_positions.items()):
-                elem = process.elements.get(element_id)
-                if elem is not None:
-                    elem_type = elem.tag.split('}')[-1]
-                    has_error_event_definition = elem.find(f'{{{BPMN_NS}}}errorEventDefinition') is not None
-
-                    current_x, current_y = x, y
-
-                    if elem_type == 'boundaryEvent':
-                        attached_to_ref = elem.get('attachedToRef')
-                        attached_shape = plane.shapes.get(f"{attached_to_ref}_di")
-                        if attached_shape:
-                            attached_bounds = attached_shape.bounds
-                            current_x = int(attached_bounds['x']) + int(attached_bounds['width']) // 2 - 18 # Center boundary event
-                            current_y = int(attached_bounds['y']) + int(attached_bounds['height']) - 18
-                    elif has_error_event_definition:
-                        current_y = y + 100
-                        x += 150
-                    else:
-                        x += 150 # Increment x for next non-boundary element
-
-                    if elem_type in ['startEvent', 'endEvent']:
-                        width, height = 36, 36
-                        if not has_error_event_definition:
-                            current_y = y + (task_height - height) // 2
-                    elif elem_type == 'boundaryEvent':
-                        width, height = 36, 36
-                    elif 'gateway' in elem_type.lower():
-                        width, height = 50, 50
-                        current_y = y + (task_height - height) // 2
-                    else: # Tasks
-                        width, height = 100, task_height
-                    
-                    shape = BPMNShape(id=f"{element_id}_di", bpmn_element=element_id, x=str(current_x), y=str(current_y), width=str(width), height=str(height))
-                    plane.add_shape(shape)
-                    max_y = max(max_y, current_y + height)
-
-            # Add edges for sequence flows
-            feedback_y = max_y + 50
-            for sf in process.element.findall(f'{{{BPMN_NS}}}sequenceFlow'):
-                sf_id = sf.get('id')
-                source_id = sf.get('sourceRef')
-                target_id = sf.get('targetRef')
-                
-                source_element = process.elements.get(source_id)
-                source_shape = plane.shapes.get(f"{source_id}_di")
-                target_shape = plane.shapes.get(f"{target_id}_di")
-
-                if source_shape and target_shape:
-                    source_bounds = source_shape.bounds
-                    target_bounds = target_shape.bounds
-
-                    if source_element is not None and source_element.tag.split('}')[-1] == 'boundaryEvent':
-                        # Feedback loop
-                        start_x = int(source_bounds['x']) + int(source_bounds['width']) // 2
-                        start_y = int(source_bounds['y']) + int(source_bounds['height'])
-
-                        end_x = int(target_bounds['x']) + int(target_bounds['width']) // 2
-                        end_y = int(target_bounds['y']) + int(target_bounds['height'])
-
-                        waypoints = [
-                            (start_x, start_y),
-                            (start_x, feedback_y),
-                            (end_x, feedback_y),
-                            (end_x, end_y)
-                        ]
-                    else:
-                        start_x = int(source_bounds['x']) + int(source_bounds['width'])
-                        start_y = int(source_bounds['y']) + int(source_bounds['height']) // 2
-
-                        end_x = int(target_bounds['x'])
-                        end_y = int(target_bounds['y']) + int(target_bounds['height']) // 2
-                        waypoints = [(start_x, start_y), (end_x, end_y)]
-
-                    edge = BPMNEdge(id=f"{sf_id}_di", bpmn_element=sf_id, waypoints=waypoints)
-                    plane.add_edge(edge)
-    
+            if layout == "linear":
+                self._place_linear(process, plane)
+                self._add_edges(process, plane)
+            else:
+                self._place_layered(process, plane)
+                self._route_edges(process, plane)
+
+    @staticmethod
+    def _place_linear(process, plane):
+        # Auto-position elements
+        x, y = 150, 80
+        task_height = 80
+        for elem in process.ordered_elements():
+            element_id = elem.id
+            elem_type = elem.tag
+            has_error_event_definition = bool(getattr(elem, 'error_ref', None))
+
+            current_x, current_y = x, y
+
+            if elem_type == 'boundaryEvent':
+                attached_shape = plane.shapes.get(f"{elem.attached_to_ref}_di")
+                if attached_shape:
+                    current_x = attached_shape.x + attached_shape.width // 2 - 18 # Center boundary event
+                    current_y = attached_shape.y + attached_shape.height - 18
+            elif has_error_event_definition:
+                current_y = y + 100
+                x += 150
+            else:
+                x += 150 # Increment x for next non-boundary element
+
+            width, height = _shape_size(elem_type)
+            if elem_type in ['startEvent', 'endEvent']:
+                if not has_error_event_definition:
+                    current_y = y + (task_height - height) // 2
+            elif 'gateway' in elem_type.lower():
+                current_y = y + (task_height - height) // 2
+            
+            shape = BPMNShape(id=f"{element_id}_di", bpmn_element=element_id, x=current_x, y=current_y, width=width, height=height)
+            plane.add_shape(shape)
+
+    @staticmethod
+    def _place_layered(process, plane):
+        ordered = process.ordered_elements()
+
+        # Boundary events are not laid out themselves; their outgoing flows leave from the host
+        hosts = {elem.id: elem.attached_to_ref for elem in ordered if elem.tag == 'boundaryEvent'}
+        nodes = [elem.id for elem in ordered if elem.id not in hosts]
+        sizes = {elem.id: _shape_size(elem.tag) for elem in ordered}
+        edges = [(hosts.get(flow.source_ref, flow.source_ref), flow.target_ref) for flow in process.flows]
+        positions = layered_layout(nodes, edges, sizes)
+
+        for elem in ordered: # shapes are written in Seq order
+            element_id = elem.id
+            width, height = sizes[element_id]
+            if element_id in hosts:
+                host = hosts[element_id]
+                if host in positions: # Center boundary event on the bottom edge of its host
+                    host_x, host_y = positions[host]
+                    host_width, host_height = sizes[host]
+                    x, y = host_x + host_width // 2 - width // 2, host_y + host_height - height // 2
+                else:
+                    x, y = 150, 80
+            else:
+                x, y = positions[element_id]
+            shape = BPMNShape(id=f"{element_id}_di", bpmn_element=element_id, x=x, y=y, width=width, height=height)
+            plane.add_shape(shape)
+
+    @staticmethod
+    def _route_edges(process, plane):
+        # Orthogonal routes around the placed shapes, see layout.route_edges
+        shapes = {shape.bpmn_element: (shape.x, shape.y, shape.width, shape.height) for shape in plane.shapes.values()}
+        attached = {elem.id: elem.attached_to_ref for elem in process.elements.values() if elem.tag == 'boundaryEvent'}
+        routes = route_edges(shapes, [(flow.id, flow.source_ref, flow.target_ref) for flow in process.flows], attached)
+        for flow in process.flows:
+            if flow.id in routes:
+                plane.add_edge(BPMNEdge(id=f"{flow.id}_di", bpmn_element=flow.id, waypoints=routes[flow.id]))
+
+    @staticmethod
+    def _add_edges(process, plane):
+        # Add edges for sequence flows
+        max_y = max((shape.y + shape.height for shape in plane.shapes.values()), default=80)
+        feedback_y = max_y + 50
+        for flow in process.flows:
+            source_element = process.elements.get(flow.source_ref)
+            source_shape = plane.shapes.get(f"{flow.source_ref}_di")
+            target_shape = plane.shapes.get(f"{flow.target_ref}_di")
+
+            if source_shape and target_shape:
+                if source_element is not None and source_element.tag == 'boundaryEvent':
+                    # Feedback loop
+                    start_x = source_shape.x + source_shape.width // 2
+                    start_y = source_shape.y + source_shape.height
+
+                    end_x = target_shape.x + target_shape.width // 2
+                    end_y = target_shape.y + target_shape.height
+
+                    waypoints = [
+                        (start_x, start_y),
+                        (start_x, feedback_y),
+                        (end_x, feedback_y),
+                        (end_x, end_y)
+                    ]
+                else:
+                    start_x = source_shape.x + source_shape.width
+                    start_y = source_shape.y + source_shape.height // 2
+
+                    end_x = target_shape.x
+                    end_y = target_shape.y + target_shape.height // 2
+                    waypoints = [(start_x, start_y), (end_x, end_y)]
+
+                edge = BPMNEdge(id=f"{flow.id}_di", bpmn_element=flow.id, waypoints=waypoints)
+                plane.add_edge(edge)
+
+    def _root_element(self):
+        return ET.Element(f"{{{BPMN_NS}}}definitions", {"targetNamespace": self.target_namespace, "id": self.id})
+
+    def namespaces(self):
+        """
+        Returns:
+            set: The namespace URIs the serialized workflow uses, worked out from the IR without building it.
+        """
+        uris = {BPMN_NS}
+        for definition in self._definitions:
+            uris |= definition.namespaces()
+        if self.diagram is not None:
+            uris |= self.diagram.namespaces()
+        return uris
+
+    def to_element(self):
+        """
+        Builds the whole document as an ElementTree, e.g. for inspection. Serialization does not need it.
+        """
+        root = self._root_element()
+        root.extend(definition.to_element() for definition in self._definitions)
+        if self.diagram is not None:
+            root.append(self.diagram.to_element())
+        return root
+
+    def write_xml(self, stream, pretty=True):
+        """
+        Serializes the workflow straight to a text stream in a single pass over the tree.
+        Args:
+            stream: Any object with a write(str) method, e.g. an open file or io.StringIO.
+            pretty (bool): Indent the document. Set to False for compact, machine-only output.
+        """
+        writer = XMLWriter(stream, self.namespaces(), pretty=pretty)
+        writer.declaration()
+        root = self._root_element()
+        if not self._definitions and self.diagram is None:
+            writer.element(root)
+            return
+        writer.start(root)
+        for definition in self._definitions:
+            definition.write(writer, 1)
+        if self.diagram is not None:
+            self.diagram.write(writer, 1)
+        writer.end(root)
+
     def to_pretty_xml(self):
-        rough_string = ET.tostring(self.root, 'utf-8')
-        reparsed = minidom.parseString(rough_string)
-        return reparsed.toprettyxml(indent="  ")
+        buffer = io.StringIO()
+        self.write_xml(buffer)
+        return buffer.getvalue()
     
-    def to_xml(self, filename):
-        to_pretty_xml = self.to_pretty_xml()
+    def to_xml(self, filename, pretty=True):
+        with open(filename, 'w', encoding='utf-8') as f:
+            self.write_xml(f, pretty=pretty)
+
+    def task_index(self):
+        """
+        Collects what a UI needs to render each user task, so it does not have to fetch and parse the
+        process definition XML: the task's Meta (as written to camunda:meta), its Config attributes and
+        formKey, its outgoing flows and the conditional branches of any gateway those flows lead to.
+        Returns:
+            dict: {"version": ..., "processes": {process id: {"tasks": {task id: {...}}}}}
+        """
+        processes = {}
+        for process in self.processes:
+            outgoing = {}
+            for flow in process.flows:
+                outgoing.setdefault(flow.source_ref, []).append(flow)
+            tasks = {}
+            for elem in process.elements.values():
+                if elem.tag != "userTask":
+                    continue
+                config = dict(elem.attrib)
+                decisions = []
+                for flow in outgoing.get(elem.id, ()):
+                    target = process.elements.get(flow.target_ref)
+                    if target is not None and target.tag == "exclusiveGateway":
+                        decisions.extend({"gateway": target.id, "condition": branch.condition_expression, "target": branch.target_ref}
+                                         for branch in outgoing.get(target.id, ()))
+                tasks[elem.id] = {
+                    "name": elem.name,
+                    "formKey": next((value for key, value in elem.attrib if key.split("}")[-1].split(":")[-1] == "formKey"), None),
+                    "config": config,
+                    "meta": dict(elem.meta),
+                    "outgoing": [{"flow": flow.id, "target": flow.target_ref, "condition": flow.condition_expression}
+                                 for flow in outgoing.get(elem.id, ())],
+                    "decisions": decisions,
+                }
+            processes[process.id] = {"tasks": tasks}
+        return {"version": TASK_INDEX_VERSION, "processes": processes}
+
+    def write_task_index(self, filename):
         with open(filename, 'w', encoding='utf-8') as f:
-            f.write(to_pretty_xml)
+            json.dump(self.task_index(), f, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+def _attribute_namespaces(attrib):
+    # Namespaces of Clark-notation attribute names, e.g. a Config key like {uri}name
+    return {key[1:].partition("}")[0] for key, _ in attrib if key[:1] == "{"}
+
+def _to_attrib(config):
+    # Config mapping to a tuple of (name, value) attributes, dropping empty values
+    if not config:
+        return ()
+    return tuple((_intern(str(key)), value) for key, value in config.items() if value is not None)
 
 class Error:
     """
         <error id="REJECTION_ERROR" name="Rejection Error" errorCode="REJECTION_ERROR" />
     """
+    __slots__ = ("id", "name", "error_code")
+
     def __init__(self, id, name, error_code):
-        self.id = id
-        attribs = {"id": id, "name": name, "errorCode": error_code}
-        self.element = ET.Element(f"{{{BPMN_NS}}}error", attrib=attribs)
+        self.id = _intern(id)
+        self.name = name
+        self.error_code = _intern(error_code)
+
+    def namespaces(self):
+        return set()
+
+    def to_element(self):
+        attribs = {key: value for key, value in (("id", self.id), ("name", self.name), ("errorCode", self.error_code)) if value is not None}
+        return ET.Element(f"{{{BPMN_NS}}}error", attrib=attribs)
+
+    def write(self, writer, level):
+        writer.element(self.to_element(), level)
 
 class Process:
     """
@@ -164,49 +347,134 @@ class Process:
             ...
         </process>
     """
+    __slots__ = ("id", "is_executable", "history_ttl", "elements", "flows")
+
     def __init__(self, id="Process_1", is_executable=True, history_ttl="180"):
-        self.id = id
-        self.element = ET.Element(
+        self.id = _intern(id)
+        self.is_executable = is_executable
+        self.history_ttl = history_ttl
+        self.elements = {} # id to element, in document order
+        self.flows = [] # SequenceFlows in document order, the adjacency used by the layout
+
+    @property
+    def element_positions(self):
+        return {elem.seq: elem.id for elem in self.elements.values()}
+
+    def ordered_elements(self):
+        """
+        Returns:
+            list: The elements sorted by Seq, the order shapes are laid out in.
+        """
+        return sorted(self.elements.values(), key=lambda elem: (elem.seq is None, elem.seq or 0))
+
+    def _add_element(self, element):
+        self.elements[element.id] = element
+
+    def _add_flow(self, flow):
+        self.flows.append(flow)
+
+    def add_sequence_flow(self, id, source_ref, target_ref):
+        return SequenceFlow(self, id=id, source_ref=source_ref, target_ref=target_ref)
+
+    def namespaces(self):
+        uris = {BPMN_NS, CAMUNDA_NS}
+        for elem in self.elements.values():
+            uris |= elem.namespaces()
+        if any(flow.condition_expression for flow in self.flows):
+            uris.add(XSI_NS)
+        return uris
+
+    def _element(self):
+        return ET.Element(
             f"{{{BPMN_NS}}}process",
-            id=id,
-            isExecutable=str(is_executable).lower(),
-            **{f"{{{CAMUNDA_NS}}}historyTimeToLive": history_ttl}
+            id=self.id,
+            isExecutable=str(self.is_executable).lower(),
+            **{f"{{{CAMUNDA_NS}}}historyTimeToLive": self.history_ttl}
         )
-        self.elements = {}
-        self.element_positions = {}
 
-    def _add_element(self, element, elem_id):
-        self.elements[elem_id] = element
+    def to_element(self):
+        element = self._element()
+        element.extend(elem.to_element() for elem in self.elements.values())
+        element.extend(flow.to_element() for flow in self.flows)
+        return element
 
-    def add_sequence_flow(self, id, source_ref, target_ref):
-        return ET.SubElement(self.element, f"{{{BPMN_NS}}}sequenceFlow", id=id, sourceRef=source_ref, targetRef=target_ref)
+    def write(self, writer, level):
+        element = self._element()
+        if not self.elements and not self.flows:
+            writer.element(element, level)
+            return
+        writer.start(element, level)
+        for elem in self.elements.values():
+            writer.element(elem.to_element(), level + 1)
+        for flow in self.flows:
+            writer.element(flow.to_element(), level + 1)
+        writer.end(element, level)
 
-class StartEvent:
+class FlowNode:
     """
-        <startEvent id="StartEvent_1" />
+        Base of the process elements. Each one keeps only what its XML needs in __slots__, with ids
+        and attribute names interned, and builds its ElementTree node in to_element at serialization.
+        `tag` is the local BPMN tag name; elements with `has_name` write a name attribute after the id,
+        followed by the Config attributes.
     """
-    def __init__(self, process, id="StartEvent_1", seq=None, next=None):
-        self.element = ET.SubElement(process.element, f"{{{BPMN_NS}}}startEvent", id=id)
+    __slots__ = ("id", "name", "attrib", "seq", "next")
+    tag = None
+    has_name = True
+
+    def __init__(self, process, id, name=None, config=None, seq=None, next=None):
+        self.id = _intern(id)
+        self.name = name
+        self.attrib = _to_attrib(parse_config_meta_next(config))
         self.seq = seq
         self.next = parse_config_meta_next(next)
-        process._add_element(self.element, id)
+        process._add_element(self)
+
+    def namespaces(self):
+        return _attribute_namespaces(self.attrib)
+
+    def _element(self):
+        attrib = {"id": self.id}
+        if self.has_name and self.name is not None:
+            attrib["name"] = self.name
+        attrib.update(self.attrib)
+        return ET.Element(f"{{{BPMN_NS}}}{self.tag}", attrib)
+
+    def to_element(self):
+        return self._element()
+
+class StartEvent(FlowNode):
+    """
+        <startEvent id="StartEvent_1" />
+    """
+    __slots__ = ()
+    tag = "startEvent"
+    has_name = False
+
+    def __init__(self, process, id="StartEvent_1", seq=None, next=None):
+        super().__init__(process, id, seq=seq, next=next)
 
-class EndEvent:
+class EndEvent(FlowNode):
     """
         <endEvent id="EndEvent_1">
             <errorEventDefinition errorRef="REJECTION_ERROR" />
         </endEvent>
     """
+    __slots__ = ("error_ref",)
+    tag = "endEvent"
+    has_name = False
+
     def __init__(self, process, id="EndEvent_1", meta=None, seq=None, next=None):
-        self.element = ET.SubElement(process.element, f"{{{BPMN_NS}}}endEvent", id=id)
+        super().__init__(process, id, seq=seq, next=next)
         meta = parse_config_meta_next(meta)
-        if meta and meta.get("errorRef", None):    
-            ET.SubElement(self.element, f"{{{BPMN_NS}}}errorEventDefinition", errorRef=meta.get("errorRef", None))
-        self.seq = seq
-        self.next = parse_config_meta_next(next)
-        process._add_element(self.element, id)
+        self.error_ref = _intern(meta.get("errorRef", None)) if meta else None
 
-class UserTask:
+    def to_element(self):
+        element = self._element()
+        if self.error_ref:
+            ET.SubElement(element, f"{{{BPMN_NS}}}errorEventDefinition", errorRef=self.error_ref)
+        return element
+
+class UserTask(FlowNode):
     """
         <userTask id="UserTask_1" name="Approval Task" camunda:assignee="john.doe">
             <extensionElements>
@@ -215,22 +483,30 @@ class UserTask:
             </extensionElements>
         </userTask>
     """
+    __slots__ = ("meta",)
+    tag = "userTask"
+
     def __init__(self, process, id, name, config=None, meta=None, seq=None, next=None):
-        config = parse_config_meta_next(config)
-        self.element = ET.SubElement(process.element, f"{{{BPMN_NS}}}userTask", id=id, name=name, **(config if config else {}))
-        
+        super().__init__(process, id, name=name, config=config, seq=seq, next=next)
         meta = parse_config_meta_next(meta)
-        if meta:
-            ext = ET.SubElement(self.element, f"{{{BPMN_NS}}}extensionElements")
-            for key, value in meta.items():
-                meta_elem = ET.SubElement(ext, f"{{{CAMUNDA_NS}}}meta", key=str(key))
-                meta_elem.text = str(value)
+        self.meta = tuple((_intern(str(key)), str(value)) for key, value in meta.items()) if meta else ()
 
-        self.seq = seq
-        self.next = parse_config_meta_next(next)
-        process._add_element(self.element, id)
+    def namespaces(self):
+        uris = super().namespaces()
+        if self.meta:
+            uris.add(CAMUNDA_NS)
+        return uris
 
-class ConnectorServiceTask:
+    def to_element(self):
+        element = self._element()
+        if self.meta:
+            ext = ET.SubElement(element, f"{{{BPMN_NS}}}extensionElements")
+            for key, value in self.meta:
+                meta_elem = ET.SubElement(ext, f"{{{CAMUNDA_NS}}}meta", key=key)
+                meta_elem.text = value
+        return element
+
+class ConnectorServiceTask(FlowNode):
     """
         <serviceTask id="ServiceTask_1" name="HTTP Connector Task">
             <extensionElements>
@@ -245,7 +521,11 @@ class ConnectorServiceTask:
             </extensionElements>
         </serviceTask>
     """
+    __slots__ = ("url", "method", "payload")
+    tag = "serviceTask"
+
     def __init__(self, process, id, name, meta, seq=None, next=None):
+        super().__init__(process, id, name=name, seq=seq, next=next)
         url = None
         method = None
         payload = None
@@ -256,29 +536,34 @@ class ConnectorServiceTask:
             method = meta.get('method', 'GET')
             payload = meta.get('payload', None)
 
-        self.element = ET.SubElement(process.element, f"{{{BPMN_NS}}}serviceTask", id=id, name=name)
-        ext = ET.SubElement(self.element, f"{{{BPMN_NS}}}extensionElements")
+        self.url = url
+        self.method = _intern(method)
+        self.payload = json.dumps(payload) if payload else None
+
+    def namespaces(self):
+        return super().namespaces() | {CAMUNDA_NS}
+
+    def to_element(self):
+        element = self._element()
+        ext = ET.SubElement(element, f"{{{BPMN_NS}}}extensionElements")
         connector = ET.SubElement(ext, f"{{{CAMUNDA_NS}}}connector")
         ET.SubElement(connector, f"{{{CAMUNDA_NS}}}connectorId").text = "http-connector"
         io = ET.SubElement(connector, f"{{{CAMUNDA_NS}}}inputOutput")
-        ET.SubElement(io, f"{{{CAMUNDA_NS}}}inputParameter", name="url").text = url
-        ET.SubElement(io, f"{{{CAMUNDA_NS}}}inputParameter", name="method").text = method
-        if payload:
-            ET.SubElement(io, f"{{{CAMUNDA_NS}}}inputParameter", name="payload").text = json.dumps(payload)
-        
-        self.seq = seq
-        self.next = parse_config_meta_next(next)
-        process._add_element(self.element, id)
+        ET.SubElement(io, f"{{{CAMUNDA_NS}}}inputParameter", name="url").text = self.url
+        ET.SubElement(io, f"{{{CAMUNDA_NS}}}inputParameter", name="method").text = self.method
+        if self.payload:
+            ET.SubElement(io, f"{{{CAMUNDA_NS}}}inputParameter", name="payload").text = self.payload
+        return element
 
-class ExclusiveGateway:
+class ExclusiveGateway(FlowNode):
     """
         <exclusiveGateway id="ExclusiveGateway_1" name="Decision Point" />
     """ 
+    __slots__ = ()
+    tag = "exclusiveGateway"
+
     def __init__(self, process, id, name=None, seq=None, next=None):
-        self.element = ET.SubElement(process.element, f"{{{BPMN_NS}}}exclusiveGateway", id=id, name=name)
-        self.seq = seq
-        self.next = parse_config_meta_next(next)
-        process._add_element(self.element, id)
+        super().__init__(process, id, name=name, seq=seq, next=next)
 
 class SequenceFlow:
     """
@@ -286,6 +571,8 @@ class SequenceFlow:
             <conditionExpression xsi:type="tFormalExpression">${approved == true}</conditionExpression>
         </sequenceFlow>
     """
+    __slots__ = ("id", "source_ref", "target_ref", "condition_expression")
+
     def __init__(self, process, id, source_ref, target_ref, condition_expression=None):
         """
             Creates a Sequence Flow element connecting two other elements.
@@ -296,21 +583,29 @@ class SequenceFlow:
                 target_ref (str): The ID of the target element.
                 condition_expression (str, optional): A JUEL expression for conditional flows, typically used for paths from a gateway (e.g., '${approved == true}').
         """
+        self.id = _intern(id)
+        self.source_ref = _intern(source_ref)
+        self.target_ref = _intern(target_ref)
+        self.condition_expression = _intern(condition_expression) if condition_expression else None
+        process._add_flow(self)
+
+    def to_element(self):
         attribs = {
-            "id": id,
-            "sourceRef": source_ref,
-            "targetRef": target_ref
+            "id": self.id,
+            "sourceRef": self.source_ref,
+            "targetRef": self.target_ref
         }
-        self.element = ET.SubElement(process.element, f"{{{BPMN_NS}}}sequenceFlow", **attribs)
-        if condition_expression: # Creates the <conditionExpression> child element for the flow
+        element = ET.Element(f"{{{BPMN_NS}}}sequenceFlow", attribs)
+        if self.condition_expression: # Creates the <conditionExpression> child element for the flow
             condition = ET.SubElement(
-                self.element,
+                element,
                 f"{{{BPMN_NS}}}conditionExpression",
                 attrib={f'{{{XSI_NS}}}type': 'tFormalExpression'}
             )
-            condition.text = condition_expression
+            condition.text = self.condition_expression
+        return element
 
-class CallActivity:
+class CallActivity(FlowNode):
     """
         <callActivity id="call_approval_subprocess" name="Call Reusable Subprocess" calledElement="approval_process">
             <extensionElements>
@@ -320,77 +615,281 @@ class CallActivity:
             </extensionElements>
         </callActivity>    
     """
+    __slots__ = ("mappings",)
+    tag = "callActivity"
+
     def __init__(self, process, id, name, config=None, meta=None, seq=None, next=None):
-        config = parse_config_meta_next(config)
-        self.element = ET.SubElement(process.element, f"{{{BPMN_NS}}}callActivity", id=id, name=name, **(config if config else {}))
+        super().__init__(process, id, name=name, config=config, seq=seq, next=next)
         meta = parse_config_meta_next(meta)
+        mappings = [] # (direction, source, target)
         if meta:
-            ext = ET.SubElement(self.element, f"{{{BPMN_NS}}}extensionElements")
             for key, value in meta.items():
                 # Distinguish between 'in' and 'out' mappings
                 if key.startswith('in.'): # eg. in.rsa
-                    key = key.split('in.')[-1]
-                    ET.SubElement(ext, f"{{{CAMUNDA_NS}}}in", source=key, target=value)
+                    mappings.append(("in", _intern(key.split('in.')[-1]), value))
                 elif key.startswith('out'):
-                    key = key.split('out.')[-1]
-                    ET.SubElement(ext, f"{{{CAMUNDA_NS}}}out", source=key, target=value)
+                    mappings.append(("out", _intern(key.split('out.')[-1]), value))
                 else:
-                    print(f"Warning: Meta key must start with 'in.' or 'out.': {key}")
+                    log.warning(f"Meta key must start with 'in.' or 'out.': {key}")
                     raise ValueError(f"Meta key must start with 'in.' or 'out.': {key}")
-                
-        self.seq = seq
-        self.next = parse_config_meta_next(next)
-        process._add_element(self.element, id)
+        self.mappings = tuple(mappings)
 
-class BoundaryEvent:
+    @property
+    def called_element(self):
+        return dict(self.attrib).get("calledElement")
+
+    def namespaces(self):
+        uris = super().namespaces()
+        if self.mappings:
+            uris.add(CAMUNDA_NS)
+        return uris
+
+    def to_element(self):
+        element = self._element()
+        if self.mappings:
+            ext = ET.SubElement(element, f"{{{BPMN_NS}}}extensionElements")
+            for direction, source, target in self.mappings:
+                ET.SubElement(ext, f"{{{CAMUNDA_NS}}}{direction}", source=source, target=target)
+        return element
+
+class BoundaryEvent(FlowNode):
     """
         <boundaryEvent id="catch_rejection" attachedToRef="call_approval_subprocess">
             <errorEventDefinition errorRef="REJECTION_ERROR" />
         </boundaryEvent>
     """ 
+    __slots__ = ("error_ref",)
+    tag = "boundaryEvent"
+
     def __init__(self, process, id, name, config=None, meta=None, seq=None, next=None):
-        config = parse_config_meta_next(config)
-        self.element = ET.SubElement(process.element, f"{{{BPMN_NS}}}boundaryEvent", id=id, name=name, **(config if config else {}))
+        super().__init__(process, id, name=name, config=config, seq=seq, next=next)
         meta = parse_config_meta_next(meta)
-        if meta and meta.get("errorRef", None):    
-            ET.SubElement(self.element, f"{{{BPMN_NS}}}errorEventDefinition", errorRef=meta.get("errorRef", None))
-                
-        self.seq = seq
-        self.next = parse_config_meta_next(next)
-        process._add_element(self.element, id)
+        self.error_ref = _intern(meta.get("errorRef", None)) if meta else None
+
+    @property
+    def attached_to_ref(self):
+        return dict(self.attrib).get("attachedToRef")
+
+    def to_element(self):
+        element = self._element()
+        if self.error_ref:
+            ET.SubElement(element, f"{{{BPMN_NS}}}errorEventDefinition", errorRef=self.error_ref)
+        return element
+
+def _shape_size(elem_type):
+    # (width, height) of the shape drawn for an element of the given local tag name
+    if elem_type in ['startEvent', 'endEvent', 'boundaryEvent']:
+        return 36, 36
+    if 'gateway' in elem_type.lower():
+        return 50, 50
+    return 100, 80 # Tasks
 
 class BPMNDiagram:
+    __slots__ = ("id", "planes")
+
     def __init__(self, id):
-        self.element = ET.Element(f"{{{BPMNDI_NS}}}BPMNDiagram", id=id)
+        self.id = id
+        self.planes = []
 
     def add_plane(self, plane):
-        self.element.append(plane.element)
+        self.planes.append(plane)
+
+    def namespaces(self):
+        uris = {BPMNDI_NS}
+        for plane in self.planes:
+            uris |= plane.namespaces()
+        return uris
+
+    def _element(self):
+        return ET.Element(f"{{{BPMNDI_NS}}}BPMNDiagram", id=self.id)
+
+    def to_element(self):
+        element = self._element()
+        element.extend(plane.to_element() for plane in self.planes)
+        return element
+
+    def write(self, writer, level):
+        element = self._element()
+        if not self.planes:
+            writer.element(element, level)
+            return
+        writer.start(element, level)
+        for plane in self.planes:
+            plane.write(writer, level + 1)
+        writer.end(element, level)
 
 class BPMNPlane:
+    __slots__ = ("id", "process_element", "shapes", "edges")
+
     def __init__(self, id, process_element):
-        self.element = ET.Element(f"{{{BPMNDI_NS}}}BPMNPlane", id=id, bpmnElement=process_element)
+        self.id = id
+        self.process_element = process_element
         self.shapes = {}
+        self.edges = []
 
     def add_shape(self, shape):
-        self.element.append(shape.element)
         self.shapes[shape.id] = shape
 
     def add_edge(self, edge):
-        self.element.append(edge.element)
+        self.edges.append(edge)
+
+    def namespaces(self):
+        uris = {BPMNDI_NS}
+        if self.shapes:
+            uris.add(OMGDC_NS)
+        if any(edge.waypoints for edge in self.edges):
+            uris.add(OMGDI_NS)
+        return uris
+
+    def _element(self):
+        return ET.Element(f"{{{BPMNDI_NS}}}BPMNPlane", id=self.id, bpmnElement=self.process_element)
+
+    def to_element(self):
+        element = self._element()
+        element.extend(shape.to_element() for shape in self.shapes.values())
+        element.extend(edge.to_element() for edge in self.edges)
+        return element
+
+    def write(self, writer, level):
+        element = self._element()
+        if not self.shapes and not self.edges:
+            writer.element(element, level)
+            return
+        writer.start(element, level)
+        for shape in self.shapes.values():
+            writer.element(shape.to_element(), level + 1)
+        for edge in self.edges:
+            writer.element(edge.to_element(), level + 1)
+        writer.end(element, level)
 
 class BPMNShape:
+    __slots__ = ("id", "bpmn_element", "x", "y", "width", "height")
+
     def __init__(self, id, bpmn_element, x, y, width, height):
         self.id = id
         self.bpmn_element = bpmn_element
-        self.element = ET.Element(f"{{{BPMNDI_NS}}}BPMNShape", id=id, bpmnElement=bpmn_element)
-        self.bounds = {"x": x, "y": y, "width": width, "height": height}
-        ET.SubElement(self.element, f"{{{OMGDC_NS}}}Bounds", **self.bounds)
+        self.x, self.y, self.width, self.height = int(x), int(y), int(width), int(height)
+
+    @property
+    def bounds(self):
+        return {"x": str(self.x), "y": str(self.y), "width": str(self.width), "height": str(self.height)}
+
+    def to_element(self):
+        element = ET.Element(f"{{{BPMNDI_NS}}}BPMNShape", id=self.id, bpmnElement=self.bpmn_element)
+        ET.SubElement(element, f"{{{OMGDC_NS}}}Bounds", **self.bounds)
+        return element
 
 class BPMNEdge:
+    __slots__ = ("id", "bpmn_element", "waypoints")
+
     def __init__(self, id, bpmn_element, waypoints):
-        self.element = ET.Element(f"{{{BPMNDI_NS}}}BPMNEdge", id=id, bpmnElement=bpmn_element)
-        for x, y in waypoints:
-            ET.SubElement(self.element, f"{{{OMGDI_NS}}}waypoint", x=str(x), y=str(y))
+        self.id = id
+        self.bpmn_element = bpmn_element
+        self.waypoints = tuple((int(x), int(y)) for x, y in waypoints)
+
+    def to_element(self):
+        element = ET.Element(f"{{{BPMNDI_NS}}}BPMNEdge", id=self.id, bpmnElement=self.bpmn_element)
+        for x, y in self.waypoints:
+            ET.SubElement(element, f"{{{OMGDI_NS}}}waypoint", x=str(x), y=str(y))
+        return element
+
+def _escape_text(text):
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    if "\r" in text: # a parser normalizes line endings in character data, so minidom never writes a CR
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+def _escape_attrib(text):
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    if '"' in text:
+        text = text.replace('"', "&quot;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    if "\n" in text:
+        text = text.replace("\n", "&#10;")
+    if "\t" in text:
+        text = text.replace("\t", "&#9;")
+    return text
+
+class XMLWriter:
+    """
+        Writes ElementTree elements as XML directly to a text stream, one element at a time.
+        The pretty layout (two-space indent, text-only elements on one line, empty elements as <tag/>)
+        and the escaping are the same as minidom's toprettyxml, without building a second DOM.
+    """
+    def __init__(self, stream, namespaces, pretty=True, indent="  "):
+        self.write = stream.write
+        self.indent = indent if pretty else ""
+        self.newl = "\n" if pretty else ""
+        self.prefixes = {}
+        for uri in namespaces:
+            self.prefixes[uri] = NAMESPACE_PREFIXES.get(uri, f"ns{len(self.prefixes)}")
+        self.qnames = {}
+        self.declared = False
+
+    def qname(self, name):
+        qname = self.qnames.get(name)
+        if qname is None:
+            if name[:1] == "{":
+                uri, _, local = name[1:].partition("}")
+                prefix = self.prefixes[uri]
+                qname = f"{prefix}:{local}" if prefix else local
+            else:
+                qname = name
+            self.qnames[name] = qname
+        return qname
+
+    def declaration(self):
+        self.write('<?xml version="1.0" ?>' + self.newl)
+
+    def _open(self, elem, level):
+        write = self.write
+        write(self.indent * level + "<" + self.qname(elem.tag))
+        if not self.declared: # the first element written is the document element
+            self.declared = True
+            for uri, prefix in sorted(self.prefixes.items(), key=lambda item: item[1]):
+                write(f' xmlns{":" + prefix if prefix else ""}="{_escape_attrib(uri)}"')
+        for key, value in elem.attrib.items():
+            write(f' {self.qname(key)}="{_escape_attrib(str(value))}"')
+
+    def start(self, elem, level=0):
+        """Opens elem, whose children the caller writes next, followed by end()."""
+        self._open(elem, level)
+        self.write(">" + self.newl)
+
+    def end(self, elem, level=0):
+        self.write(self.indent * level + "</" + self.qname(elem.tag) + ">" + self.newl)
+
+    def element(self, elem, level=0):
+        """Writes elem and its whole subtree."""
+        self._open(elem, level)
+        write = self.write
+        children = list(elem)
+        if not children:
+            if elem.text:
+                write(">" + _escape_text(str(elem.text)) + "</" + self.qname(elem.tag) + ">" + self.newl)
+            else:
+                write("/>" + self.newl)
+            return
+        write(">" + self.newl)
+        inner = self.indent * (level + 1)
+        if elem.text:
+            write(inner + _escape_text(str(elem.text)) + self.newl)
+        for child in children:
+            self.element(child, level + 1)
+            if child.tail:
+                write(inner + _escape_text(str(child.tail)) + self.newl)
+        self.end(elem, level)
 
 def parse_workflows_excel(file_path):
     """
@@ -401,20 +900,52 @@ def parse_workflows_excel(file_path):
         dict: A dictionary where keys are sheet names and values are pandas DataFrames.
               Returns an empty dictionary if the file cannot be read.
     """
+    import pandas as pd
     try:
-        xls = pd.ExcelFile(file_path)
-        sheet_names = xls.sheet_names
-        
-        dataframes = {sheet: pd.read_excel(xls, sheet_name=sheet) for sheet in sheet_names}
+        with stats.timer("read"):
+            xls = pd.ExcelFile(file_path)
+            sheet_names = xls.sheet_names
+
+            dataframes = {sheet: pd.read_excel(xls, sheet_name=sheet) for sheet in sheet_names}
+        stats.count("sheets_read", len(dataframes))
         return dataframes
 
     except FileNotFoundError:
-        print(f"Error: The file at {file_path} was not found.")
+        log.error(f"The file at {file_path} was not found.")
         return {}
     except Exception as e:
-        print(f"An error occurred: {e}")
+        log.error(f"An error occurred: {e}")
         return {}
 
+# Plain ints that YAML reads as base 10 (no sign, leading zeros or underscores tricks)
+_INT_PATTERN = re.compile(r"-?(?:0|[1-9][0-9]*)")
+# `key=value, key=value` lists; YAML reads these as a plain string
+_KEY_VALUE_PATTERN = re.compile(r"[A-Za-z_][\w.\-]*=[^#]*")
+
+def _is_plain_key_value_list(text):
+    # Rule out anything that would make YAML see more than a one-line plain scalar
+    return (_KEY_VALUE_PATTERN.fullmatch(text) is not None and text.isprintable()
+            and ": " not in text and not text.endswith(":"))
+
+def _load_yaml(text):
+    # yaml is imported by the first cell that needs it; plain ints and key=value lists never do
+    import yaml
+    try:
+        with stats.timer("yaml"):
+            return yaml.load(text, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)) # libyaml when available
+    except yaml.YAMLError as e:
+        log.warning(f"Could not parse content as YAML. Content: '{text}'\\nError: {e}")
+        return None
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cell_text(text):
+    stripped = text.strip(" \r\n") # YAML rejects a leading tab, so leave tabs to it
+    if _INT_PATTERN.fullmatch(stripped):
+        return int(stripped)
+    if _is_plain_key_value_list(stripped):
+        return stripped
+    return _load_yaml(text)
+
 def parse_config_meta_next(text):
     """
     Parses a string from an Excel cell.
@@ -422,64 +953,170 @@ def parse_config_meta_next(text):
         1. A simple integer (for the 'Next' column).
         2. A multi-line YAML formatted string (for 'Config' and 'Meta' columns).
         3. Empty or NaN, which returns None.
+    Results are memoized on the raw cell text (see parse_cache_info), and plain ints and
+    `key=value` lists are recognized without calling YAML at all.
     Args:
         text (str): The text from the Excel cell.
     Returns:
         A Python object (int, dict, list, etc.), or None if the text is empty or invalid.
+        Dicts and lists are fresh copies, so callers may modify them.
     Raises:
         ValueError: If the text cannot be parsed as an integer or YAML.
     """
     # Return None if the cell is empty
-    if not text or pd.isna(text):
+    if not text or text != text: # NaN
         return None
     if isinstance(text, int):
         return text
     if isinstance(text, float) and text.is_integer():
         return int(text)
-    try:
-        return yaml.safe_load(text)
-    except yaml.YAMLError as e:
-        print(f"Warning: Could not parse content as YAML. Content: '{text}'\\nError: {e}")
-        return None
+    if not isinstance(text, str):
+        return _load_yaml(text)
+    value = _parse_cell_text(text)
+    if isinstance(value, (dict, list, set)): # never hand out the cached object itself
+        return copy.deepcopy(value)
+    return value
+
+def parse_cache_info():
+    """
+    Returns:
+        CacheInfo: hits, misses, maxsize and currsize of the parsed cell cache.
+    """
+    return _parse_cell_text.cache_info()
+
+def clear_parse_cache():
+    _parse_cell_text.cache_clear()
 
 def get_int_or_none(value):
     try:
         return int(value)
     except (ValueError, TypeError):
-        print(f"Warning: Could not convert value '{value}' to int.")
+        log.warning(f"Could not convert value '{value}' to int.")
         return None
     
 def get_str_or_none(value):
-    return None if pd.isna(value) else value
+    return None if value is None or value != value else value # None or NaN
+
+# One normalized sheet row; `row` is the 1-based spreadsheet row number (the header is row 1)
+SheetRow = namedtuple("SheetRow", ["row", "top_elm", "seq", "bpmn_elm", "id", "name", "next", "config", "meta"])
+
+def sheet_rows(df):
+    """
+    Normalizes the columns used for generation in one columnar pass over the sheet.
+    Seq is coerced to int (None if missing or not a number), every other cell is kept as is
+    with NaN turned into None, the same as get_int_or_none/get_str_or_none do per cell.
+    Args:
+        df (pd.DataFrame or SheetRecords): The rows of a sheet.
+    Returns:
+        list: One SheetRow per DataFrame row, in sheet order.
+    """
+    if isinstance(df, SheetRecords):
+        return _record_rows(df)
+    import pandas as pd # loaded already by whoever built the DataFrame
+    n = len(df)
+
+    def column(name):
+        if name not in df.columns:
+            return [None] * n
+        values = df[name]
+        return values.astype(object).where(values.notna(), None).tolist()
+
+    if "Seq" in df.columns:
+        seqs = pd.to_numeric(df["Seq"], errors="coerce")
+        seqs = [int(seq) if seq == seq else None for seq in seqs.tolist()] # NaN != NaN
+    else:
+        seqs = [None] * n
+
+    if pd.api.types.is_integer_dtype(df.index):
+        rows = (df.index + 2).tolist()
+    else:
+        rows = list(range(2, n + 2))
+
+    return list(map(SheetRow, rows, column("TopElm"), seqs, column("BPMNElm"), column("Id"), column("Name"),
+                    column("Next"), column("Config"), column("Meta")))
+
+def _as_number(value):
+    # Seq the way pd.to_numeric(errors="coerce") and int() read it: 3, 3.0 and "3" are 3, anything else None
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float) and math.isfinite(value):
+        return int(value)
+    return None
+
+def _record_rows(sheet):
+    # sheet_rows for SheetRecords. Cells get the types a DataFrame column would give them, so both
+    # generate the same XML: numbers in a column that also has floats or empty cells become floats.
+    n = len(sheet.records)
+    columns = [list(values) for values in zip(*sheet.records)] if n else [[] for _ in SHEET_COLUMNS]
+    for values in columns:
+        numbers = [value for value in values if value is not None]
+        if (numbers and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in numbers)
+                and (len(numbers) < n or any(isinstance(value, float) for value in numbers))):
+            values[:] = [None if value is None else float(value) for value in values]
+    column = dict(zip(SHEET_COLUMNS, columns))
+    rows = [number + 2 for number in sheet.index] if sheet.index is not None else list(range(2, n + 2))
+    return list(map(SheetRow, rows, column["TopElm"], map(_as_number, column["Seq"]), column["BPMNElm"], column["Id"],
+                    column["Name"], column["Next"], column["Config"], column["Meta"]))
+
+def group_by_top_elm(rows):
+    """
+    Groups sheet rows by TopElm, keeping the order in which each TopElm first appears.
+    Returns:
+        dict: TopElm to the list of its SheetRows.
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.top_elm, []).append(row)
+    return groups
+
+def _as_seq(value):
+    # Seq number of a Next target, or None. handle and validate_rows both read Next through this, so
+    # check accepts exactly what generate does: 2, 2.0 (e.g. from a CSV) and "2", Seq 0 included
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and _INT_PATTERN.fullmatch(value.strip()):
+        return int(value.strip())
+    return None
+
+def handle(wf, tElm, rows): 
+    """
+    Adds the elements of one TopElm group to the workflow.
+    Args:
+        wf (Workflow): The workflow being generated.
+        tElm (str): The TopElm of the group, `ERROR` or `PROCESS`.
+        rows (list): The SheetRows of the group (a DataFrame is normalized first).
+    Raises:
+        ValueError: If the group or one of its rows cannot be generated.
+    """
+    if not isinstance(rows, list):
+        rows = sheet_rows(rows)
 
-def handle(wf, tElm, df): 
     if tElm.upper() == "ERROR": # maybe we don't really need a separete top elm for errors
-        print("Processing Errors...")
-        for _, row in df.iterrows(): # multiple error top level elements
-            d = dict(row)
-            id = get_str_or_none(d.get("Id"))
-            name = get_str_or_none(d.get("Name"))
-            error_code = id
-            error = Error(id=id, name=name, error_code=error_code)
+        log.debug("Processing Errors...")
+        for row in rows: # multiple error top level elements
+            error = Error(id=row.id, name=row.name, error_code=row.id)
             wf.add_error(error)
 
     elif tElm.upper() == "PROCESS":
-        print("Processing Process...")
+        log.debug("Processing Process...")
         
         proc = Process(id=f"{wf.name}_process", is_executable=True, history_ttl="180")
         wf.add_process(proc)
         
         # handle elements
         flows = {}
-        for _, row in df.iterrows(): # multiple elements and flows for one process
-            d = dict(row)
-            seq = get_int_or_none(d.get("Seq", None))
-            bpmnElm = get_str_or_none(d.get("BPMNElm"))
-            id = get_str_or_none(d.get("Id"))
-            name = get_str_or_none(d.get("Name"))
-            next = get_str_or_none(d.get("Next", None))
-            config = get_str_or_none(d.get("Config", None)) 
-            meta = get_str_or_none(d.get("Meta", None))
+        for row in rows: # multiple elements and flows for one process
+            seq, bpmnElm, id, name = row.seq, row.bpmn_elm, row.id, row.name
+            next, config, meta = row.next, row.config, row.meta
 
             if bpmnElm.upper() == "STARTEVENT":
                 flows[seq] = StartEvent(proc, id=id, seq=seq, next=next)
@@ -496,62 +1133,619 @@ def handle(wf, tElm, df):
             elif bpmnElm.upper() == "BOUNDARYEVENT":
                 flows[seq] = BoundaryEvent(proc, id=id, name=name, config=config, meta=meta, seq=seq, next=next)
             else:
-                print(f"Warning: Unknown BPMN Element '{bpmnElm}' for Id '{id}'. Skipping element creation.")
+                log.warning(f"Unknown BPMN Element '{bpmnElm}' for Id '{id}'. Skipping element creation.")
                 raise ValueError(f"Unknown BPMN Element '{bpmnElm}' for Id '{id}'.")
-            proc.element_positions[seq] = id
         
         # handle flows after all elements are created
-        print(flows)
+        log.debug(f"Elements by Seq: {flows}")
         for n in sorted(flows.keys()):
             elm = flows[n]
-            id = elm.element.get("id")
+            id = elm.id
             next = elm.next
-            print("")
-            if next: 
-                if isinstance(next, int): # default flow
-                    SequenceFlow(proc, id=f"Flow_{id}_to_{flows[next].element.get('id')}", source_ref=id, target_ref=flows[next].element.get('id'))
+            if next is not None:
+                if _as_seq(next) is not None: # default flow
+                    target_seq = _as_seq(next)
+                    if target_seq not in flows:
+                        log.warning(f"Target sequence '{next}' not found for element id: {id}")
+                        raise ValueError(f"Target sequence '{next}' not found for element id: {id}")
+                    SequenceFlow(proc, id=f"Flow_{id}_to_{flows[target_seq].id}", source_ref=id, target_ref=flows[target_seq].id)
                 elif isinstance(next, dict): # conditional flows, eg. {'${approved == true}': '5', '${approved == false}': '6'}
                     for k, v in next.items():
-                        target_seq = get_int_or_none(v)
-                        target_id = flows[target_seq].element.get("id") if target_seq and target_seq in flows else None
+                        target_seq = _as_seq(v)
+                        target_id = flows[target_seq].id if target_seq in flows else None
                         if target_id:
                             flow_id = f"Flow_{id}_to_{target_id}"
                             SequenceFlow(proc, id=flow_id, source_ref=id, target_ref=target_id, condition_expression=k)
                         else:
-                            print(f"Warning: Target sequence '{v}' not found for condition '{k}' in element id: {id}")
+                            log.warning(f"Target sequence '{v}' not found for condition '{k}' in element id: {id}")
                             raise ValueError(f"Target sequence '{v}' not found for condition '{k}' in element id: {id}")
                 else:
-                    print(f"Warning: Invalid 'next' value: {next} for element id: {id}")
+                    log.warning(f"Invalid 'next' value: {next} for element id: {id}")
                     raise ValueError(f"Invalid 'next' value: {next} for element id: {id}")
             else: 
-                print(f"No 'next' defined for element id: {id}")
+                log.debug(f"No 'next' defined for element id: {id}")
+        stats.count("elements", len(proc.elements))
+        stats.count("flows", len(proc.flows))
     else:
-        print(f"Warning: Unknown TopElm '{tElm}'. Skipping.")
+        log.warning(f"Unknown TopElm '{tElm}'. Skipping.")
         raise ValueError(f"Unknown TopElm '{tElm}'.")
 
+# A problem found by validate_rows; `row` is the spreadsheet row number (None for sheet-wide problems)
+ValidationIssue = namedtuple("ValidationIssue", ["sheet", "row", "column", "severity", "message"])
+
+PROCESS_ELEMENTS = ("STARTEVENT", "ENDEVENT", "USERTASK", "SERVICETASK", "EXCLUSIVEGATEWAY", "CALLACTIVITY", "BOUNDARYEVENT")
+
+def format_issue(issue):
+    location = f"{issue.sheet}:{issue.row}" if issue.row is not None else f"{issue.sheet}"
+    return f"{location}: {issue.severity}: {issue.column}: {issue.message}"
+
+def validate_rows(sheet, rows):
+    """
+    Checks the rows of one sheet without building any XML, in time linear in the number of rows.
+    Errors are problems generation would fail on or that produce a broken model: unknown TopElm or
+    BPMNElm, missing or duplicate Seq/Id, unparseable or dangling Next, a gateway condition without
+    a target, a BoundaryEvent whose attachedToRef does not exist, an errorRef without an ERROR row,
+    CallActivity Meta keys that are not `in.`/`out.`, no StartEvent.
+    Warnings are suspicious but generate fine: steps unreachable from the StartEvent, steps
+    without Next that are not EndEvents, gateways with a single outgoing branch.
+    Args:
+        sheet (str): The sheet name, reported with every issue.
+        rows (list): The SheetRows of the sheet, see sheet_rows.
+    Returns:
+        list: The ValidationIssues, sheet-wide ones first, then in row order.
+    """
+    issues = []
+
+    def report(row, column, message, severity="error"):
+        issues.append(ValidationIssue(sheet, row.row if row is not None else None, column, severity, message))
+
+    def parse(row, column, text):
+        try:
+            value = parse_config_meta_next(text)
+        except Exception as e:
+            report(row, column, f"cannot be parsed: {e}")
+            return None
+        if text is not None and value is None and str(text).strip():
+            report(row, column, f"cannot be parsed: {text!r}")
+        return value
+
+    process_rows = []
+    error_ids = set()
+    ids = {}
+    for top_elm, group in group_by_top_elm(rows).items():
+        kind = top_elm.upper() if isinstance(top_elm, str) else None
+        if kind == "ERROR":
+            for row in group:
+                if not row.id:
+                    report(row, "Id", "ERROR row has no Id")
+                else:
+                    error_ids.add(row.id)
+        elif kind == "PROCESS":
+            process_rows.extend(group)
+        else:
+            for row in group:
+                report(row, "TopElm", f"unknown TopElm {top_elm!r}, expected ERROR or PROCESS")
+
+    # Seq and Id tables, duplicates reported against the later row
+    by_seq = {}
+    for row in rows:
+        if row.id:
+            if row.id in ids:
+                report(row, "Id", f"duplicate Id {row.id!r}, already used in row {ids[row.id].row}")
+            else:
+                ids[row.id] = row
+    for row in process_rows:
+        if row.seq is None:
+            report(row, "Seq", "Seq is missing or not a number")
+        elif row.seq in by_seq:
+            report(row, "Seq", f"duplicate Seq {row.seq}, already used in row {by_seq[row.seq].row}")
+        else:
+            by_seq[row.seq] = row
+        if not row.id:
+            report(row, "Id", "element has no Id")
+
+    if process_rows and not any(isinstance(row.bpmn_elm, str) and row.bpmn_elm.upper() == "STARTEVENT" for row in process_rows):
+        report(None, "BPMNElm", "process has no StartEvent")
+
+    process_ids = {row.id for row in process_rows if row.id}
+    successors = {}
+    for row in process_rows:
+        kind = row.bpmn_elm.upper() if isinstance(row.bpmn_elm, str) else None
+        if kind not in PROCESS_ELEMENTS:
+            report(row, "BPMNElm", f"unknown BPMN element {row.bpmn_elm!r}")
+
+        config = parse(row, "Config", row.config)
+        meta = parse(row, "Meta", row.meta)
+        if config is not None and not isinstance(config, dict):
+            report(row, "Config", "Config must be a mapping of attributes")
+            config = None
+        if meta is not None and not isinstance(meta, dict):
+            report(row, "Meta", "Meta must be a mapping")
+            meta = None
+
+        # Outgoing Next targets
+        next = parse(row, "Next", row.next)
+        targets = []
+        if next is None:
+            pass
+        elif isinstance(next, dict):
+            for condition, value in next.items():
+                target = _as_seq(value)
+                if target is None:
+                    report(row, "Next", f"condition {condition!r} has no target Seq")
+                else:
+                    targets.append(target)
+        elif _as_seq(next) is not None:
+            targets.append(_as_seq(next))
+        else:
+            report(row, "Next", f"invalid Next {next!r}, expected a Seq or a mapping of conditions to Seqs")
+        for target in targets:
+            if target not in by_seq:
+                report(row, "Next", f"Next refers to Seq {target}, which does not exist")
+        targets = [target for target in targets if target in by_seq]
+        if row.seq is not None and by_seq.get(row.seq) is row:
+            successors[row.seq] = targets
+
+        if kind == "EXCLUSIVEGATEWAY" and len(targets) == 1:
+            report(row, "Next", "gateway has a single outgoing branch", severity="warning")
+        if not targets and next is None and kind in PROCESS_ELEMENTS and kind != "ENDEVENT":
+            report(row, "Next", "step has no Next and is not an EndEvent", severity="warning")
+
+        if kind == "BOUNDARYEVENT":
+            attached_to_ref = config.get("attachedToRef") if config else None
+            if not attached_to_ref:
+                report(row, "Config", "BoundaryEvent has no attachedToRef")
+            elif attached_to_ref not in process_ids:
+                report(row, "Config", f"attachedToRef {attached_to_ref!r} is not an element of this process")
+            elif ids[attached_to_ref].seq is not None:
+                host = ids[attached_to_ref]
+                successors.setdefault(host.seq, []).append(row.seq) # reachable through its host
+        if kind in ("ENDEVENT", "BOUNDARYEVENT") and meta and meta.get("errorRef"):
+            if meta["errorRef"] not in error_ids:
+                report(row, "Meta", f"errorRef {meta['errorRef']!r} has no matching ERROR row")
+        if kind == "CALLACTIVITY" and meta:
+            for key in meta:
+                if not (isinstance(key, str) and (key.startswith("in.") or key.startswith("out"))):
+                    report(row, "Meta", f"Meta key must start with 'in.' or 'out.': {key}")
+
+    # Reachability from the start events
+    reached = set()
+    pending = [row.seq for row in by_seq.values() if isinstance(row.bpmn_elm, str) and row.bpmn_elm.upper() == "STARTEVENT"]
+    reached.update(pending)
+    while pending:
+        for target in successors.get(pending.pop(), ()):
+            if target not in reached:
+                reached.add(target)
+                pending.append(target)
+    if reached:
+        for seq, row in by_seq.items():
+            if seq not in reached:
+                report(row, "Seq", f"step {row.id!r} cannot be reached from the StartEvent", severity="warning")
+    issues.sort(key=lambda issue: (issue.row is not None, issue.row or 0))
+    return issues
+
+def validate_sheet(name, df):
+    """
+    Validates the rows of a sheet, see validate_rows.
+    Returns:
+        list: The ValidationIssues.
+    """
+    return validate_rows(name, sheet_rows(df))
+
+def check_workflows(parsed_data):
+    """
+    Validates every sheet without generating anything, e.g. as a cheap CI check.
+    `parsed_data` is a dict of sheet name to DataFrame or an iterable of (name, DataFrame) pairs.
+    Returns:
+        list: The ValidationIssues of all sheets, in sheet order.
+    """
+    issues = []
+    for name, df in (parsed_data.items() if isinstance(parsed_data, dict) else parsed_data):
+        issues.extend(validate_sheet(name, df))
+    return issues
+
+def generate_workflow(name, df, layout="layered"):
+    """
+    Builds the Workflow for a single sheet: every TopElm is handled and the diagram is laid out.
+    Args:
+        name (str): The sheet name, used as the workflow name and process id prefix.
+        df (pd.DataFrame or SheetRecords): The rows of the sheet.
+        layout (str): The diagram layout, see Workflow.generate_diagram.
+    Returns:
+        Workflow: The populated workflow, ready to be serialized.
+    Raises:
+        ValueError: If validation finds errors in the sheet; all of them are in the message.
+    """
+    with stats.timer("rows"):
+        rows = sheet_rows(df)
+    stats.count("rows_parsed", len(rows))
+    with stats.timer("validate"):
+        issues = validate_rows(name, rows)
+    for issue in issues:
+        if issue.severity != "error":
+            log.warning(format_issue(issue))
+    errors = [format_issue(issue) for issue in issues if issue.severity == "error"]
+    if errors:
+        raise ValueError(f"Sheet '{name}' has {len(errors)} error(s):\n" + "\n".join(errors))
+
+    wf = Workflow(id=f"{name}_definitions", name=name)
+
+    # Iterate each unique top elm
+    with stats.timer("handle"):
+        for tElm, rows in group_by_top_elm(rows).items():
+            log.debug(f"Processing TopElm: {tElm}")
+            handle(wf, tElm, rows)
+
+    # Generate the diagram
+    with stats.timer("layout"):
+        wf.generate_diagram(layout=layout)
+    return wf
+
+def sheet_outputs(folder_to_save, name):
+    # The files generate_sheet writes for a sheet: its BPMN file and the task index sidecar
+    return folder_to_save + f"/{name}_generated.bpmn", folder_to_save + f"/{name}{TASK_INDEX_SUFFIX}"
+
+def generate_sheet(name, df, folder_to_save, layout="layered"):
+    """
+    Generates and writes `{folder_to_save}/{name}_generated.bpmn` for a single sheet.
+    Returns:
+        str: The path of the written BPMN file.
+    """
+    log.info(f"Generating workflow for sheet: {name}")
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(f"Rows of sheet '{name}':\n{df.head() if hasattr(df, 'head') else df.records[:5]}")
+    wf = generate_workflow(name, df, layout=layout)
+
+    # Output the generated BPMN XML
+    if log.isEnabledFor(logging.DEBUG): # serializing twice is only worth it when someone reads it
+        log.debug(wf.to_pretty_xml())
+    filename, task_index = sheet_outputs(folder_to_save, name)
+    with stats.timer("write"):
+        wf.to_xml(filename)
+        wf.write_task_index(task_index)
+    stats.count("sheets_generated")
+    stats.count("bytes_written", os.path.getsize(filename))
+    return filename
+
+def _generate_sheet_safely(name, df, folder_to_save, layout):
+    # A failing sheet must not take the others down with it
+    try:
+        return name, generate_sheet(name, df, folder_to_save, layout=layout), None
+    except Exception as e:
+        return name, None, f"{type(e).__name__}: {e}"
+
+def _generate_sheet_in_worker(name, df, folder_to_save, layout):
+    # Runs in the worker process, whose counters and timers are sent back for the parent to merge
+    stats.reset()
+    return _generate_sheet_safely(name, df, folder_to_save, layout), stats.snapshot()
+
+def generate_sheets(sheets, jobs=1, layout="layered"):
+    """
+    Runs generate_sheet for each (name, df, folder_to_save), optionally over a pool of worker processes.
+    `sheets` is consumed lazily: at most a couple of sheets per worker are read ahead, so a streaming
+    source never has the whole workbook in memory.
+    Args:
+        sheets (iterable): (name, df, folder_to_save) tuples.
+        jobs (int): Number of worker processes. 1 runs serially in this process, 0 uses one per CPU.
+        layout (str): The diagram layout, see Workflow.generate_diagram.
+    Returns:
+        list: (name, filename, error) per sheet, in order; filename is None and error set if it failed.
+    """
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    if isinstance(sheets, (list, tuple)):
+        jobs = min(jobs, len(sheets))
+    jobs = max(1, jobs)
+
+    if jobs == 1:
+        return [_generate_sheet_safely(name, df, folder_to_save, layout) for name, df, folder_to_save in sheets]
+    from concurrent.futures import ProcessPoolExecutor
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = deque()
+        for name, df, folder_to_save in sheets:
+            futures.append(pool.submit(_generate_sheet_in_worker, name, df, folder_to_save, layout))
+            while len(futures) > 2 * jobs:
+                results.append(_collect(futures.popleft()))
+        while futures:
+            results.append(_collect(futures.popleft()))
+    return results
+
+def _collect(future):
+    result, worker_stats = future.result()
+    stats.merge(worker_stats)
+    return result
+
+def _normalize_cell(value):
+    if value is None or (isinstance(value, float) and value != value): # NaN
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (int, str)):
+        return value
+    return str(value)
+
+def sheet_digest(name, df, layout="layered"):
+    """
+    Computes a stable hash of the rows of a sheet that drive generation.
+    Only the SHEET_COLUMNS are hashed (so editing e.g. Role or Desc does not trigger a rebuild),
+    cells are normalized (NaN to None, 2.0 to 2) and the GENERATOR_VERSION and layout are mixed in.
+    Returns:
+        str: A sha256 hex digest.
+    """
+    if isinstance(df, SheetRecords):
+        columns = zip(*df.records) if df.records else [[] for _ in SHEET_COLUMNS]
+    else:
+        columns = [df[column].tolist() if column in df.columns else [None] * len(df) for column in SHEET_COLUMNS]
+    rows = [[_normalize_cell(value) for value in row] for row in zip(*columns)]
+    payload = json.dumps([GENERATOR_VERSION, layout, name, rows], separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def load_manifest(folder_to_save):
+    """
+    Loads the incremental build manifest from the output folder.
+    Returns:
+        dict: Sheet name to {"hash": ..., "file": ...}. Empty if there is no manifest or it was written
+              by another generator version.
+    """
+    try:
+        with open(os.path.join(folder_to_save, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get("version") != GENERATOR_VERSION:
+        return {}
+    return manifest.get("sheets", {})
+
+def save_manifest(folder_to_save, sheets):
+    path = os.path.join(folder_to_save, MANIFEST_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": GENERATOR_VERSION, "sheets": sheets}, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def generate_workflows(parsed_data, folder_to_save, jobs=1, incremental=False, layout="layered", partial=False):
+    """
+    Generates a BPMN file for every sheet, optionally spread over a pool of worker processes.
+    Sheets are independent, so each worker builds and writes its own file; the output is
+    byte-identical to a serial run.
+    Args:
+        parsed_data (dict or iterable): Sheet name to DataFrame, as returned by parse_workflows_excel,
+                                        or (name, DataFrame) pairs, e.g. from sources.read_sheets. Pairs
+                                        are streamed: each sheet is generated and released in turn.
+        folder_to_save (str): The folder the BPMN files are written to.
+        jobs (int): Number of worker processes. 1 runs serially in this process, 0 uses one per CPU.
+        incremental (bool): Skip sheets whose rows are unchanged since the last build, according to
+                            the manifest kept in folder_to_save. Skipped files are not touched.
+        layout (str): The diagram layout, see Workflow.generate_diagram.
+        partial (bool): parsed_data holds only some of the workbook's sheets, so the manifest keeps
+                        the entries of the others instead of dropping them.
+    Returns:
+        tuple: (generated, skipped, failures) where generated maps sheet name to the written file,
+               skipped lists the unchanged sheets and failures maps sheet name to the error message.
+    """
+    manifest = load_manifest(folder_to_save) if incremental else {}
+    digests = {}
+    skipped = []
+
+    def pending():
+        for name, df in (parsed_data.items() if isinstance(parsed_data, dict) else parsed_data):
+            if incremental:
+                digests[name] = sheet_digest(name, df, layout)
+                entry = manifest.get(name)
+                if entry and entry.get("hash") == digests[name] and all(map(os.path.exists, sheet_outputs(folder_to_save, name))):
+                    skipped.append(name)
+                    continue
+            yield name, df, folder_to_save
+
+    results = generate_sheets(pending(), jobs=jobs, layout=layout)
+
+    generated = {name: filename for name, filename, error in results if error is None}
+    failures = {name: error for name, _, error in results if error is not None}
+
+    if incremental:
+        # Drop sheets that no longer exist or failed, so they are rebuilt next time
+        sheets = {name: manifest[name] for name in skipped}
+        if partial:
+            seen = set(digests)
+            sheets.update((name, entry) for name, entry in manifest.items() if name not in seen)
+        for name, filename in generated.items():
+            sheets[name] = {"hash": digests[name], "file": os.path.basename(filename)}
+        if sheets != manifest:
+            save_manifest(folder_to_save, sheets)
+
+    return generated, skipped, failures
+
+def _input_signature(file_path):
+    # Changes whenever a source file is saved, added or removed; None while the input (or one of the
+    # files of a directory) is missing, e.g. mid-save by some editors
+    signature = []
+    for path in source_files(file_path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature) or None
+
+def _read_input(file_path):
+    # Sheet name to SheetRecords (DataFrames for CSV); empty if the input cannot be read right now
+    try:
+        with stats.timer("read"):
+            return dict(read_sheets(file_path, frames=False))
+    except Exception as e:
+        log.error(f"Could not read {file_path}: {e}")
+        return {}
+
+def watch_workbook(file_path, folder_to_save, interval=0.5, jobs=1, incremental=False, layout="layered"):
+    """
+    Keeps regenerating the BPMN files while the workbook is edited, until interrupted with Ctrl+C.
+    The process stays alive, so imports and the parsed cell cache stay warm. The input (any source
+    of sources.read_sheets, or a directory of them) is polled every `interval` seconds; on a save it
+    is re-read, each sheet's digest is compared with the
+    previous snapshot and only the sheets that changed are regenerated. Every rebuild reports its
+    latency, both from the moment the save was noticed and from the file's modification time.
+    Args:
+        file_path (str): The workbook, file or directory to watch.
+        folder_to_save (str): The folder the BPMN files are written to.
+        interval (float): Seconds between polls.
+        jobs (int): Worker processes per rebuild, see generate_workflows.
+        incremental (bool): Start from the manifest instead of rebuilding every sheet, and keep it up to date.
+        layout (str): The diagram layout, see Workflow.generate_diagram.
+    """
+    snapshot = {} # sheet name to the digest of its last successful build
+    if incremental:
+        snapshot = {name: entry["hash"] for name, entry in load_manifest(folder_to_save).items()
+                    if all(map(os.path.exists, sheet_outputs(folder_to_save, name)))}
+
+    print(f"Watching {file_path} (every {interval}s), press Ctrl+C to stop.")
+    last_signature = unreadable = None
+    try:
+        while True:
+            signature = _input_signature(file_path)
+            if signature is None or signature in (last_signature, unreadable):
+                time.sleep(interval)
+                continue
+
+            started = time.perf_counter()
+            initial = last_signature is None
+            parsed_data = _read_input(file_path)
+            if not parsed_data: # unreadable, most likely caught halfway through a save; read again once it changes
+                unreadable = signature
+                time.sleep(interval)
+                continue
+            last_signature = signature
+            read_time = time.perf_counter() - started
+
+            digests = {name: sheet_digest(name, df, layout) for name, df in parsed_data.items()}
+            changed = {name: parsed_data[name] for name, digest in digests.items() if snapshot.get(name) != digest}
+            for name in set(snapshot) - set(digests):
+                print(f"Sheet '{name}' was removed; its BPMN file is left in place.")
+                del snapshot[name]
+            if not changed:
+                continue
+
+            generated, _, failures = generate_workflows(changed, folder_to_save, jobs=jobs, layout=layout)
+            for name in generated:
+                snapshot[name] = digests[name]
+            for name, error in failures.items():
+                snapshot.pop(name, None) # rebuilt again on the next save
+                print(f"Error: Sheet '{name}' failed: {error}")
+            if incremental:
+                save_manifest(folder_to_save, {name: {"hash": digest, "file": f"{name}_generated.bpmn"}
+                                               for name, digest in snapshot.items()})
+
+            elapsed = time.perf_counter() - started
+            # The first build answers no particular save, so only later rebuilds report edit-to-BPMN latency
+            saved = max(mtime for _, mtime, _ in signature) / 1e9
+            since_save = "" if initial else f", {time.time() - saved:.3f}s after the save"
+            print(f"Rebuilt {len(generated)} of {len(parsed_data)} sheets ({', '.join(generated) or 'none'}) "
+                  f"in {elapsed:.3f}s (read {read_time:.3f}s){since_save}; {len(failures)} failed.")
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+
+def main(args):
+    """
+    Runs a command of the command line; see the argument parser below.
+    Returns:
+        int: The exit status.
+    """
+    file_to_parse = args.input
+    folder_to_save = getattr(args, "output", "generated")
+    wanted = set(args.sheet) if getattr(args, "sheet", None) else None
+    found = [] # names of the sheets read, in order
+
+    if args.command == "watch":
+        os.makedirs(folder_to_save, exist_ok=True)
+        watch_workbook(file_to_parse, folder_to_save, interval=args.interval, jobs=args.jobs, incremental=args.incremental, layout=args.layout)
+        return 0
+
+    def sheets():
+        # Records rather than DataFrames: the command line never needs pandas for .xlsx, .jsonl or .parquet
+        for name, rows in read_sheets(file_to_parse, wanted, frames=False):
+            found.append(name)
+            yield name, rows
+
+    try:
+        if args.command == "check":
+            issues = check_workflows(sheets())
+            for issue in issues:
+                print(format_issue(issue))
+            errors = sum(issue.severity == "error" for issue in issues)
+            print(f"Checked {len(found)} sheets: {errors} error(s), {len(issues) - errors} warning(s).")
+            missing = sorted(wanted - set(found)) if wanted else []
+            if missing:
+                log.error(f"No sheet {', '.join(map(repr, missing))} in {file_to_parse}.")
+            return 1 if errors or missing or not found else 0
+        os.makedirs(folder_to_save, exist_ok=True)
+        generated, skipped, failures = generate_workflows(sheets(), folder_to_save, jobs=args.jobs, incremental=args.incremental,
+                                                          layout=args.layout, partial=wanted is not None)
+    except FileNotFoundError:
+        log.error(f"The file at {file_to_parse} was not found.")
+        return 1
+    except Exception as e: # unreadable input; per-sheet generation errors are reported below instead
+        log.error(f"An error occurred: {e}")
+        return 1
+    missing = sorted(wanted - set(found)) if wanted else []
+    if missing:
+        log.error(f"No sheet {', '.join(map(repr, missing))} in {file_to_parse}.")
+    total = len(generated) + len(skipped) + len(failures)
+    if not total:
+        if not missing:
+            log.error(f"No sheets found in {file_to_parse}.")
+        return 1
+
+    print(f"Generated {len(generated)} of {total} workflows, {len(skipped)} unchanged.")
+    for name, error in failures.items():
+        print(f"Error: Sheet '{name}' failed: {error}")
+    return 1 if failures or missing else 0
+
+COMMANDS = ("generate", "check", "watch")
+
+def command_line(argv):
+    # Only the first argument can be the command, so option values such as `--sheet check` are left alone.
+    # Without one, the command is generate, or whatever the --check/--watch flags of older scripts ask for.
+    if argv and (argv[0] in COMMANDS or argv[0] in ("-h", "--help")):
+        return argv
+    legacy = [arg for arg in argv if arg in ("--check", "--watch")]
+    if legacy:
+        return [legacy[-1][2:]] + [arg for arg in argv if arg not in ("--check", "--watch")]
+    return ["generate"] + argv
+
 if __name__ == "__main__":
-    file_to_parse = "workflows.xlsx"
-    folder_to_save = "generated"
-
-    parsed_data = parse_workflows_excel(file_to_parse)
-    if parsed_data:
-        print(f"Successfully parsed {len(parsed_data)} sheets into a dictionary of dataframes.")
-        for name, df in parsed_data.items():
-            print(f"\nDataFrame from Sheet '{name}':")
-            print(df.head())
-
-            # Generate workflow for each sheet
-            print(f"\nGenerating workflow for sheet: {name}")
-            wf = Workflow(id=f"{name}_definitions", name=name)
-        
-            # Iterate each unique top elm
-            for tElm in df['TopElm'].unique(): 
-                print(f"\nProcessing TopElm: {tElm}")
-                handle(wf, tElm, df[df['TopElm'] == tElm])
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--input", "-i", default="workflows.xlsx", help="workbook to read: .xlsx, .csv, .jsonl, .parquet or a directory of them (default: workflows.xlsx)")
+    common.add_argument("--verbose", "-v", action="count", default=0, help="log progress (-v) or everything, including the generated XML (-vv)")
+    common.add_argument("--stats", action="store_true", help="print counters and stage timers at the end")
+    common.add_argument("--report", metavar="FILE", help="write counters, timers and any profile as JSON to FILE")
+    common.add_argument("--profile", action="store_true", help="run under cProfile and add the top functions to the report")
+    common.add_argument("--trace-memory", action="store_true", help="run under tracemalloc and add peak memory and top allocations to the report")
+    building = argparse.ArgumentParser(add_help=False)
+    building.add_argument("--output", "-o", default="generated", help="folder the BPMN files are written to (default: generated)")
+    building.add_argument("--jobs", "-j", type=int, default=1, help="number of worker processes, 0 for one per CPU (default: 1)")
+    building.add_argument("--incremental", action="store_true", help="only regenerate sheets that changed since the last incremental build")
+    building.add_argument("--layout", choices=LAYOUTS, default="layered", help="diagram layout (default: layered)")
+    selecting = argparse.ArgumentParser(add_help=False)
+    selecting.add_argument("--sheet", "-s", action="append", metavar="NAME", help="only this sheet, the others are not even read; repeat for more")
+
+    parser = argparse.ArgumentParser(description="Generate Camunda BPMN files from workflows.xlsx",
+                                     epilog="Without a command, generate is run.")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.add_parser("generate", parents=[common, building, selecting], help="write a BPMN file for every sheet (default)")
+    commands.add_parser("check", parents=[common, selecting], help="only validate the sheets, write nothing; exits 1 on errors")
+    watch = commands.add_parser("watch", parents=[common, building], help="keep running and regenerate the sheets that change whenever the input is saved")
+    watch.add_argument("--interval", type=float, default=0.5, help="seconds between checks of the input (default: 0.5)")
+    args = parser.parse_args(command_line(sys.argv[1:]))
 
-            # Generate the diagram
-            wf.generate_diagram()
+    configure_logging(args.verbose)
+    report = {"command": sys.argv[1:]}
+    with profiled(report, profile=args.profile, trace_memory=args.trace_memory):
+        status = main(args)
 
-            # Output the generated BPMN XML
-            print(wf.to_pretty_xml())
-            wf.to_xml(folder_to_save + f"/{name}_generated.bpmn") 
+    report.update(stats.snapshot())
+    if args.stats:
+        print(stats.summary())
+    if args.report or args.profile or args.trace_memory:
+        report_file = args.report or "workflows_report.json"
+        write_report(report_file, report)
+        print(f"Report written to {report_file}")
+    raise SystemExit(status)
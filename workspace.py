@@ -0,0 +1,379 @@
+"""
+    Compiles a whole directory of workbooks as one workspace.
+
+    Every workbook under the directory (`.xlsx`, or any other source of sources.py) is read
+    (concurrently) and indexed: the process each sheet
+    defines (`<sheet>_process`), the errors of its ERROR rows, the `calledElement` of its call
+    activities and the `errorRef`s of its events. The global index is then used to
+
+      * report process ids defined twice and errors defined twice with different names,
+      * check that every calledElement and errorRef resolves somewhere in the workspace,
+      * share one error catalog: a sheet can reference an error defined in any workbook (e.g. a
+        common `errors.xlsx` with only ERROR rows) and the definition is added to its BPMN file.
+
+    Workbooks are compiled into `<output>/<workbook path without extension>/`. A manifest there keeps
+    each workbook's content hash, index entries and output files, so a rerun only reads and
+    regenerates the workbooks that changed, the ones that call their processes or use their errors
+    and the ones whose output files are missing. Outputs of removed workbooks and sheets are deleted;
+    a workbook that cannot be read fails and keeps its outputs until it can be read again.
+
+        python workspace.py workbooks/ --output generated --jobs 0
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import workflows_gen as wg
+from instrumentation import configure_logging, stats
+from sources import SOURCES, read_sheets
+
+WORKSPACE_MANIFEST = ".workspace.json"
+
+log = logging.getLogger("workspace")
+
+def find_workbooks(directory):
+    """
+    Returns:
+        list: Paths of the workbooks (files of any type in sources.SOURCES) under directory relative
+              to it, sorted; Excel lock files are skipped.
+    """
+    workbooks = []
+    for folder, _, files in os.walk(directory):
+        for file in files:
+            if os.path.splitext(file)[1].lower() in SOURCES and not file.startswith("~$"):
+                workbooks.append(os.path.relpath(os.path.join(folder, file), directory))
+    return sorted(workbooks)
+
+def file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _parse_or_none(text):
+    try:
+        return wg.parse_config_meta_next(text)
+    except Exception:
+        return None # validate_rows reports it when the sheet is generated
+
+def sheet_symbols(name, df):
+    """
+    Indexes what a sheet defines and what it refers to in other sheets.
+    Returns:
+        dict: {"process": process id or None, "errors": {id: name}, "calls": [[row, calledElement]],
+               "error_refs": [[row, errorRef]]}
+    """
+    symbols = {"process": None, "errors": {}, "calls": [], "error_refs": []}
+    for row in wg.sheet_rows(df):
+        top_elm = row.top_elm.upper() if isinstance(row.top_elm, str) else None
+        kind = row.bpmn_elm.upper() if isinstance(row.bpmn_elm, str) else None
+        if top_elm == "ERROR" and row.id:
+            symbols["errors"][row.id] = row.name
+        elif top_elm == "PROCESS":
+            symbols["process"] = f"{name}_process"
+            if kind == "CALLACTIVITY":
+                config = _parse_or_none(row.config)
+                if isinstance(config, dict) and config.get("calledElement"):
+                    symbols["calls"].append([row.row, config["calledElement"]])
+            elif kind in ("ENDEVENT", "BOUNDARYEVENT"):
+                meta = _parse_or_none(row.meta)
+                if isinstance(meta, dict) and meta.get("errorRef"):
+                    symbols["error_refs"].append([row.row, meta["errorRef"]])
+    return symbols
+
+def read_workbook(directory, workbook):
+    # Runs in a worker process: the sheets and their index entries. Read errors propagate, so that a
+    # corrupt workbook fails instead of looking like one without sheets
+    parsed_data = dict(read_sheets(os.path.join(directory, workbook)))
+    return workbook, parsed_data, {name: sheet_symbols(name, df) for name, df in parsed_data.items()}
+
+def _attempt(function, *args):
+    # (result, None), or (None, the exception) if it raised
+    try:
+        return function(*args), None
+    except Exception as e:
+        return None, e
+
+class WorkspaceIndex:
+    """
+        The global index of process ids and errors over all workbooks, built from their sheet symbols.
+        Args:
+            symbols (dict): Workbook to {sheet: sheet_symbols(...)}.
+    """
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.processes = {} # process id to (workbook, sheet)
+        self.errors = {} # error id to (name, workbook, sheet), the first definition wins
+        self.issues = []
+        for workbook, sheets in sorted(symbols.items()):
+            for sheet, entry in sheets.items():
+                location = f"{workbook}:{sheet}"
+                process = entry["process"]
+                if process in self.processes:
+                    other = "{}:{}".format(*self.processes[process])
+                    self.issue(location, None, "Id", f"process {process!r} is also defined in {other}")
+                elif process:
+                    self.processes[process] = (workbook, sheet)
+                for error, name in entry["errors"].items():
+                    if error not in self.errors:
+                        self.errors[error] = (name, workbook, sheet)
+                    elif self.errors[error][0] != name:
+                        defined = self.errors[error]
+                        self.issue(location, None, "Name", f"error {error!r} is named {name!r} here but {defined[0]!r} in {defined[1]}:{defined[2]}")
+
+    def issue(self, location, row, column, message, severity="error"):
+        self.issues.append(wg.ValidationIssue(location, row, column, severity, message))
+
+    def check_links(self):
+        """
+        Reports every calledElement and errorRef that resolves nowhere in the workspace.
+        Returns:
+            set: (workbook, sheet) of the sheets with unresolved links.
+        """
+        broken = set()
+        for workbook, sheets in sorted(self.symbols.items()):
+            for sheet, entry in sheets.items():
+                location = f"{workbook}:{sheet}"
+                for row, called in entry["calls"]:
+                    if called not in self.processes:
+                        self.issue(location, row, "Config", f"calledElement {called!r} is not a process of any workbook")
+                        broken.add((workbook, sheet))
+                for row, error in entry["error_refs"]:
+                    if error not in entry["errors"] and error not in self.errors:
+                        self.issue(location, row, "Meta", f"errorRef {error!r} is not defined in any workbook")
+                        broken.add((workbook, sheet))
+        return broken
+
+    def providers(self, workbook):
+        """
+        Returns:
+            set: The other workbooks whose processes or errors `workbook` uses.
+        """
+        used = set()
+        for entry in self.symbols.get(workbook, {}).values():
+            for _, called in entry["calls"]:
+                if called in self.processes:
+                    used.add(self.processes[called][0])
+            for _, error in entry["error_refs"]:
+                if error not in entry["errors"] and error in self.errors:
+                    used.add(self.errors[error][1])
+        used.discard(workbook)
+        return used
+
+    def shared_errors(self, workbook, sheet):
+        """
+        Returns:
+            dict: id to name of the errors the sheet references but does not define itself.
+        """
+        entry = self.symbols[workbook][sheet]
+        return {error: self.errors[error][0] for _, error in entry["error_refs"]
+                if error not in entry["errors"] and error in self.errors}
+
+def with_errors(df, errors):
+    # The sheet with ERROR rows added for errors from the shared catalog
+    rows = pd.DataFrame([{"TopElm": "Error", "BPMNElm": "Error", "Id": error, "Name": name} for error, name in errors.items()])
+    return pd.concat([df, rows], ignore_index=True)
+
+def load_workspace_manifest(output):
+    try:
+        with open(os.path.join(output, WORKSPACE_MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get("version") != wg.GENERATOR_VERSION:
+        return {}
+    return manifest
+
+def save_workspace_manifest(output, layout, workbooks):
+    path = os.path.join(output, WORKSPACE_MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": wg.GENERATOR_VERSION, "layout": layout, "workbooks": workbooks}, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def output_folder(output, workbook):
+    return os.path.join(output, os.path.splitext(workbook)[0])
+
+def recorded_outputs(output, files):
+    # Paths of the BPMN files and task index sidecars of a manifest entry's {sheet: file}
+    return [path for sheet, file in files.items()
+            for path in wg.sheet_outputs(os.path.dirname(os.path.join(output, file)), sheet)]
+
+def remove_outputs(output, paths):
+    """
+    Deletes generated files whose sheet or workbook is gone, then their folders once empty (never
+    `output` itself).
+    Returns:
+        int: The number of files deleted.
+    """
+    removed = 0
+    root = os.path.abspath(output)
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        folder = os.path.abspath(os.path.dirname(path))
+        while folder != root and folder.startswith(root + os.sep):
+            try:
+                os.rmdir(folder)
+            except OSError: # not empty
+                break
+            folder = os.path.dirname(folder)
+    return removed
+
+def compile_workspace(directory, output, jobs=1, layout="layered", force=False, check_only=False):
+    """
+    Compiles every workbook under `directory` into `output`, see the module docstring.
+    Args:
+        directory (str): The workspace root.
+        output (str): Where the BPMN files and the workspace manifest go.
+        jobs (int): Worker processes for reading and generating, 0 for one per CPU.
+        layout (str): The diagram layout, see Workflow.generate_diagram.
+        force (bool): Recompile every workbook, ignoring the manifest.
+        check_only (bool): Only build the index and check the links; write nothing.
+    Returns:
+        tuple: (compiled, issues, failures) where compiled maps workbook to {sheet: file}, issues lists
+               the workspace-level ValidationIssues and failures maps "workbook:sheet" (or "workbook"
+               if it could not be read) to the error.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    workbooks = find_workbooks(directory)
+    manifest = {} if check_only else load_workspace_manifest(output)
+    recorded = manifest.get("workbooks", {}) # what the last run wrote, whatever its layout
+    previous = recorded if not force and manifest.get("layout") == layout else {}
+
+    with stats.timer("hash"):
+        digests = {workbook: file_digest(os.path.join(directory, workbook)) for workbook in workbooks}
+    changed = {workbook for workbook in workbooks if previous.get(workbook, {}).get("hash") != digests[workbook]}
+    removed = set(previous) - set(workbooks)
+    # Unchanged but with an output deleted since: recompiled, without touching the workbooks using it
+    missing = {workbook for workbook in workbooks if workbook not in changed
+               and not all(map(os.path.exists, recorded_outputs(output, previous[workbook].get("files", {}))))}
+
+    # Index: unchanged workbooks come from the manifest, changed ones are read
+    parsed = {}
+    symbols = {workbook: previous[workbook]["symbols"] for workbook in workbooks if workbook not in changed}
+    unreadable = {} # workbook to its read error
+
+    def read(names):
+        names = sorted(names)
+        with stats.timer("read"):
+            if jobs == 1 or len(names) < 2:
+                results = [_attempt(read_workbook, directory, workbook) for workbook in names]
+            else:
+                with ProcessPoolExecutor(max_workers=min(jobs, len(names))) as pool:
+                    futures = [pool.submit(read_workbook, directory, workbook) for workbook in names]
+                    results = [_attempt(future.result) for future in futures]
+        for workbook, (result, error) in zip(names, results):
+            if error is not None:
+                unreadable[workbook] = error
+                continue
+            _, parsed[workbook], symbols[workbook] = result
+            stats.count("sheets_read", len(parsed[workbook]))
+
+    read(changed)
+    for workbook, error in sorted(unreadable.items()):
+        log.error(f"Could not read {workbook}: {error}")
+        # Its last known processes and errors still resolve the links of the other workbooks
+        if "symbols" in recorded.get(workbook, {}):
+            symbols[workbook] = recorded[workbook]["symbols"]
+    index = WorkspaceIndex(symbols)
+    broken = index.check_links()
+    read_failures = {workbook: f"could not be read: {error}" for workbook, error in unreadable.items()}
+    if check_only:
+        return {}, index.issues, read_failures
+
+    # Affected: changed workbooks and the ones using processes or errors of changed or removed workbooks
+    dirty = changed | removed
+    affected = set(changed)
+    for workbook in workbooks:
+        used = index.providers(workbook) | set(previous.get(workbook, {}).get("providers", []))
+        if used & dirty:
+            affected.add(workbook)
+    affected |= missing
+    read(affected - set(parsed) - set(unreadable))
+    affected -= set(unreadable)
+    log.info(f"{len(workbooks)} workbooks: {len(changed)} changed, {len(removed)} removed, {len(missing)} with missing outputs, "
+             f"{len(affected)} to compile")
+
+    # Generate the affected sheets that define a process; pure error catalogs have nothing to draw
+    tasks = []
+    failures = dict(read_failures)
+    for workbook in sorted(affected):
+        for sheet, df in parsed[workbook].items():
+            if symbols[workbook][sheet]["process"] is None:
+                continue
+            if (workbook, sheet) in broken:
+                failures[f"{workbook}:{sheet}"] = "unresolved calledElement or errorRef, see the issues above"
+                continue
+            os.makedirs(output_folder(output, workbook), exist_ok=True)
+            shared = index.shared_errors(workbook, sheet)
+            tasks.append((workbook, sheet, with_errors(df, shared) if shared else df))
+
+    results = wg.generate_sheets([(sheet, df, output_folder(output, workbook)) for workbook, sheet, df in tasks], jobs=jobs, layout=layout)
+
+    compiled = {}
+    for (workbook, _, _), (sheet, filename, error) in zip(tasks, results):
+        if error is None:
+            compiled.setdefault(workbook, {})[sheet] = os.path.relpath(filename, output)
+        else:
+            failures[f"{workbook}:{sheet}"] = error
+
+    # Failed workbooks get no hash, so they are compiled again next time, but keep their files for the cleanup
+    failed = {name.rsplit(":", 1)[0] for name in failures} | set(unreadable)
+    entries = {}
+    for workbook in workbooks:
+        if workbook in failed:
+            entries[workbook] = {"hash": None, "files": {**recorded.get(workbook, {}).get("files", {}), **compiled.get(workbook, {})}}
+            if workbook in unreadable and "symbols" in recorded.get(workbook, {}):
+                entries[workbook]["symbols"] = recorded[workbook]["symbols"]
+        elif workbook in affected:
+            entries[workbook] = {"hash": digests[workbook], "symbols": symbols[workbook],
+                                 "providers": sorted(index.providers(workbook)), "files": compiled.get(workbook, {})}
+        else:
+            entries[workbook] = previous[workbook]
+
+    # Outputs whose source is gone: removed workbooks, and sheets no longer in (or no longer a process of) a recompiled one
+    stale = [path for workbook in set(recorded) - set(workbooks) for path in recorded_outputs(output, recorded[workbook].get("files", {}))]
+    for workbook in affected:
+        gone = {sheet: file for sheet, file in recorded.get(workbook, {}).get("files", {}).items()
+                if symbols[workbook].get(sheet, {}).get("process") is None}
+        stale.extend(recorded_outputs(output, gone))
+    deleted = remove_outputs(output, stale)
+    if deleted:
+        log.info(f"Deleted {deleted} output file(s) of removed workbooks and sheets")
+    os.makedirs(output, exist_ok=True)
+    save_workspace_manifest(output, layout, entries)
+    return compiled, index.issues, failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile a directory of workbooks with cross-workbook linking")
+    parser.add_argument("directory", help="the workspace root, searched for workbooks (.xlsx, .csv, .jsonl, .parquet)")
+    parser.add_argument("--output", "-o", default="generated", help="output folder (default: generated)")
+    parser.add_argument("--jobs", "-j", type=int, default=0, help="number of worker processes, 0 for one per CPU (default: 0)")
+    parser.add_argument("--layout", choices=wg.LAYOUTS, default="layered", help="diagram layout (default: layered)")
+    parser.add_argument("--force", action="store_true", help="recompile every workbook")
+    parser.add_argument("--check", action="store_true", help="only check ids and links across workbooks, write nothing")
+    parser.add_argument("--verbose", "-v", action="count", default=0, help="log progress (-v) or everything (-vv)")
+    args = parser.parse_args()
+
+    configure_logging(args.verbose)
+    compiled, issues, failures = compile_workspace(args.directory, args.output, jobs=args.jobs, layout=args.layout,
+                                                   force=args.force, check_only=args.check)
+    for issue in issues:
+        print(wg.format_issue(issue))
+    errors = sum(issue.severity == "error" for issue in issues)
+    if args.check:
+        print(f"Checked {len(find_workbooks(args.directory))} workbooks: {errors} error(s).")
+        for name, error in failures.items():
+            print(f"Error: '{name}' failed: {error}")
+        raise SystemExit(1 if errors or failures else 0)
+
+    sheets = sum(len(files) for files in compiled.values())
+    print(f"Compiled {sheets} sheets from {len(compiled)} workbooks, {errors} workspace error(s).")
+    for name, error in failures.items():
+        print(f"Error: '{name}' failed: {error}")
+    if failures or errors:
+        raise SystemExit(1)